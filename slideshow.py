@@ -1,12 +1,41 @@
 import pygame
 import sys
 import os
+import io
 import json
 import random
+import hashlib
+import bisect
+import heapq
+import functools
+import math
+import mmap
+import time
 import ctypes
+import ctypes.util
 import subprocess
+import threading
+import queue
+import glob
+import re
+import sqlite3
+import select
+import socket
+import struct
+import http.client
+import zlib
+from array import array
+from collections import namedtuple, deque, OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urljoin, quote
+from email.utils import parsedate_to_datetime
+from PIL import Image, GifImagePlugin
+try:
+    from PIL import ImageCms
+except ImportError:  # Pillow built without littleCMS: colour profiles are ignored
+    ImageCms = None
 import argparse
 from colorama import init, Fore, Style
 from send2trash import send2trash
@@ -14,8 +43,221 @@ from send2trash import send2trash
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATE_FILE = os.path.join(SCRIPT_DIR, 'last_selected_list.txt')
 RECENTS_FILE = os.path.join(SCRIPT_DIR, 'recents.json')
+CACHE_DB_FILE = os.path.join(SCRIPT_DIR, 'slideshow_cache.db')
 MAX_RECENTS = 50
 
+VALID_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.pcx', '.tga')
+
+DEDUPE_MODES = ('path', 'content', 'perceptual')
+
+TRANSITIONS = ('none', 'fade', 'slide')
+# Time a single transition frame may spend blending before we cut instead.
+TRANSITION_BUDGET_MS = 8
+
+# Frame pacing when the window can't be seen (minimised/hidden) or isn't focused.
+HIDDEN_FRAME_MS = 250
+UNFOCUSED_FRAME_MS = 100
+# While hidden the queue is checked this often, so a restore redraws promptly.
+HIDDEN_EVENT_POLL_MS = 20
+
+# Interactive navigation: steps closer together than this are one burst, and
+# the burst lands on its last slide once input pauses this long.
+NAV_SETTLE_MS = 150
+# Longest side of the quick previews shown while skipping through a burst.
+NAV_PREVIEW_EDGE = 480
+
+# Inspect (zoom/pan) mode
+INSPECT_TILE = 256
+INSPECT_MAX_ZOOM = 8.0
+TILE_CACHE_BYTES = 96 * 1024 * 1024
+# Upper bound for reduced copies kept for formats that can't decode a region,
+# and for the one full-size decode they need.
+INSPECT_BASE_BYTES = 256 * 1024 * 1024
+# Bytes per pixel of the uncompressed layouts we can decode row ranges from.
+RAW_REGION_MODES = {'L': 1, 'LA': 2, 'RGB': 3, 'BGR': 3, 'RGBA': 4, 'BGRA': 4,
+                    'RGBX': 4, 'BGRX': 4, 'CMYK': 4}
+
+# 'name' and 'natural' sort straight from the path; the rest need the metadata index.
+SORT_ORDERS = ('random', 'name', 'natural', 'mtime', 'size', 'taken', 'dimensions')
+METADATA_SORTS = ('mtime', 'size', 'taken', 'dimensions')
+
+
+# Spans kept in the trace ring buffer; older ones are overwritten.
+TRACE_EVENTS = 200000
+TRACE_SLOW_MS = 100
+# Slow frames this close together share one automatic dump.
+TRACE_DUMP_GAP_MS = 10000
+
+
+class Span:
+    """Times one ``with`` block into a tracer's ring buffer."""
+
+    __slots__ = ('tracer', 'name', 'args', 'began')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.began = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.began, time.perf_counter_ns(), self.args)
+        return False
+
+
+class NullSpan:
+    """What ``trace`` hands out while tracing is off: does nothing, allocates nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Opt-in ring buffer of timed spans from every thread, dumped as Chrome trace-event JSON.
+
+    Spans are appended to a bounded deque, which is safe across threads
+    without a lock, so a span costs a couple of microseconds and memory
+    stays flat however long the show runs. The render loop marks its
+    phases with ``phase`` and the end of each frame with ``frame_end``;
+    a frame slower than ``slow_ms`` dumps the buffer on its own. Dumps open
+    in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    active = None
+
+    def __init__(self, out_dir, slow_ms=TRACE_SLOW_MS, capacity=TRACE_EVENTS):
+        self.out_dir = out_dir
+        self.slow_ms = slow_ms
+        self.events = deque(maxlen=capacity)
+        self.threads = {}
+        self.origin = time.perf_counter_ns()
+        self.dumps = 0
+        self.slow_frames = 0
+        self.last_auto_dump = None
+        self._phase = None
+        self._frame_began = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    def record(self, name, began, ended, args=None):
+        """Add a span; ``ended=None`` makes it an instant event."""
+        tid = threading.get_native_id()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.events.append((name, tid, began, None if ended is None else ended - began, args))
+
+    def mark(self, name, args=None):
+        self.record(name, time.perf_counter_ns(), None, args)
+
+    def phase(self, name):
+        """End the render loop's current phase and start ``name`` (None just ends it).
+
+        The first phase after ``frame_end`` also starts the next frame.
+        """
+        now = time.perf_counter_ns()
+        if self._frame_began is None and name is not None:
+            self._frame_began = now
+        if self._phase is not None:
+            self.record(self._phase[0], self._phase[1], now)
+        self._phase = (name, now) if name is not None else None
+
+    def frame_end(self):
+        """Close the frame; dump the buffer if it took longer than ``slow_ms``."""
+        self.phase(None)
+        if self._frame_began is None:
+            return
+        now = time.perf_counter_ns()
+        self.record('frame', self._frame_began, now)
+        ms = (now - self._frame_began) / 1e6
+        self._frame_began = None
+        if not self.slow_ms or ms <= self.slow_ms:
+            return
+        self.slow_frames += 1
+        self.mark('slow frame', {'ms': round(ms, 1)})
+        if self.last_auto_dump is None or now - self.last_auto_dump >= TRACE_DUMP_GAP_MS * 1_000_000:
+            self.last_auto_dump = now
+            self.dump(f"slow-frame-{ms:.0f}ms")
+
+    def dump(self, reason='manual'):
+        """Write the buffer to a new JSON file on a background thread; returns its path."""
+        events = self.events.copy()
+        threads = dict(self.threads)
+        self.dumps += 1
+        path = os.path.join(self.out_dir, f"trace-{datetime.now():%Y%m%d-%H%M%S}-{self.dumps}-{reason}.json")
+        # Not a daemon: a dump started just before exit still gets written.
+        threading.Thread(target=self._write, args=(path, events, threads, reason), name='trace-writer').start()
+        return path
+
+    def _write(self, path, events, threads, reason):
+        pid = os.getpid()
+        out = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+               for tid, name in threads.items()]
+        for name, tid, began, dur, args in events:
+            event = {'name': name, 'pid': pid, 'tid': tid, 'ts': (began - self.origin) / 1000}
+            if dur is None:
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=dur / 1000)
+            if args:
+                event['args'] = args
+            out.append(event)
+        try:
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': out, 'displayTimeUnit': 'ms', 'otherData': {'reason': reason}}, f)
+            os.replace(tmp, path)
+            print(f"{Fore.CYAN}Trace: wrote {len(events)} spans to {path}")
+        except OSError as e:
+            print(f"{Fore.YELLOW}Warning: could not write trace {path}: {e}")
+
+    def summary(self):
+        return (f"{len(self.events)} spans buffered  |  {self.dumps} dumps  |  "
+                f"{self.slow_frames} frames over {self.slow_ms} ms")
+
+
+def trace(name, **args):
+    """Span for a ``with`` block while tracing is on; a shared no-op otherwise."""
+    tracer = Tracer.active
+    if tracer is None:
+        return NULL_SPAN
+    return Span(tracer, name, args or None)
+
+
+def traced(name):
+    """Decorator: record every call of the function as a span called ``name``."""
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            tracer = Tracer.active
+            if tracer is None:
+                return func(*args, **kwargs)
+            with Span(tracer, name, None):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def trace_phase(name):
+    tracer = Tracer.active
+    if tracer is not None:
+        tracer.phase(name)
+
+
+def trace_frame_end():
+    tracer = Tracer.active
+    if tracer is not None:
+        tracer.frame_end()
+
 
 def load_recents():
     """Load recents list, migrating the legacy STATE_FILE on first run."""
@@ -42,62 +284,3881 @@ def load_recents():
     if not os.path.exists(RECENTS_FILE):
         return []
 
-    try:
-        with open(RECENTS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        if isinstance(data, list):
-            cleaned = []
-            for item in data:
-                if isinstance(item, dict) and 'path' in item:
-                    cleaned.append({
-                        'path': item['path'],
-                        'last_used': item.get('last_used', ''),
-                        'duration': int(item.get('duration', 30)),
-                        'sort': item.get('sort', 'random'),
-                    })
-            return cleaned
-    except Exception as e:
-        print(f"{Fore.YELLOW}Warning: could not read recents.json: {e}")
-    return []
+    try:
+        with open(RECENTS_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            cleaned = []
+            for item in data:
+                if isinstance(item, dict) and 'path' in item:
+                    cleaned.append({
+                        'path': item['path'],
+                        'last_used': item.get('last_used', ''),
+                        'duration': int(item.get('duration', 30)),
+                        'sort': item.get('sort', 'random'),
+                    })
+            return cleaned
+    except Exception as e:
+        print(f"{Fore.YELLOW}Warning: could not read recents.json: {e}")
+    return []
+
+
+def save_recents(recents):
+    try:
+        with open(RECENTS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(recents[:MAX_RECENTS], f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"{Fore.YELLOW}Warning: could not save recents.json: {e}")
+
+
+def draw_close_x(surface, rect, color, pad=6, width=2):
+    pygame.draw.line(surface, color, (rect.left + pad, rect.top + pad), (rect.right - pad, rect.bottom - pad), width)
+    pygame.draw.line(surface, color, (rect.left + pad, rect.bottom - pad), (rect.right - pad, rect.top + pad), width)
+
+
+def load_local_font(size):
+    path = os.path.join(SCRIPT_DIR, 'fonts', 'Noto_Sans', 'NotoSans-Regular.ttf')
+    if os.path.exists(path):
+        try:
+            return pygame.font.Font(path, size)
+        except Exception as e:
+            print(f"Failed to load local font: {e}")
+    return None
+
+
+def add_recent(path, duration, sort_order):
+    """Add or update a recent entry, moving it to the top."""
+    path = source_abspath(path)
+    recents = load_recents()
+    recents = [r for r in recents if source_abspath(r['path']) != path]
+    recents.insert(0, {
+        'path': path,
+        'last_used': datetime.now().isoformat(timespec='seconds'),
+        'duration': int(duration),
+        'sort': sort_order,
+    })
+    save_recents(recents)
+
+LIST_ENCODINGS = ('utf-8', 'utf-16', 'cp1252', 'latin-1')
+
+
+def read_list_text(file_path):
+    """Read a list file, trying several encodings. Returns (content, encoding)."""
+    # Try multiple encodings to handle special characters/box chars
+    for enc in LIST_ENCODINGS:
+        try:
+            with open(file_path, 'r', encoding=enc) as f:
+                return f.read(), enc
+        except UnicodeError:
+            continue
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read(), None
+
+
+def is_url(path):
+    return path[:8].lower().startswith(('http://', 'https://'))
+
+
+def has_image_extension(path):
+    """Extension check that ignores a URL's query string and fragment."""
+    if is_url(path):
+        path = urlparse(path).path
+    return path.lower().endswith(VALID_EXTENSIONS)
+
+
+def filter_image_lines(content):
+    """Return (image paths or URLs, non-empty line count) for a list file's text."""
+    all_lines = [line.strip() for line in content.splitlines() if line.strip()]
+    return [p for p in all_lines if has_image_extension(p)], len(all_lines)
+
+
+LIST_INDEX_SUFFIX = '.slideshow-idx'
+# Where indexes go for lists in folders that can't be written to.
+LIST_INDEX_DIR = os.path.join(SCRIPT_DIR, 'list_index')
+LIST_INDEX_MAGIC = b'SSLIDX02'
+# magic, encoding (index into LIST_ENCODINGS, 255 if unknown), extensions crc,
+# source mtime_ns, source size, path count, line count
+LIST_INDEX_HEADER = struct.Struct('<8sBxxxIqqII')
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class ListIndex:
+    """Binary sidecar next to a list file holding its already-filtered image paths.
+
+    Layout: header, ``count + 1`` uint64 offsets, then the paths as UTF-8,
+    each followed by a newline. The file is mmapped, so opening it costs the
+    same for any list size and entry N is read straight from its offsets.
+    The header records the list's mtime and size (and the extensions it was
+    filtered with); if either no longer matches, the sidecar is ignored.
+    Lists in read-only folders get their sidecar in LIST_INDEX_DIR instead.
+    """
+
+    def __init__(self, mm, encoding, count, line_count):
+        self._mm = mm
+        self.encoding = encoding
+        self.count = count
+        self.line_count = line_count
+        self._blob_start = LIST_INDEX_HEADER.size + (count + 1) * 8
+        self._offsets = memoryview(mm)[LIST_INDEX_HEADER.size:self._blob_start].cast('Q')
+
+    @staticmethod
+    def sidecar_paths(list_path):
+        """Where the sidecar may be: next to the list, else named by its path in LIST_INDEX_DIR."""
+        name = hashlib.sha1(os.path.abspath(list_path).encode('utf-8', 'surrogateescape')).hexdigest()
+        return [list_path + LIST_INDEX_SUFFIX, os.path.join(LIST_INDEX_DIR, name + LIST_INDEX_SUFFIX)]
+
+    @staticmethod
+    def extensions_crc():
+        return zlib.crc32(','.join(VALID_EXTENSIONS).encode('ascii'))
+
+    @classmethod
+    def open(cls, list_path):
+        """Return the index for ``list_path`` if a current one exists, else None."""
+        try:
+            signature = file_signature(list_path)
+        except OSError:
+            return None
+        for sidecar in cls.sidecar_paths(list_path):
+            index = cls._open_sidecar(sidecar, signature)
+            if index:
+                return index
+        return None
+
+    @classmethod
+    def _open_sidecar(cls, sidecar, signature):
+        try:
+            with open(sidecar, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, enc, crc, mtime_ns, size, count, line_count = LIST_INDEX_HEADER.unpack_from(mm)
+            valid = (magic == LIST_INDEX_MAGIC and crc == cls.extensions_crc()
+                     and (mtime_ns, size) == signature
+                     and len(mm) >= LIST_INDEX_HEADER.size + (count + 1) * 8)
+        except struct.error:
+            valid = False
+        if not valid:
+            mm.close()
+            return None
+        index = cls(mm, LIST_ENCODINGS[enc] if enc < len(LIST_ENCODINGS) else None, count, line_count)
+        if index._blob_start + index._offsets[count] != len(mm):
+            index.close()
+            return None
+        return index
+
+    @classmethod
+    @traced('write list index')
+    def write(cls, list_path, paths, encoding, line_count, signature):
+        """Write the sidecar for ``paths``, read from the list when it had ``signature``.
+
+        Skipped if the list has changed since, so a stale index is never
+        written as current. Written to a temp file and renamed into place,
+        next to the list or, if that folder refuses, in LIST_INDEX_DIR.
+        """
+        blob = ''.join(p + '\n' for p in paths).encode('utf-8', 'surrogatepass')
+        offsets = array('Q', [0])
+        total = 0
+        for p in paths:
+            total += len(p.encode('utf-8', 'surrogatepass')) + 1
+            offsets.append(total)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        enc = LIST_ENCODINGS.index(encoding) if encoding in LIST_ENCODINGS else 255
+        try:
+            if file_signature(list_path) != signature:
+                return False
+        except OSError as e:
+            print(f"{Fore.YELLOW}Could not write list index for {list_path}: {e}")
+            return False
+        header = LIST_INDEX_HEADER.pack(LIST_INDEX_MAGIC, enc, cls.extensions_crc(), signature[0],
+                                        signature[1], len(paths), line_count)
+        beside, fallback = cls.sidecar_paths(list_path)
+        for target in (beside, fallback):
+            tmp = f"{target}.{os.getpid()}.tmp"
+            try:
+                if target == fallback:
+                    os.makedirs(LIST_INDEX_DIR, exist_ok=True)
+                with open(tmp, 'wb') as f:
+                    f.write(header)
+                    f.write(offsets.tobytes())
+                    f.write(blob)
+                os.replace(tmp, target)
+                return True
+            except OSError as e:
+                error = e
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        print(f"{Fore.YELLOW}Could not write list index {beside} or {fallback}: {error}")
+        return False
+
+    @classmethod
+    def write_async(cls, list_path, paths, encoding, line_count, signature):
+        threading.Thread(target=cls.write, args=(list_path, list(paths), encoding, line_count, signature),
+                         name='list-index', daemon=True).start()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        if not -self.count <= n < self.count:
+            raise IndexError(n)
+        n %= self.count
+        start = self._blob_start + self._offsets[n]
+        end = self._blob_start + self._offsets[n + 1] - 1
+        return self._mm[start:end].decode('utf-8', 'surrogatepass')
+
+    def paths(self):
+        """All paths as a list, decoded in one pass."""
+        text = self._mm[self._blob_start:].decode('utf-8', 'surrogatepass')
+        return text.split('\n')[:-1]
+
+    def close(self):
+        self._offsets.release()
+        self._mm.close()
+
+
+MIX_SEPARATOR = ' + '
+# Slides drawn from a mix at a time; more are drawn when fewer than half remain ahead.
+MIX_CHUNK = 100
+# A slide isn't repeated within this many picks (if the lists are big enough).
+MIX_WINDOW = 100
+# Slides of a mix kept behind the playhead for going back; older ones are dropped.
+MIX_HISTORY = 100
+MIX_RETRIES = 8
+
+
+class MixSource:
+    """One weighted list of a mix, read through its index so it's never copied."""
+
+    def __init__(self, path, weight):
+        self.path = path
+        self.weight = weight
+        self.index = ListIndex.open(path)
+        if self.index is not None:
+            self.entries = self.index
+        else:
+            signature = file_signature(path)
+            content, enc = read_list_text(path)
+            self.entries, line_count = filter_image_lines(content)
+            ListIndex.write_async(path, self.entries, enc, line_count, signature)
+        self.cursor = -1
+        self.picked = 0
+
+    def pick(self, rng, ordered):
+        if ordered:
+            self.cursor = (self.cursor + 1) % len(self.entries)
+            return self.entries[self.cursor]
+        return self.entries[rng.randrange(len(self.entries))]
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+class PlaylistMixer:
+    """Interleaves several list files by weight, a few slides at a time.
+
+    The lists are never concatenated or shuffled. Each pick chooses a list at
+    random in proportion to its weight, then an entry of that list: a random
+    one, or with ``ordered`` the next one in file order. A pick already made
+    within the last ``window`` picks is redrawn (up to MIX_RETRIES times), so
+    slides don't repeat soon even when one list dominates.
+    """
+
+    def __init__(self, sources, window=MIX_WINDOW, seed=None):
+        self.sources = []
+        for path, weight in sources:
+            source = MixSource(path, weight)
+            if len(source.entries) and weight > 0:
+                self.sources.append(source)
+            else:
+                source.close()
+        self.weights = [source.weight for source in self.sources]
+        # A window as big as the pool would leave nothing to pick.
+        self.window = max(0, min(window, sum(len(src.entries) for src in self.sources) // 2))
+        self.rng = random.Random(seed)
+        self.ordered = False
+        self.recent = deque()
+        self.recent_counts = Counter()
+        self.redraws = 0
+
+    def restart(self, ordered, seed=None):
+        """Start picking again; with ``seed`` the picks repeat those of any mixer given it."""
+        if seed is not None:
+            self.rng = random.Random(seed)
+        self.ordered = ordered
+        self.recent.clear()
+        self.recent_counts.clear()
+        for source in self.sources:
+            source.cursor = -1
+            source.picked = 0
+
+    def take(self, n):
+        out = []
+        for _ in range(n if self.sources else 0):
+            for _ in range(MIX_RETRIES):
+                source = self.rng.choices(self.sources, self.weights)[0]
+                path = source.pick(self.rng, self.ordered)
+                if path not in self.recent_counts:
+                    break
+                self.redraws += 1
+            source.picked += 1
+            out.append(path)
+            if self.window:
+                self.recent.append(path)
+                self.recent_counts[path] += 1
+                if len(self.recent) > self.window:
+                    old = self.recent.popleft()
+                    self.recent_counts[old] -= 1
+                    if not self.recent_counts[old]:
+                        del self.recent_counts[old]
+        return out
+
+    def summary(self):
+        total = max(1, sum(source.picked for source in self.sources))
+        return ", ".join(f"{os.path.basename(source.path)} {source.picked * 100 / total:.0f}% ({source.picked})"
+                         for source in self.sources)
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+
+
+class LatencyStats:
+    """Rolling window of millisecond samples with a cheap summary."""
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return "n/a"
+        ordered = sorted(self.samples)
+        mean = sum(ordered) / len(ordered)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return f"mean {mean:.1f} / p95 {p95:.1f} / max {ordered[-1]:.1f} ms"
+
+
+class ActivityMeter:
+    """Process CPU time and wall time spent in each window state.
+
+    Used to report what throttling a hidden or unfocused window saves,
+    compared with the CPU rate measured while it was visible.
+    """
+
+    STATES = ('visible', 'unfocused', 'hidden')
+
+    def __init__(self):
+        self.state = 'visible'
+        self.cpu = dict.fromkeys(self.STATES, 0.0)
+        self.wall = dict.fromkeys(self.STATES, 0.0)
+        self._mark = (time.process_time(), time.monotonic())
+
+    def _close(self):
+        cpu, wall = time.process_time(), time.monotonic()
+        self.cpu[self.state] += cpu - self._mark[0]
+        self.wall[self.state] += wall - self._mark[1]
+        self._mark = (cpu, wall)
+
+    def switch(self, state):
+        self._close()
+        self.state = state
+
+    def rate(self, state):
+        """CPU seconds per wall second in ``state``, or None if never in it."""
+        self._close()
+        return self.cpu[state] / self.wall[state] if self.wall[state] > 0.5 else None
+
+    def saved(self):
+        """Estimated CPU seconds saved by throttling, at the visible CPU rate."""
+        visible = self.rate('visible')
+        if visible is None:
+            return 0.0
+        return sum(max(0.0, (visible - (self.rate(state) or 0.0)) * self.wall[state])
+                   for state in ('unfocused', 'hidden'))
+
+    def breakdown(self):
+        return ", ".join(f"{state} {self.wall[state]:.0f}s at {self.rate(state) * 100:.1f}% CPU"
+                         for state in self.STATES if self.rate(state) is not None)
+
+    def summary(self):
+        return f"{self.breakdown()}  |  saved ~{self.saved():.1f} CPU-s"
+
+
+def parse_mix(source):
+    """Split ``"new.txt=4 + archive.txt"`` into [(path, weight)]; None if it isn't a mix.
+
+    A file or folder that exists under the whole name is never a mix, even
+    if its name contains the separator.
+    """
+    parts = [part.strip() for part in source.split(MIX_SEPARATOR)]
+    if len(parts) < 2 or os.path.exists(source):
+        return None
+    mix = []
+    for part in parts:
+        path, weight = part, 1.0
+        head, sep, tail = part.rpartition('=')
+        if sep:
+            try:
+                path, weight = head.strip(), max(0.0, float(tail))
+            except ValueError:
+                pass
+        if len(path) > 1 and path.startswith('"') and path.endswith('"'):
+            path = path[1:-1]
+        mix.append((path, weight))
+    return mix
+
+
+def format_mix(mix):
+    return MIX_SEPARATOR.join(path if weight == 1 else f"{path}={weight:g}" for path, weight in mix)
+
+
+def source_abspath(source):
+    mix = parse_mix(source)
+    if mix:
+        return format_mix([(os.path.abspath(path), weight) for path, weight in mix])
+    return os.path.abspath(source)
+
+
+def source_label(source):
+    """Short name for a source: its file name, or each list's name and weight for a mix."""
+    mix = parse_mix(source)
+    if mix:
+        return MIX_SEPARATOR.join(f"{os.path.basename(path)} ({weight:g})" for path, weight in mix)
+    return os.path.basename(source) or source
+
+
+def source_kind(source):
+    """Classify a slideshow source as 'mix', 'glob', 'dir' or 'list'."""
+    if parse_mix(source):
+        return 'mix'
+    if glob.has_magic(source) and not os.path.exists(source):
+        return 'glob'
+    if os.path.isdir(source):
+        return 'dir'
+    return 'list'
+
+
+def source_exists(source):
+    mix = parse_mix(source)
+    if mix:
+        return all(os.path.isfile(path) for path, _ in mix)
+    if source_kind(source) == 'glob':
+        root, _, _ = split_glob(source)
+        return os.path.isdir(root)
+    return os.path.exists(source)
+
+
+def split_glob(pattern):
+    """Split a glob into (static root dir, compiled matcher, max dir depth).
+
+    The matcher is applied to paths relative to the root using '/' as the
+    separator. Max depth is None when the pattern contains '**'.
+    """
+    parts = re.split(r'[\\/]', pattern)
+    static = []
+    for part in parts:
+        if glob.has_magic(part):
+            break
+        static.append(part)
+    rest = parts[len(static):]
+    root = os.sep.join(static) if static else '.'
+    if static == ['']:
+        root = os.sep
+    elif len(static) == 1 and static[0].endswith(':'):
+        root = static[0] + os.sep  # bare drive, e.g. "C:"
+
+    regex = ''
+    for i, part in enumerate(rest):
+        last = i == len(rest) - 1
+        if part == '**':
+            regex += '.*' if last else '(?:.*/)?'
+            continue
+        j = 0
+        while j < len(part):
+            c = part[j]
+            if c == '*':
+                regex += '[^/]*'
+            elif c == '?':
+                regex += '[^/]'
+            elif c == '[':
+                end = part.find(']', j + 1)
+                if end == -1:
+                    regex += re.escape(c)
+                else:
+                    body = part[j + 1:end]
+                    if body.startswith('!'):
+                        body = '^' + body[1:]
+                    regex += '[' + body.replace('\\', '\\\\') + ']'
+                    j = end
+            else:
+                regex += re.escape(c)
+            j += 1
+        if not last:
+            regex += '/'
+    flags = re.IGNORECASE if os.name == 'nt' else 0
+    matcher = re.compile(regex + r'\Z', flags)
+    max_depth = None if '**' in rest else max(0, len(rest) - 1)
+    return root, matcher, max_depth
+
+
+class DirectoryScanner:
+    """Parallel os.scandir walker that streams image paths as they are found.
+
+    Directories are handed out to a small pool of worker threads; each
+    finished directory pushes its matching files onto ``results`` as one
+    batch, so the slideshow can start on the first batch while the rest of
+    the tree is still being walked.
+    """
+
+    def __init__(self, root, matcher=None, max_depth=None, workers=8):
+        self.root = root
+        self.matcher = matcher
+        self.max_depth = max_depth
+        self.workers = workers
+        self.results = queue.Queue()
+        self.found = 0
+        self.dirs_scanned = 0
+        self._dirs = queue.Queue()
+        self._outstanding = 0
+        self._visited = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._threads = []
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def start(self):
+        self._push_dir(self.root, '', 0)
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._done.set()
+
+    def wait_first(self, timeout=None):
+        """Block until at least one batch is queued or the walk is finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.done and self.results.empty():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self._done.wait(0.02)
+
+    def drain(self, max_items=None):
+        """Return every path queued so far (up to roughly ``max_items``)."""
+        paths = []
+        while max_items is None or len(paths) < max_items:
+            try:
+                paths.extend(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return paths
+
+    def _push_dir(self, path, rel, depth):
+        # Symlinked folders are followed, but each directory is walked once,
+        # so a link back up the tree (a/loop -> ..) can't make the walk endless.
+        try:
+            st = os.stat(path)
+            key = (st.st_dev, st.st_ino) if st.st_ino else None
+        except OSError:
+            key = None
+        with self._lock:
+            if key is not None:
+                if key in self._visited:
+                    return
+                self._visited.add(key)
+            self._outstanding += 1
+        self._dirs.put((path, rel, depth))
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                path, rel, depth = self._dirs.get(timeout=0.1)
+            except queue.Empty:
+                if self.done:
+                    return
+                continue
+            try:
+                with trace('scan dir'):
+                    self._scan_dir(path, rel, depth)
+            finally:
+                with self._lock:
+                    self._outstanding -= 1
+                    self.dirs_scanned += 1
+                    if self._outstanding == 0:
+                        self._done.set()
+
+    def _scan_dir(self, path, rel, depth):
+        batch = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if self._stop.is_set():
+                        return
+                    try:
+                        if entry.is_dir():
+                            if self.max_depth is None or depth < self.max_depth:
+                                self._push_dir(entry.path, rel + entry.name + '/', depth + 1)
+                        elif entry.name.lower().endswith(VALID_EXTENSIONS):
+                            if self.matcher is None or self.matcher.match(rel + entry.name):
+                                batch.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"{Fore.YELLOW}Warning: could not scan {path}: {e}")
+        if batch:
+            with self._lock:
+                self.found += len(batch)
+            self.results.put(batch)
+
+
+class CacheDB:
+    """Thread-safe wrapper around the sqlite file shared by the background caches."""
+
+    _shared = None
+
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        try:
+            self.conn = sqlite3.connect(path or CACHE_DB_FILE, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.Error as e:
+            print(f"{Fore.YELLOW}Warning: could not open cache database, caching in memory only: {e}")
+            self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            try:
+                return self.conn.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                print(f"{Fore.YELLOW}Warning: cache query failed: {e}")
+                return []
+
+    def executemany(self, sql, rows):
+        if not rows:
+            return
+        with self.lock:
+            try:
+                self.conn.executemany(sql, rows)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"{Fore.YELLOW}Warning: cache write failed: {e}")
+
+
+class BackgroundPool:
+    """Fixed set of daemon threads mapping ``func`` over queued items.
+
+    Results are collected as ``(item, result)`` pairs and picked up by the
+    render loop with ``drain()``; ``func`` should catch its own errors and
+    return None for items it couldn't process.
+    """
+
+    def __init__(self, func, workers=4, name='pool'):
+        self.func = func
+        self.name = name
+        self.inbox = queue.Queue()
+        self.results = queue.Queue()
+        self._stop = threading.Event()
+        # Items submitted whose result isn't in ``results`` yet, queued or running.
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    @property
+    def idle(self):
+        with self._lock:
+            return self._pending == 0 and self.results.empty()
+
+    def submit(self, item):
+        with self._lock:
+            self._pending += 1
+        self.inbox.put(item)
+
+    def submit_many(self, items):
+        for item in items:
+            self.submit(item)
+
+    def clear(self):
+        """Drop queued items that no worker has started on yet and return them."""
+        dropped = []
+        try:
+            while True:
+                dropped.append(self.inbox.get_nowait())
+        except queue.Empty:
+            pass
+        with self._lock:
+            self._pending -= len(dropped)
+        return dropped
+
+    def drain(self, max_items=None):
+        out = []
+        while max_items is None or len(out) < max_items:
+            try:
+                out.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def stop(self):
+        self._stop.set()
+        self.clear()
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                item = self.inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                with trace(self.name):
+                    result = self.func(item)
+                self.results.put((item, result))
+            finally:
+                # Only after the result is queued, so ``idle`` never skips it.
+                with self._lock:
+                    self._pending -= 1
+
+
+HTTP_CACHE_DIR = os.path.join(SCRIPT_DIR, 'http_cache')
+HTTP_CACHE_BYTES = 1024 * 1024 * 1024
+HTTP_CONNECTIONS = 4
+HTTP_TIMEOUT = 20
+HTTP_MAX_REDIRECTS = 5
+HTTP_CHUNK = 256 * 1024
+# Responses without a max-age are reused this long before being revalidated.
+HTTP_MIN_FRESH = 60
+
+HttpEntry = namedtuple('HttpEntry', 'file etag last_modified fresh_until size version')
+
+
+class HttpFetcher:
+    """Fetches slides from http(s) URLs through a keep-alive pool and an on-disk cache.
+
+    At most ``connections`` requests are in flight at once, and finished
+    connections are kept per host for the next request. Bodies are stored in
+    HTTP_CACHE_DIR and their ETag/Last-Modified in ``slideshow_cache.db``.
+    A fresh entry is served from disk without a request. A stale one is
+    revalidated with a conditional GET, and a 304 serves the stored copy.
+    If the server can't be reached, a stale copy is served anyway.
+    ``Cache-Control: no-store`` bodies never touch the disk.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db, cache_dir=None, connections=HTTP_CONNECTIONS,
+                 timeout=HTTP_TIMEOUT, limit=HTTP_CACHE_BYTES):
+        self.db = db
+        self.cache_dir = cache_dir or HTTP_CACHE_DIR
+        self.timeout = timeout
+        self.connections = connections
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS http_cache ('
+            'url TEXT PRIMARY KEY, file TEXT, etag TEXT, last_modified TEXT, '
+            'fresh_until REAL, size INTEGER, version REAL, checked REAL)')
+        self._slots = threading.BoundedSemaphore(connections)
+        self._idle = {}
+        self._fetching = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.reused = 0
+        self.hits = 0
+        self.not_modified = 0
+        self.downloaded = 0
+        self.bytes_downloaded = 0
+        self.stale = 0
+        self.fetch_ms = LatencyStats()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"{Fore.YELLOW}Warning: could not create HTTP cache folder: {e}")
+        self.prune(limit)
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(CacheDB.shared())
+            return cls._shared
+
+    def prune(self, limit):
+        """Delete the least recently checked bodies beyond ``limit`` bytes."""
+        total = 0
+        evict = []
+        for url, name, size in self.db.execute(
+                'SELECT url, file, size FROM http_cache ORDER BY checked DESC'):
+            total += size or 0
+            if total > limit:
+                evict.append((url,))
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        self.db.executemany('DELETE FROM http_cache WHERE url = ?', evict)
+
+    def entry(self, url):
+        rows = self.db.execute(
+            'SELECT file, etag, last_modified, fresh_until, size, version '
+            'FROM http_cache WHERE url = ?', (url,))
+        return HttpEntry(*rows[0]) if rows else None
+
+    def cached_size(self, url):
+        entry = self.entry(url)
+        return entry.size if entry else None
+
+    def version(self, url):
+        """A number that changes when the resource does, for caches keyed by mtime."""
+        entry = self.entry(url)
+        if entry is None or entry.fresh_until <= time.time():
+            self.fetch(url)
+            entry = self.entry(url)
+        if entry is None:
+            raise OSError(f"{url} can't be cached")
+        return entry.version
+
+    def fetch(self, url):
+        """Return the body of ``url``, from the cache when it is still valid.
+
+        Concurrent fetches of one URL (read-ahead and the validator, say)
+        share a single request.
+        """
+        while True:
+            with self._lock:
+                done = self._fetching.get(url)
+                if done is None:
+                    self._fetching[url] = threading.Event()
+                    break
+            done.wait()
+        try:
+            with trace('http fetch', url=url):
+                return self._fetch(url)
+        finally:
+            with self._lock:
+                self._fetching.pop(url).set()
+
+    def _fetch(self, url):
+        entry = self.entry(url)
+        if entry is not None:
+            body_path = os.path.join(self.cache_dir, entry.file)
+            if entry.fresh_until > time.time():
+                try:
+                    with open(body_path, 'rb') as f:
+                        data = f.read()
+                    self.hits += 1
+                    return data
+                except OSError:
+                    entry = None
+            elif not os.path.exists(body_path):
+                entry = None
+        headers = {'Accept-Encoding': 'identity'}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        name = hashlib.sha1(url.encode('utf-8', 'surrogateescape')).hexdigest()
+        body_path = os.path.join(self.cache_dir, name)
+        began = time.perf_counter()
+        try:
+            with self._slots:
+                status, reply, data = self._get(url, headers, body_path)
+        except (OSError, http.client.HTTPException) as e:
+            if entry is None:
+                raise OSError(f"{url}: {e}") from e
+            # Better an old copy than a gap in the show.
+            self.stale += 1
+            with open(body_path, 'rb') as f:
+                return f.read()
+        finally:
+            self.fetch_ms.add((time.perf_counter() - began) * 1000)
+        if status == 304 and entry is not None:
+            self.not_modified += 1
+            with open(body_path, 'rb') as f:
+                data = f.read()
+            if self._no_store(reply):
+                self._forget(url, body_path)
+            else:
+                self._store(url, name, entry.etag, entry.last_modified, reply, len(data), entry.version)
+            return data
+        if status != 200:
+            raise OSError(f"{url}: HTTP {status}")
+        self.downloaded += 1
+        self.bytes_downloaded += len(data)
+        if self._no_store(reply):
+            if entry is not None:
+                # The server no longer lets us keep it, so drop the old copy too.
+                self._forget(url, body_path)
+            return data
+        etag = reply.get('etag')
+        last_modified = reply.get('last-modified')
+        self._store(url, name, etag, last_modified, reply, len(data),
+                    self._version(etag, last_modified, data))
+        return data
+
+    @staticmethod
+    def _no_store(reply):
+        return 'no-store' in reply.get('cache-control', '').lower()
+
+    def _forget(self, url, body_path):
+        self.db.executemany('DELETE FROM http_cache WHERE url = ?', [(url,)])
+        try:
+            os.remove(body_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _version(etag, last_modified, data):
+        if last_modified:
+            try:
+                return parsedate_to_datetime(last_modified).timestamp()
+            except (TypeError, ValueError):
+                pass
+        return float(zlib.crc32(etag.encode('utf-8', 'replace') if etag else data))
+
+    def _store(self, url, name, etag, last_modified, reply, size, version):
+        now = time.time()
+        max_age = HTTP_MIN_FRESH
+        cache_control = reply.get('cache-control', '').lower()
+        match = re.search(r'max-age=(\d+)', cache_control)
+        if 'no-cache' in cache_control:
+            max_age = 0
+        elif match:
+            max_age = int(match.group(1))
+        self.db.executemany(
+            'INSERT OR REPLACE INTO http_cache (url, file, etag, last_modified, fresh_until, '
+            'size, version, checked) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(url, name, etag, last_modified, now + max_age, size, version, now)])
+
+    def _get(self, url, headers, body_path):
+        """GET ``url`` (following redirects); a storable 200 body is streamed to ``body_path``.
+
+        Returns (status, lower-cased headers, body bytes).
+        """
+        for _ in range(HTTP_MAX_REDIRECTS + 1):
+            parts = urlparse(url)
+            key = (parts.scheme.lower(), parts.netloc)
+            target = quote(parts.path or '/', safe="/%:@!$&'()*+,;=~")
+            if parts.query:
+                target += '?' + parts.query
+            conn, resp = self._request(key, target, headers)
+            reply = {k.lower(): v for k, v in resp.getheaders()}
+            redirect = resp.status in (301, 302, 303, 307, 308) and 'location' in reply
+            try:
+                if resp.status == 200 and not self._no_store(reply):
+                    data = self._read_body(resp, body_path)
+                else:
+                    data = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            self._release(key, conn, resp)
+            if redirect:
+                url = urljoin(url, reply['location'])
+                continue
+            return resp.status, reply, data
+        raise OSError(f"too many redirects for {url}")
+
+    def _request(self, key, target, headers):
+        for attempt in (0, 1):
+            conn, reused = self._checkout(key)
+            try:
+                conn.request('GET', target, headers=headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                # The server may have dropped a connection that sat idle; retry once.
+                if reused and attempt == 0:
+                    continue
+                raise
+            self.requests += 1
+            return conn, resp
+
+    def _read_body(self, resp, body_path):
+        """Read the body in chunks, writing it to the cache as it arrives."""
+        chunks = []
+        tmp = f"{body_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                while True:
+                    chunk = resp.read(HTTP_CHUNK)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    f.write(chunk)
+            os.replace(tmp, body_path)
+        except OSError:
+            # A cache that can't be written still leaves us with the bytes.
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            while True:
+                chunk = resp.read(HTTP_CHUNK)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.opened += 1
+        scheme, netloc = key
+        conn_cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return conn_cls(netloc, timeout=self.timeout), False
+
+    def _release(self, key, conn, resp):
+        if resp.will_close or not resp.isclosed():
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.connections:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def read_source(path):
+    """The bytes of a local file or URL."""
+    if is_url(path):
+        return HttpFetcher.shared().fetch(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def open_source(path):
+    """Something Image.open accepts: the path itself, or a URL's bytes."""
+    return io.BytesIO(HttpFetcher.shared().fetch(path)) if is_url(path) else path
+
+
+def open_binary(path):
+    """A binary file object for a local file or URL."""
+    return io.BytesIO(HttpFetcher.shared().fetch(path)) if is_url(path) else open(path, 'rb')
+
+
+def source_mtime(path):
+    return HttpFetcher.shared().version(path) if is_url(path) else os.stat(path).st_mtime
+
+
+def source_size(path):
+    """Size in bytes, or None for a URL that hasn't been fetched yet."""
+    return HttpFetcher.shared().cached_size(path) if is_url(path) else os.path.getsize(path)
+
+
+ImageMeta = namedtuple('ImageMeta', 'mtime size width height taken')
+
+# Formats whose getexif() reads only the header; PNG's would decode pixels.
+EXIF_HEADER_FORMATS = ('JPEG', 'MPO', 'TIFF', 'WEBP')
+
+
+def parse_exif_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip('\x00 ')[:19], '%Y:%m:%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+
+def read_image_metadata(path):
+    """Read size, dimensions and capture date without decoding any pixels."""
+    if is_url(path):
+        data = read_source(path)
+        mtime, size, source = source_mtime(path), len(data), io.BytesIO(data)
+    else:
+        st = os.stat(path)
+        mtime, size, source = st.st_mtime, st.st_size, path
+    with Image.open(source) as im:
+        width, height = im.size
+        taken = None
+        if im.format in EXIF_HEADER_FORMATS:
+            exif = im.getexif()
+            taken = parse_exif_datetime(exif.get_ifd(0x8769).get(36867) or exif.get(306))
+    return ImageMeta(mtime, size, width, height, taken)
+
+
+def natural_key(path):
+    """Sort key that orders 'img2' before 'img10'."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path.lower())]
+
+
+def metadata_sort_value(meta, sort_order):
+    if sort_order == 'mtime':
+        return meta.mtime
+    if sort_order == 'size':
+        return meta.size
+    if sort_order == 'taken':
+        return meta.taken if meta.taken is not None else meta.mtime
+    return meta.width * meta.height
+
+
+class MetadataIndexer:
+    """Background header reader backed by a persistent index keyed by path+mtime."""
+
+    BATCH = 200
+
+    def __init__(self, db, workers=4):
+        self.db = db
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS metadata ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, '
+            'width INTEGER, height INTEGER, taken REAL)')
+        self.meta = {}
+        self.submitted = 0
+        self.indexed = 0
+        self.from_cache = 0
+        self.failed = 0
+        self._writes = []
+        self._writes_lock = threading.Lock()
+        self.pool = BackgroundPool(self._index_one, workers, name='indexer')
+
+    @property
+    def done(self):
+        return self.pool.idle
+
+    def submit(self, paths):
+        paths = [p for p in paths if p not in self.meta]
+        self.submitted += len(paths)
+        self.pool.submit_many(paths)
+
+    def _index_one(self, path):
+        try:
+            mtime = source_mtime(path)
+            rows = self.db.execute(
+                'SELECT mtime, size, width, height, taken FROM metadata WHERE path = ?', (path,))
+            if rows and rows[0][0] == mtime:
+                return ImageMeta(*rows[0]), True
+            meta = read_image_metadata(path)
+        except Exception:
+            return None
+        with self._writes_lock:
+            self._writes.append((path,) + tuple(meta))
+            if len(self._writes) >= self.BATCH:
+                self._flush_locked()
+        return meta, False
+
+    def _flush_locked(self):
+        rows, self._writes = self._writes, []
+        self.db.executemany(
+            'INSERT OR REPLACE INTO metadata (path, mtime, size, width, height, taken) '
+            'VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def flush(self):
+        with self._writes_lock:
+            self._flush_locked()
+
+    def drain(self):
+        """Return the number of paths whose metadata arrived since the last call."""
+        count = 0
+        for path, result in self.pool.drain():
+            if result is None:
+                self.failed += 1
+                continue
+            meta, cached = result
+            self.meta[path] = meta
+            self.indexed += 1
+            self.from_cache += cached
+            count += 1
+        return count
+
+    def stop(self):
+        self.pool.stop()
+        self.flush()
+
+
+# EXIF Orientation tag value -> the transpose that makes the picture upright.
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+SRGB_PROFILE = ImageCms.createProfile('sRGB') if ImageCms else None
+# Embedded profile bytes + mode -> ImageCms transform to sRGB (None: leave the pixels alone).
+_icc_transforms = {}
+
+
+def image_orientation(image):
+    """EXIF orientation (1-8) of an opened image; 1 if it has none or it's bogus."""
+    try:
+        value = image.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+    return value if value in ORIENTATION_TRANSPOSE else 1
+
+
+def swaps_axes(orientation):
+    """True for the orientations that turn the picture a quarter turn."""
+    return orientation in (5, 6, 7, 8)
+
+
+def upright_size(size, orientation):
+    return (size[1], size[0]) if swaps_axes(orientation) else size
+
+
+def source_box(box, size, orientation):
+    """Map a box in upright coordinates to the stored image (``size`` is its stored size)."""
+    x0, y0, x1, y1 = box
+    w, h = size
+    return {
+        1: (x0, y0, x1, y1),
+        2: (w - x1, y0, w - x0, y1),
+        3: (w - x1, h - y1, w - x0, h - y0),
+        4: (x0, h - y1, x1, h - y0),
+        5: (y0, x0, y1, x1),
+        6: (y0, h - x1, y1, h - x0),
+        7: (w - y1, h - x1, w - y0, h - x0),
+        8: (w - y1, x0, w - y0, x1),
+    }[orientation]
+
+
+def icc_transform(icc_profile, mode):
+    """Cached transform from an embedded ICC profile to sRGB, or None if none is needed."""
+    if ImageCms is None or not icc_profile or mode not in ('RGB', 'RGBA'):
+        return None
+    key = (hashlib.blake2b(icc_profile, digest_size=16).digest(), mode)
+    if key not in _icc_transforms:
+        transform = None
+        try:
+            profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            # Most cameras and editors embed sRGB itself; converting would be a no-op.
+            if (profile.profile.xcolor_space.strip() == 'RGB'
+                    and 'srgb' not in ImageCms.getProfileDescription(profile).lower()):
+                transform = ImageCms.buildTransform(profile, SRGB_PROFILE, mode, mode)
+        except Exception as e:
+            print(f"{Fore.YELLOW}Warning: ignoring unusable colour profile: {e}")
+        _icc_transforms[key] = transform
+    return _icc_transforms[key]
+
+
+def finish_frames(frames, orientation=1, icc_profile=None):
+    """Turn already-scaled frames upright and into sRGB.
+
+    Runs after resizing, so both steps cost what the displayed pixels cost,
+    not what the source's do.
+    """
+    transpose = ORIENTATION_TRANSPOSE.get(orientation)
+    if transpose is not None:
+        frames = [frame.transpose(transpose) for frame in frames]
+    transform = icc_transform(icc_profile, frames[0].mode) if frames else None
+    if transform is not None:
+        frames = [ImageCms.applyTransform(frame, transform) for frame in frames]
+    return frames
+
+
+def fit_frames(frames, win_size, orientation=1, icc_profile=None):
+    """Fit PIL frames to the window with LANCZOS; returns (resized frames, (x, y)).
+
+    ``orientation`` and ``icc_profile`` come from the source file; the
+    frames are resized as stored and only then turned upright and into sRGB.
+    """
+    win_w, win_h = win_size
+    img_w, img_h = upright_size(frames[0].size, orientation)
+    ratio = min(win_w/img_w, win_h/img_h)
+    new_w = int(img_w * ratio)
+    new_h = int(img_h * ratio)
+    if new_w <= 0 or new_h <= 0:
+        return [], (0, 0)
+    resized = [frame.resize(upright_size((new_w, new_h), orientation), Image.Resampling.LANCZOS)
+               for frame in frames]
+    # Center image on surface
+    return finish_frames(resized, orientation, icc_profile), ((win_w - new_w) // 2, (win_h - new_h) // 2)
+
+
+def scale_frames(frames, win_size, orientation=1, icc_profile=None):
+    """Fit PIL frames to the window with LANCZOS; returns (surfaces, (x, y))."""
+    scaled, pos = fit_frames(frames, win_size, orientation, icc_profile)
+    # Convert PIL images to Pygame surfaces
+    return [pygame.image.frombytes(f.tobytes(), f.size, f.mode) for f in scaled], pos
+
+
+def read_frames(image, check=None):
+    """Decode an opened image to RGBA frames; returns (frames, durations, animated).
+
+    Still images give one frame and no durations. ``check`` is called after
+    each animation frame so long decodes can be abandoned.
+    """
+    if not getattr(image, "is_animated", False):
+        return [image.convert('RGBA')], [], False
+    frames, durations = [], []
+    for i in range(image.n_frames):
+        image.seek(i)
+        # Convert to RGBA to ensure consistency
+        frames.append(image.copy().convert('RGBA'))
+        if check:
+            check()
+        # Get duration (default to 100ms if not specified). Like
+        # browsers, treat 0-10ms frames as 100ms.
+        duration = image.info.get('duration', 100)
+        durations.append(duration if duration > 10 else 100)
+    return frames, durations, True
+
+
+def pil_nbytes(image):
+    """Pixel-buffer size of a PIL image, or 0 if it hasn't been decoded."""
+    if image is None or getattr(image, 'im', None) is None:
+        return 0
+    return image.width * image.height * len(image.getbands())
+
+
+def surface_nbytes(surface):
+    return surface.get_pitch() * surface.get_height() if surface is not None else 0
+
+
+class DecodedSlide:
+    """A slide decoded and scaled for a given window size, ready to display."""
+
+    def __init__(self, path, win_size):
+        self.path = path
+        self.win_size = win_size
+        self.pil_image = None
+        self.is_gif = False
+        self.gif_frames = []
+        self.gif_durations = []
+        self.original_image = None
+        self.orientation = 1
+        self.icc_profile = None
+        self.surfaces = []
+        self.pos = (0, 0)
+
+    def nbytes(self):
+        return (pil_nbytes(self.pil_image) + pil_nbytes(self.original_image)
+                + sum(pil_nbytes(f) for f in self.gif_frames)
+                + sum(surface_nbytes(s) for s in self.surfaces))
+
+    def release_source(self):
+        """Drop the full-resolution frames and close the file; returns bytes freed."""
+        freed = pil_nbytes(self.pil_image) + pil_nbytes(self.original_image) + sum(pil_nbytes(f) for f in self.gif_frames)
+        if self.pil_image is not None:
+            self.pil_image.close()
+        self.pil_image = None
+        self.original_image = None
+        self.gif_frames = []
+        return freed
+
+
+class DecodeCancelled(Exception):
+    pass
+
+
+def decode_slide(path, win_size, data=None, keep_source=True, cancelled=None):
+    """Open, decode and scale one slide. Safe to call from a worker thread.
+
+    ``data`` is the file's bytes if the read-ahead stage already has them,
+    so decoding doesn't touch the disk (or network share) at all. With
+    ``keep_source=False`` only the scaled frames are kept. ``cancelled`` is
+    polled between stages; if it returns True, DecodeCancelled is raised.
+    """
+    def check():
+        if cancelled is not None and cancelled():
+            raise DecodeCancelled(path)
+
+    slide = DecodedSlide(path, win_size)
+    # Use PIL to load image
+    with trace('open', path=path):
+        slide.pil_image = Image.open(io.BytesIO(data) if data is not None else open_source(path))
+    with trace('decode'):
+        frames, durations, slide.is_gif = read_frames(slide.pil_image, check)
+    if slide.is_gif:
+        slide.gif_frames = frames
+        slide.gif_durations = durations
+    else:
+        slide.original_image = frames[0]
+    # Both are applied after scaling; the full-resolution frames stay as stored.
+    slide.orientation = image_orientation(slide.pil_image)
+    slide.icc_profile = slide.pil_image.info.get('icc_profile')
+
+    check()
+    with trace('scale'):
+        slide.surfaces, slide.pos = scale_frames(frames, win_size, slide.orientation, slide.icc_profile)
+    if not keep_source:
+        slide.release_source()
+    return slide
+
+
+READ_AHEAD = 4
+READ_AHEAD_BYTES = 128 * 1024 * 1024
+IO_WORKERS = 2
+
+
+class ReadAhead:
+    """I/O stage: reads the files just ahead of the playhead into memory.
+
+    At most ``workers`` reads run at once and buffered plus in-flight bytes
+    stay under ``budget``, so a slow share isn't hammered and memory stays
+    bounded. Files bigger than the whole budget are left for the decoder to
+    read itself.
+    """
+
+    def __init__(self, workers=IO_WORKERS, budget=READ_AHEAD_BYTES):
+        self.budget = budget
+        self._cond = threading.Condition()
+        self._queue = []
+        self._reading = {}
+        self._wanted = set()
+        self._awaited = set()
+        self._sizes = {}
+        self._buffers = OrderedDict()
+        self.buffered_bytes = 0
+        self.bytes_read = 0
+        self.read_ms = LatencyStats()
+        self.waited_ms = LatencyStats()
+        self.hits = 0
+        self.misses = 0
+        self._stop = False
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"read-ahead-{i}", daemon=True).start()
+
+    @property
+    def depths(self):
+        with self._cond:
+            return len(self._queue), len(self._reading), len(self._buffers)
+
+    def want(self, paths):
+        """Read ``paths`` in this order; buffers and queued reads not listed are dropped."""
+        paths = list(dict.fromkeys(paths))
+        keep = set(paths)
+        with self._cond:
+            self._wanted = keep
+            for path in [p for p in self._buffers if p not in keep]:
+                self._drop_locked(path)
+            self._queue = [p for p in paths if p not in self._buffers and p not in self._reading]
+            for path in [p for p in self._sizes if p not in keep]:
+                del self._sizes[path]
+            self._cond.notify_all()
+
+    def take(self, path):
+        """Pop the bytes for ``path``, waiting if a read is in flight.
+
+        Returns None if it wasn't read ahead (the caller should read it
+        itself); re-raises the read error if reading failed.
+        """
+        began = time.perf_counter()
+        waited = False
+        with self._cond:
+            while path in self._reading:
+                waited = True
+                self._awaited.add(path)
+                self._cond.wait()
+            self._awaited.discard(path)
+            if path in self._queue:
+                # Not started yet; reading directly is quicker than queueing.
+                self._queue.remove(path)
+            data = self._drop_locked(path)
+        if waited:
+            self.waited_ms.add((time.perf_counter() - began) * 1000)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+    def _drop_locked(self, path):
+        data = self._buffers.pop(path, None)
+        if isinstance(data, bytes):
+            self.buffered_bytes -= len(data)
+            self._cond.notify_all()
+        return data
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._queue = []
+            self._buffers.clear()
+            self.buffered_bytes = 0
+            self._cond.notify_all()
+
+    def _claim(self):
+        """Take the head of the queue and reserve budget for it; None on stop.
+
+        The file is stat'ed without holding the lock, since on a network
+        share that can be as slow as a read. A file that doesn't fit yet
+        goes back to the head of the queue so reads stay in playhead order.
+        """
+        while True:
+            with self._cond:
+                while not self._stop and (not self._queue or self._over_budget_locked(self._queue[0])):
+                    self._cond.wait()
+                if self._stop:
+                    return None
+                path = self._queue.pop(0)
+                self._reading[path] = 0
+            size = self._sizes.get(path)
+            if size is None:
+                try:
+                    size = source_size(path) or 0
+                except OSError:
+                    size = 0
+            with self._cond:
+                self._sizes[path] = size
+                if size <= self.budget and self._over_budget_locked(path, held=path):
+                    del self._reading[path]
+                    if path not in self._queue:
+                        self._queue.insert(0, path)
+                    self._cond.notify_all()
+                    continue
+                self._sizes.pop(path, None)
+                if size > self.budget:
+                    del self._reading[path]
+                    self._cond.notify_all()
+                    continue
+                self._reading[path] = size
+                return path
+
+    def _over_budget_locked(self, path, held=None):
+        size = self._sizes.get(path)
+        if size is None:
+            return False
+        in_flight = sum(n for p, n in self._reading.items() if p != held)
+        return self.buffered_bytes + in_flight + size > self.budget
+
+    def _run(self):
+        while True:
+            path = self._claim()
+            if path is None:
+                return
+            began = time.perf_counter()
+            try:
+                with trace('read', path=path):
+                    data = read_source(path)
+            except Exception as e:
+                data = e
+            self.read_ms.add((time.perf_counter() - began) * 1000)
+            with self._cond:
+                del self._reading[path]
+                # Keep it unless the playhead moved on while it was being read.
+                if not self._stop and (path in self._wanted or path in self._awaited):
+                    self._buffers[path] = data
+                    if isinstance(data, bytes):
+                        self.buffered_bytes += len(data)
+                        self.bytes_read += len(data)
+                self._cond.notify_all()
+
+
+class Prefetcher:
+    """CPU stage: decodes the next slide on a background thread while the current one shows.
+
+    Bytes come from the ReadAhead stage when it has them, so this thread
+    only waits on I/O when reads are behind.
+    """
+
+    def __init__(self, reader=None):
+        self.reader = reader
+        self._cond = threading.Condition()
+        self._wanted = None
+        self._working = None
+        self._cancel = False
+        self._ready = {}
+        self._stop = False
+        self.decode_ms = LatencyStats()
+        self.cancelled = 0
+        # Set by the memory governor: keep only scaled frames of prefetched slides.
+        self.keep_source = True
+        threading.Thread(target=self._run, name='prefetch', daemon=True).start()
+
+    @property
+    def depth(self):
+        with self._cond:
+            return (self._wanted is not None) + (self._working is not None), len(self._ready)
+
+    def ready_nbytes(self):
+        with self._cond:
+            return sum(r.nbytes() for r in self._ready.values() if isinstance(r, DecodedSlide))
+
+    def release_sources(self):
+        """Drop full-resolution frames of slides already decoded; returns bytes freed."""
+        with self._cond:
+            return sum(r.release_source() for r in self._ready.values() if isinstance(r, DecodedSlide))
+
+    def request(self, path, win_size):
+        """Decode ``path`` next, abandoning any other slide that is mid-decode."""
+        key = (path, win_size)
+        with self._cond:
+            if self._working is not None:
+                self._cancel = self._working != key
+            if key != self._wanted and key not in self._ready and key != self._working:
+                self._wanted = key
+                self._cond.notify_all()
+
+    def cancel(self):
+        """Drop the queued request and stop the current decode at its next checkpoint."""
+        with self._cond:
+            self._wanted = None
+            if self._working is not None:
+                self._cancel = True
+
+    def ready(self, path, win_size):
+        with self._cond:
+            return (path, win_size) in self._ready
+
+    def take(self, path, win_size):
+        """Return the prefetched slide for ``path``, waiting if it's mid-decode.
+
+        Returns None if nothing was prefetched for it. Re-raises the decode
+        error if prefetching failed, just like a direct decode would.
+        """
+        key = (path, win_size)
+        with self._cond:
+            if self._wanted == key:
+                # Not started yet; decoding directly is quicker than queueing.
+                self._wanted = None
+            with trace('wait for decode'):
+                while self._working == key:
+                    self._cond.wait()
+            result = self._ready.pop(key, None)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._ready.clear()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._wanted is None and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                key, self._wanted = self._wanted, None
+                self._working = key
+                self._cancel = False
+            try:
+                with trace('wait for read'):
+                    data = self.reader.take(key[0]) if self.reader else None
+                began = time.perf_counter()
+                result = decode_slide(*key, data=data, keep_source=self.keep_source,
+                                      cancelled=lambda: self._cancel)
+                self.decode_ms.add((time.perf_counter() - began) * 1000)
+            except DecodeCancelled:
+                result = None
+                self.cancelled += 1
+            except Exception as e:
+                result = e
+            with self._cond:
+                self._working = None
+                if result is not None:
+                    # Only the most recent prefetch is worth keeping.
+                    self._ready = {key: result}
+                self._cond.notify_all()
+
+
+class TilePyramid:
+    """Lazily decoded multi-resolution tiles of one image, for inspect mode.
+
+    Level L is the image at 1/2**L scale cut into INSPECT_TILE squares.
+    Tiles are decoded on demand by a small worker pool and kept in a
+    byte-bounded LRU, so memory stays flat however far you zoom or pan.
+
+    How a tile is decoded depends on what Pillow can do for the format:
+    uncompressed single-strip formats (TIFF, BMP, ...) decode only the rows
+    the tile covers; JPEGs decode coarse levels with DCT scaling (draft);
+    anything else is decoded once into reduced copies ("bases") that must
+    fit INSPECT_BASE_BYTES, which limits how far enormous images zoom in.
+    Formats Pillow can only decode whole at full size (PNG, compressed
+    TIFF, WebP, ...) are refused if that decode alone would not fit.
+
+    ``size`` and tile boxes are in upright (EXIF-oriented) coordinates;
+    each tile is decoded from the matching stored region and then turned
+    and colour-converted on its own.
+    """
+
+    def __init__(self, path, orientation=1, icc_profile=None):
+        self.path = path
+        self.orientation = orientation
+        self.icc_profile = icc_profile
+        # A URL is fetched once; tiles then decode from the bytes in memory.
+        self.data = read_source(path) if is_url(path) else None
+        with self._open() as im:
+            self.source_size = im.size
+            self.size = upright_size(im.size, orientation)
+            self.format = im.format
+            self.mode = 'RGBA' if (im.mode in ('RGBA', 'LA', 'PA')
+                                   or 'transparency' in im.info) else 'RGB'
+            self.raw_tile = self._raw_tile_info(im)
+        w, h = self.size
+        if self.raw_tile is None and self.format != 'JPEG' and w * h * len(self.mode) > INSPECT_BASE_BYTES:
+            raise ValueError(f"{w}x{h} {self.format} is too large to inspect: it can only be decoded whole, "
+                             f"which needs more than {INSPECT_BASE_BYTES // (1024 * 1024)} MB")
+        self.levels = 1
+        while max(w, h) > INSPECT_TILE << (self.levels - 1):
+            self.levels += 1
+        self.min_level = 0
+        if self.raw_tile is None:
+            # Bases for level L and all coarser ones take ~4/3 of level L.
+            bpp = len(self.mode)
+            while (self.min_level < self.levels - 1
+                   and (w >> self.min_level) * (h >> self.min_level) * bpp * 4 // 3 > INSPECT_BASE_BYTES):
+                self.min_level += 1
+        self.bases = {}
+        self.base_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.cache_limit = TILE_CACHE_BYTES
+        self.inflight = set()
+        self.inflight_lock = threading.Lock()
+        self.decoded = 0
+        self.pool = BackgroundPool(self._decode_tile, workers=2, name='tiles')
+
+    @staticmethod
+    def _raw_tile_info(im):
+        """(mode, offset, rawmode, row bytes, orientation) of a single-strip raw image, else None."""
+        if len(im.tile) != 1:
+            return None
+        # Tiles are named tuples from Pillow 11 on and plain tuples before it.
+        codec, extents, offset, args = im.tile[0][:4]
+        if codec != 'raw' or tuple(extents[:2]) != (0, 0) or not isinstance(args, tuple):
+            return None
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+        if rawmode not in RAW_REGION_MODES or orientation not in (1, -1):
+            return None
+        row_bytes = stride or im.size[0] * RAW_REGION_MODES[rawmode]
+        return im.mode, offset, rawmode, row_bytes, orientation
+
+    def tile_box(self, level, tx, ty):
+        """Box of the upright image covered by a tile."""
+        span = INSPECT_TILE << level
+        w, h = self.size
+        return tx * span, ty * span, min(w, (tx + 1) * span), min(h, (ty + 1) * span)
+
+    def _open(self):
+        return Image.open(self.path if self.data is None else io.BytesIO(self.data))
+
+    def _raw_rows(self, y0, y1):
+        """Decode source rows [y0, y1) of an uncompressed image and nothing else."""
+        mode, offset, rawmode, row_bytes, orientation = self.raw_tile
+        w, h = self.source_size
+        # Bottom-up files (BMP) store the last row first.
+        start = offset + (y0 if orientation == 1 else h - y1) * row_bytes
+        length = (y1 - y0) * row_bytes
+        if self.data is not None:
+            data = self.data[start:start + length]
+        else:
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                data = f.read(length)
+        rows = Image.frombytes(mode, (w, y1 - y0), data, 'raw', rawmode, row_bytes, orientation)
+        return rows.convert(self.mode)
+
+    def _decode_raw_tile(self, level, box):
+        x0, y0, x1, y1 = box
+        factor = 1 << level
+        out = Image.new(self.mode, (-(-(x1 - x0) // factor), -(-(y1 - y0) // factor)))
+        # Walk the rows in bands so coarse levels don't hold the whole image.
+        band = max(factor, (4 * 1024 * 1024 // max(1, self.source_size[0] * 4)) // factor * factor)
+        for by in range(y0, y1, band):
+            rows = self._raw_rows(by, min(y1, by + band))
+            strip = rows.crop((x0, 0, x1, rows.height))
+            if factor > 1:
+                strip = strip.reduce(factor)
+            out.paste(strip, (0, (by - y0) // factor))
+        return out
+
+    def _base(self, level):
+        """Reduced copy of the whole image at 1/2**level, built at most once."""
+        with self.base_lock:
+            if level in self.bases:
+                return self.bases[level]
+            finer = [lv for lv in self.bases if lv < level]
+            if finer:
+                src = max(finer)
+                base = self.bases[src].reduce(1 << (level - src))
+            else:
+                w, h = self.source_size
+                factor = 1 << level
+                with self._open() as im:
+                    if self.format == 'JPEG' and factor > 1:
+                        im.draft(self.mode if self.mode == 'RGB' else None,
+                                 (-(-w // factor), -(-h // factor)))
+                    decoded = im.convert(self.mode)
+                remaining = max(1, factor * decoded.width // w)
+                base = decoded.reduce(remaining) if remaining > 1 else decoded
+                del decoded
+            self.bases[level] = base
+            # Deriving every coarser level now is cheap and saves decodes later.
+            for coarser in range(level + 1, self.levels):
+                if coarser not in self.bases:
+                    self.bases[coarser] = self.bases[coarser - 1].reduce(2)
+            return base
+
+    def _decode_tile(self, key):
+        level, tx, ty = key
+        try:
+            box = source_box(self.tile_box(level, tx, ty), self.source_size, self.orientation)
+            if self.raw_tile is not None:
+                image = self._decode_raw_tile(level, box)
+            else:
+                base = self._base(level)
+                factor = 1 << level
+                image = base.crop((box[0] // factor, box[1] // factor,
+                                   -(-box[2] // factor), -(-box[3] // factor)))
+            image = finish_frames([image], self.orientation, self.icc_profile)[0]
+            return pygame.image.frombytes(image.tobytes(), image.size, image.mode)
+        except Exception as e:
+            print(f"{Fore.YELLOW}Warning: could not decode tile {key} of {self.path}: {e}")
+            return None
+        finally:
+            with self.inflight_lock:
+                self.inflight.discard(key)
+
+    def get(self, key):
+        surf = self.cache.get(key)
+        if surf is not None:
+            self.cache.move_to_end(key)
+        return surf
+
+    def want(self, keys):
+        """Decode exactly these tiles next; anything queued but no longer visible is dropped."""
+        with self.inflight_lock:
+            self.inflight.difference_update(self.pool.clear())
+            for key in keys:
+                if key not in self.inflight:
+                    self.inflight.add(key)
+                    self.pool.submit(key)
+
+    def poll(self):
+        """Move finished tiles into the LRU, evicting the least recently drawn."""
+        for key, surf in self.pool.drain():
+            if surf is None:
+                continue
+            surf = surf.convert_alpha() if self.mode == 'RGBA' else surf.convert()
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.cache_bytes -= old.get_width() * old.get_height() * 4
+            self.cache[key] = surf
+            self.cache_bytes += surf.get_width() * surf.get_height() * 4
+            self.decoded += 1
+        self.trim()
+
+    def trim(self):
+        """Evict least recently drawn tiles down to ``cache_limit``; returns bytes freed."""
+        freed = 0
+        while self.cache_bytes > self.cache_limit and len(self.cache) > 1:
+            _, old = self.cache.popitem(last=False)
+            nbytes = old.get_width() * old.get_height() * 4
+            self.cache_bytes -= nbytes
+            freed += nbytes
+        return freed
+
+    def close(self):
+        self.pool.stop()
+        self.cache.clear()
+        self.bases.clear()
+
+
+class InspectView:
+    """Zoom/pan state for inspect mode, drawn from a TilePyramid.
+
+    ``zoom`` is screen pixels per source pixel and ``center`` the source
+    point in the middle of the window. While tiles are decoding, the
+    fit-to-window slide is stretched underneath as a placeholder.
+    """
+
+    def __init__(self, path, overview, overview_pos, win_size, orientation=1, icc_profile=None):
+        self.pyramid = TilePyramid(path, orientation, icc_profile)
+        self.overview = overview
+        self.overview_pos = overview_pos
+        self.win_size = win_size
+        w, h = self.pyramid.size
+        self.fit_zoom = min(win_size[0] / w, win_size[1] / h)
+        max_detail = 1.0 / (1 << self.pyramid.min_level)
+        self.max_zoom = max(self.fit_zoom, INSPECT_MAX_ZOOM * max_detail)
+        self.zoom = self.fit_zoom
+        self.center = (w / 2, h / 2)
+        self.scaled = {}
+
+    def zoom_at(self, pos, factor):
+        """Zoom by ``factor`` keeping the source point under ``pos`` fixed."""
+        new_zoom = max(self.fit_zoom, min(self.max_zoom, self.zoom * factor))
+        sw, sh = self.win_size
+        cx, cy = self.center
+        px = cx + (pos[0] - sw / 2) / self.zoom
+        py = cy + (pos[1] - sh / 2) / self.zoom
+        self.zoom = new_zoom
+        self.center = (px - (pos[0] - sw / 2) / new_zoom, py - (pos[1] - sh / 2) / new_zoom)
+        self._clamp()
+
+    def pan(self, dx, dy):
+        cx, cy = self.center
+        self.center = (cx - dx / self.zoom, cy - dy / self.zoom)
+        self._clamp()
+
+    def _clamp(self):
+        w, h = self.pyramid.size
+        sw, sh = self.win_size
+        half_w = min(w / 2, sw / 2 / self.zoom)
+        half_h = min(h / 2, sh / 2 / self.zoom)
+        cx, cy = self.center
+        self.center = (min(max(cx, half_w), w - half_w), min(max(cy, half_h), h - half_h))
+
+    def level(self):
+        level = int(math.floor(math.log2(1 / self.zoom))) if self.zoom < 1 else 0
+        return max(self.pyramid.min_level, min(self.pyramid.levels - 1, level))
+
+    def draw(self, surface):
+        pyramid = self.pyramid
+        pyramid.poll()
+        sw, sh = self.win_size
+        w, h = pyramid.size
+        cx, cy = self.center
+        vx0 = cx - sw / 2 / self.zoom
+        vy0 = cy - sh / 2 / self.zoom
+        vx1 = cx + sw / 2 / self.zoom
+        vy1 = cy + sh / 2 / self.zoom
+
+        self._draw_placeholder(surface, vx0, vy0, vx1, vy1)
+
+        level = self.level()
+        span = INSPECT_TILE << level
+        missing = []
+        scaled = {}
+        for ty in range(max(0, int(vy0 // span)), min(-(-h // span), int(vy1 // span) + 1)):
+            for tx in range(max(0, int(vx0 // span)), min(-(-w // span), int(vx1 // span) + 1)):
+                key = (level, tx, ty)
+                tile = pyramid.get(key)
+                if tile is None:
+                    missing.append(key)
+                    continue
+                x0, y0, x1, y1 = pyramid.tile_box(*key)
+                dx = int(round((x0 - vx0) * self.zoom))
+                dy = int(round((y0 - vy0) * self.zoom))
+                size = (int(round((x1 - vx0) * self.zoom)) - dx, int(round((y1 - vy0) * self.zoom)) - dy)
+                if size[0] <= 0 or size[1] <= 0:
+                    continue
+                cached = self.scaled.get(key)
+                if cached is None or cached.get_size() != size:
+                    cached = tile if tile.get_size() == size else pygame.transform.smoothscale(tile, size)
+                scaled[key] = cached
+                surface.blit(cached, (dx, dy))
+        # Only keep scaled copies of what's on screen right now.
+        self.scaled = scaled
+        pyramid.want(missing)
+
+    def _draw_placeholder(self, surface, vx0, vy0, vx1, vy1):
+        if self.overview is None:
+            return
+        w, _ = self.pyramid.size
+        ow, oh = self.overview.get_size()
+        ratio = ow / w
+        src = pygame.Rect(int(vx0 * ratio), int(vy0 * ratio),
+                          max(1, int((vx1 - vx0) * ratio)), max(1, int((vy1 - vy0) * ratio)))
+        src = src.clip(self.overview.get_rect())
+        if src.width <= 0 or src.height <= 0:
+            return
+        dest = (int(round((src.left / ratio - vx0) * self.zoom)), int(round((src.top / ratio - vy0) * self.zoom)))
+        size = (max(1, int(src.width / ratio * self.zoom)), max(1, int(src.height / ratio * self.zoom)))
+        surface.blit(pygame.transform.scale(self.overview.subsurface(src), size), dest)
+
+    def close(self):
+        self.pyramid.close()
+        self.scaled = {}
+
+
+GRID_CELL = 176
+GRID_THUMB = 160
+# Rows above and below the viewport whose thumbnails are generated ahead of time.
+GRID_ROWS_AHEAD = 3
+GRID_THUMB_CACHE = 600
+
+
+def make_thumbnail(path, size=GRID_THUMB):
+    """Decode ``path`` to fit in size x size, using JPEG DCT scaling when possible."""
+    with Image.open(open_source(path)) as im:
+        if im.format == 'JPEG':
+            im.draft('RGB', (size, size))
+        has_alpha = im.mode in ('RGBA', 'LA', 'PA') or 'transparency' in im.info
+        image = im.convert('RGBA' if has_alpha else 'RGB')
+        orientation, icc_profile = image_orientation(im), im.info.get('icc_profile')
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return finish_frames([image], orientation, icc_profile)[0]
+
+
+class ThumbnailStore:
+    """Persistent thumbnail cache: small JPEG (or PNG, if transparent) blobs keyed by path+mtime."""
+
+    BATCH = 50
+
+    def __init__(self, db):
+        self.db = db
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS thumbnails ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, data BLOB)')
+        # Thumbnails cached before EXIF orientation was honoured may be sideways.
+        if 'upright' not in [row[1] for row in self.db.execute('PRAGMA table_info(thumbnails)')]:
+            self.db.execute('ALTER TABLE thumbnails ADD COLUMN upright INTEGER NOT NULL DEFAULT 0')
+        self._writes = []
+        self._writes_lock = threading.Lock()
+
+    def load(self, path, mtime, size):
+        rows = self.db.execute('SELECT mtime, size, data FROM thumbnails WHERE path = ? AND upright = 1', (path,))
+        if not rows or rows[0][0] != mtime or rows[0][1] != size:
+            return None
+        image = Image.open(io.BytesIO(rows[0][2]))
+        image.load()
+        return image
+
+    def save(self, path, mtime, size, image):
+        buf = io.BytesIO()
+        if image.mode == 'RGBA':
+            image.save(buf, 'PNG')
+        else:
+            image.save(buf, 'JPEG', quality=85)
+        with self._writes_lock:
+            self._writes.append((path, mtime, size, buf.getvalue()))
+            if len(self._writes) >= self.BATCH:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        rows, self._writes = self._writes, []
+        self.db.executemany(
+            'INSERT OR REPLACE INTO thumbnails (path, mtime, size, data, upright) VALUES (?, ?, ?, ?, 1)', rows)
+
+    def flush(self):
+        with self._writes_lock:
+            self._flush_locked()
+
+
+class ThumbnailGrid:
+    """Virtualized, scrollable thumbnail grid over the live playlist.
+
+    Only the cells in the viewport are drawn, and thumbnails are generated
+    for those rows first and then GRID_ROWS_AHEAD rows either side; requests
+    for rows that scrolled away are dropped before a worker picks them up.
+    Cell positions are derived from the scroll offset each frame and the
+    thumbnail surfaces live in a bounded LRU, so cost stays the same for a
+    hundred images or a million.
+    """
+
+    GAP = 8
+    BG = (12, 12, 14)
+    CELL_BG = (30, 30, 36)
+    FAILED = (70, 40, 40)
+    CURRENT = (0, 255, 0)
+    HOVER = (100, 200, 255)
+
+    def __init__(self, paths, win_size, top, store):
+        self.paths = paths
+        self.win_size = win_size
+        self.top = top
+        self.store = store
+        w, h = win_size
+        self.cols = max(1, (w - self.GAP) // GRID_CELL)
+        self.left = (w - self.cols * GRID_CELL) // 2
+        self.view_h = h - top
+        self.scroll = 0.0
+        self.target = 0.0
+        self.cache = OrderedDict()
+        self.cache_limit = GRID_THUMB_CACHE
+        self.failed = set()
+        self.inflight = set()
+        self.inflight_lock = threading.Lock()
+        self.generated = 0
+        self.from_cache = 0
+        self.pool = BackgroundPool(self._make, workers=3, name='thumbs')
+
+    def _make(self, path):
+        try:
+            mtime = source_mtime(path)
+            image = self.store.load(path, mtime, GRID_THUMB)
+            cached = image is not None
+            if image is None:
+                image = make_thumbnail(path)
+                self.store.save(path, mtime, GRID_THUMB, image)
+            return image.tobytes(), image.size, image.mode, cached
+        except Exception:
+            return None
+        finally:
+            with self.inflight_lock:
+                self.inflight.discard(path)
+
+    @property
+    def max_scroll(self):
+        rows = -(-len(self.paths) // self.cols)
+        return max(0, rows * GRID_CELL + self.GAP - self.view_h)
+
+    def scroll_by(self, dy):
+        self.target = min(max(self.target + dy, 0), self.max_scroll)
+
+    def scroll_to(self, index):
+        """Jump (without animating) so the row holding ``index`` is centred."""
+        row = index // self.cols
+        self.target = min(max(row * GRID_CELL - (self.view_h - GRID_CELL) / 2, 0), self.max_scroll)
+        self.scroll = self.target
+
+    def cell_rect(self, index):
+        row, col = divmod(index, self.cols)
+        return pygame.Rect(self.left + col * GRID_CELL + self.GAP // 2,
+                           self.top + row * GRID_CELL + self.GAP - int(self.scroll),
+                           GRID_CELL - self.GAP, GRID_CELL - self.GAP)
+
+    def index_at(self, pos):
+        x, y = pos
+        if y < self.top or x < self.left:
+            return None
+        col = (x - self.left) // GRID_CELL
+        row = int((y - self.top - self.GAP + self.scroll) // GRID_CELL)
+        index = row * self.cols + col
+        if col >= self.cols or row < 0 or index >= len(self.paths):
+            return None
+        return index if self.cell_rect(index).collidepoint(pos) else None
+
+    def want(self, paths):
+        """Generate exactly these thumbnails next, in order; stale requests are dropped."""
+        with self.inflight_lock:
+            self.inflight.difference_update(self.pool.clear())
+            for path in paths:
+                if path not in self.inflight:
+                    self.inflight.add(path)
+                    self.pool.submit(path)
+
+    def poll(self, max_items=16):
+        # Bounded so a burst of finished thumbnails can't stall one frame.
+        for path, result in self.pool.drain(max_items):
+            if result is None:
+                self.failed.add(path)
+                continue
+            data, size, mode, cached = result
+            surf = pygame.image.frombytes(data, size, mode)
+            self.cache[path] = surf.convert_alpha() if mode == 'RGBA' else surf.convert()
+            self.cache.move_to_end(path)
+            self.from_cache += cached
+            self.generated += not cached
+        self.trim()
+
+    def trim(self):
+        """Evict least recently drawn thumbnails down to ``cache_limit``; returns bytes freed."""
+        freed = 0
+        while len(self.cache) > self.cache_limit:
+            _, old = self.cache.popitem(last=False)
+            freed += surface_nbytes(old)
+        return freed
+
+    def nbytes(self):
+        return sum(surface_nbytes(surf) for surf in self.cache.values())
+
+    def _rows_missing(self, rows, out):
+        n = len(self.paths)
+        for row in rows:
+            for index in range(row * self.cols, min(n, (row + 1) * self.cols)):
+                path = self.paths[index]
+                if path not in self.cache and path not in self.failed:
+                    out.append(path)
+
+    def draw(self, surface, current_index, hover_index=None):
+        self.poll()
+        # Ease towards the scroll target so wheel steps animate smoothly.
+        if abs(self.target - self.scroll) < 0.5:
+            self.scroll = self.target
+        else:
+            self.scroll += (self.target - self.scroll) * 0.35
+
+        n = len(self.paths)
+        w, h = self.win_size
+        surface.fill(self.BG)
+        first_row = int((self.scroll - self.GAP) // GRID_CELL)
+        last_row = int((self.scroll + self.view_h) // GRID_CELL)
+        total_rows = -(-n // self.cols)
+        visible = range(max(0, first_row), min(total_rows, last_row + 1))
+
+        missing = []
+        surface.set_clip(pygame.Rect(0, self.top, w, self.view_h))
+        for row in visible:
+            for index in range(row * self.cols, min(n, (row + 1) * self.cols)):
+                path = self.paths[index]
+                rect = self.cell_rect(index)
+                thumb = self.cache.get(path)
+                if thumb is not None:
+                    self.cache.move_to_end(path)
+                    surface.blit(thumb, thumb.get_rect(center=rect.center))
+                else:
+                    pygame.draw.rect(surface, self.FAILED if path in self.failed else self.CELL_BG, rect)
+                    if path not in self.failed:
+                        missing.append(path)
+                if index == current_index:
+                    pygame.draw.rect(surface, self.CURRENT, rect.inflate(4, 4), 2)
+                elif index == hover_index:
+                    pygame.draw.rect(surface, self.HOVER, rect.inflate(4, 4), 2)
+        surface.set_clip(None)
+
+        # Then the rows just off screen, below first since that's the usual direction.
+        self._rows_missing(range(visible.stop, min(total_rows, visible.stop + GRID_ROWS_AHEAD)), missing)
+        self._rows_missing(range(visible.start - 1, max(-1, visible.start - 1 - GRID_ROWS_AHEAD), -1), missing)
+        self.want(missing)
+
+        if self.max_scroll > 0:
+            bar_h = max(24, int(self.view_h * self.view_h / (self.max_scroll + self.view_h)))
+            bar_y = self.top + int((self.view_h - bar_h) * self.scroll / self.max_scroll)
+            pygame.draw.rect(surface, (90, 90, 100), (w - 6, bar_y, 4, bar_h), border_radius=2)
+
+    def close(self):
+        self.pool.stop()
+        self.cache.clear()
+        self.store.flush()
+
+
+SEARCH_LIMIT = 50
+SEARCH_BUDGET_MS = 40
+# Trigrams this common say little about a typo'd query and are costly to count.
+FUZZY_MAX_POSTINGS = 20000
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FilenameIndex:
+    """Trigram index over the file names of a playlist snapshot.
+
+    Built once in a background thread; until it's ready, searches fall back
+    to a scan bounded by SEARCH_BUDGET_MS. Paths added to the playlist later
+    are appended with ``extend`` and indexed by the same thread, and the
+    not-yet-indexed tail is scanned directly. Results are positions in
+    ``paths`` (the snapshot), which the caller maps back to the live list.
+    """
+
+    CHUNK = 20000
+    # Candidate lists longer than this are intersected before checking names.
+    VERIFY_DIRECT = 5000
+    FUZZY_RESCORE = 500
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.postings = {}
+        self.indexed = 0  # positions below this are in ``postings``
+        self.ready = False
+        self.build_ms = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._build, name='search-index', daemon=True)
+        self._thread.start()
+
+    def extend(self, paths):
+        """Append paths added to the playlist; they are indexed in the background."""
+        with self._lock:
+            self.paths.extend(paths)
+            if self._thread is None:
+                self._start()
+
+    @traced('build search index')
+    def _build(self):
+        began = time.perf_counter()
+        postings = self.postings
+        while True:
+            with self._lock:
+                end = len(self.paths)
+                if self.indexed >= end:
+                    self._thread = None
+                    break
+            for start in range(self.indexed, end, self.CHUNK):
+                # Collect a chunk in lists, then append it to compact uint32 arrays.
+                chunk = {}
+                stop = min(start + self.CHUNK, end)
+                for i in range(start, stop):
+                    for gram in trigrams(self.name(i)):
+                        ids = chunk.get(gram)
+                        if ids is None:
+                            chunk[gram] = [i]
+                        else:
+                            ids.append(i)
+                for gram, ids in chunk.items():
+                    ids_array = postings.get(gram)
+                    if ids_array is None:
+                        postings[gram] = array('I', ids)
+                    else:
+                        ids_array.extend(ids)
+                self.indexed = stop
+                # Give the render thread the GIL between chunks.
+                time.sleep(0)
+            if not self.ready:
+                self.build_ms = (time.perf_counter() - began) * 1000
+                self.ready = True
+
+    def name(self, i):
+        return os.path.basename(self.paths[i]).lower()
+
+    def search(self, query, limit=SEARCH_LIMIT, budget_ms=SEARCH_BUDGET_MS):
+        """Substring matches on the file name, then fuzzy (shared-trigram) ones.
+
+        Returns ``(positions, complete)``; ``complete`` is False if the time
+        budget ran out before every candidate was checked.
+        """
+        q = query.lower()
+        if not q:
+            return [], True
+        deadline = time.perf_counter() + budget_ms / 1000
+        grams = trigrams(q)
+        hits = []
+        complete = True
+        if self.ready and grams:
+            # Every substring match is in all of the query's posting lists.
+            # Common queries fill up from the head of the shortest one; if
+            # they don't, intersect the rest with the next few lists so
+            # fewer names need checking.
+            lists = sorted((self.postings.get(g, ()) for g in grams), key=len)
+            head = lists[0][:self.VERIFY_DIRECT]
+            complete = self._verify(q, head, hits, limit, deadline)
+            if complete and len(hits) < limit and len(lists[0]) > len(head):
+                common = set(lists[0][len(head):])
+                for ids in lists[1:4]:
+                    if len(ids) > 4 * len(common):
+                        break
+                    common.intersection_update(ids)
+                complete = self._verify(q, sorted(common), hits, limit, deadline)
+        else:
+            complete = self._verify(q, range(len(self.paths)), hits, limit, deadline)
+        if self.ready and grams and complete and len(hits) < limit and self.indexed < len(self.paths):
+            # Paths appended since the last pass aren't (all) in the postings yet.
+            seen = set(hits)
+            tail = (i for i in range(self.indexed, len(self.paths)) if i not in seen)
+            complete = self._verify(q, tail, hits, limit, deadline)
+        if len(hits) < limit and self.ready and len(grams) >= 2:
+            hits.extend(self._fuzzy(grams, set(hits), limit - len(hits), deadline))
+        return hits, complete
+
+    def _verify(self, q, candidates, hits, limit, deadline):
+        """Append candidates whose name contains ``q``; False if out of time."""
+        for n, i in enumerate(candidates):
+            if q in self.name(i):
+                hits.append(i)
+                if len(hits) >= limit:
+                    return True
+            if n & 1023 == 1023 and time.perf_counter() > deadline:
+                return False
+        return True
+
+    def _fuzzy(self, grams, exclude, limit, deadline):
+        counts = Counter()
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is not None and len(ids) <= FUZZY_MAX_POSTINGS:
+                counts.update(ids)
+        for i in exclude:
+            counts.pop(i, None)
+        # Shortlist by shared rare trigrams, then rank by similarity over all of them.
+        scored = []
+        for i, _ in heapq.nlargest(self.FUZZY_RESCORE, counts.items(), key=lambda item: item[1]):
+            if time.perf_counter() > deadline:
+                break
+            name_grams = trigrams(self.name(i))
+            similarity = len(grams & name_grams) / len(grams | name_grams)
+            if similarity >= 0.3:
+                scored.append((-similarity, len(self.paths[i]), i))
+        scored.sort()
+        return [i for _, _, i in scored[:limit]]
+
+
+def is_format_error(e):
+    """True if ``e`` says the bytes aren't a usable image, False if reading them failed.
+
+    Pillow reports bad data as OSError without an errno (or SyntaxError,
+    ValueError and the like). An errno, a timeout, a dropped connection or
+    running out of memory may all go away on the next try.
+    """
+    while e is not None:
+        if isinstance(e, (MemoryError, TimeoutError, ConnectionError, http.client.HTTPException)):
+            return False
+        if isinstance(e, OSError) and e.errno is not None:
+            return False
+        e = e.__cause__
+    return True
+
+
+def probe_image_header(path):
+    """Return None if ``path`` opens as an image, otherwise a short reason.
+
+    'missing' and 'unreadable' (the read failed, not the image) may change
+    on the next run, so they aren't remembered past this one.
+    """
+    try:
+        with Image.open(open_source(path)) as im:
+            w, h = im.size
+        if w <= 0 or h <= 0:
+            return 'empty image'
+    except FileNotFoundError:
+        return 'missing'
+    except Exception as e:
+        if not is_format_error(e):
+            return 'unreadable'
+        return str(e) or type(e).__name__
+    return None
+
+
+class HeaderValidator:
+    """Probes headers ahead of the playhead and remembers known-bad files.
+
+    Bad paths are persisted with their mtime, so a broken file is skipped
+    without a probe on later runs until it is modified. Missing files and
+    failed reads are only remembered for the session.
+    """
+
+    AHEAD = 16
+    BEHIND = 4
+
+    def __init__(self, db, workers=2):
+        self.db = db
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS bad_files (path TEXT PRIMARY KEY, mtime REAL, error TEXT)')
+        self.known_bad = {path: mtime for path, mtime in
+                          self.db.execute('SELECT path, mtime FROM bad_files')}
+        self.bad = set()
+        self.good = set()
+        self.requested = set()
+        self.probed = 0
+        self.pool = BackgroundPool(self._check, workers, name='validator')
+
+    def is_bad(self, path):
+        return path in self.bad
+
+    def request(self, paths):
+        for path in paths:
+            if path not in self.requested:
+                self.requested.add(path)
+                self.pool.submit(path)
+
+    def _check(self, path):
+        try:
+            mtime = source_mtime(path)
+        except OSError:
+            return 'missing', None
+        if self.known_bad.get(path) == mtime:
+            return 'cached', mtime
+        return probe_image_header(path), mtime
+
+    def mark_bad(self, path, error, mtime=None, persist=True):
+        if path in self.bad:
+            return
+        self.bad.add(path)
+        self.good.discard(path)
+        if not persist:
+            return
+        if mtime is None:
+            if is_url(path):
+                # Not worth a request on the render loop; the validator persists URLs it probes.
+                return
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                return
+        if self.known_bad.get(path) != mtime:
+            self.known_bad[path] = mtime
+            self.db.executemany(
+                'INSERT OR REPLACE INTO bad_files (path, mtime, error) VALUES (?, ?, ?)',
+                [(path, mtime, error)])
+
+    def drain(self):
+        for path, (error, mtime) in self.pool.drain():
+            self.probed += 1
+            if error is None:
+                self.good.add(path)
+                if path in self.known_bad:
+                    del self.known_bad[path]
+                    self.db.execute('DELETE FROM bad_files WHERE path = ?', (path,))
+            elif error == 'cached':
+                self.bad.add(path)
+            elif error in ('missing', 'unreadable'):
+                self.bad.add(path)
+            else:
+                self.mark_bad(path, error, mtime)
+
+    def stop(self):
+        self.pool.stop()
+
+
+def path_key(path):
+    if is_url(path):
+        return path
+    return os.path.normcase(os.path.normpath(path))
+
+
+def dedupe_paths(paths):
+    """Drop repeated paths (after normalising case and separators), keeping order."""
+    seen = set()
+    out = []
+    for p in paths:
+        key = path_key(p)
+        if key not in seen:
+            seen.add(key)
+            out.append(p)
+    return out
+
+
+PARTIAL_HASH_BYTES = 64 * 1024
+
+
+def partial_file_hash(path, size):
+    """Hash the first and last 64 KiB; cheap filter before hashing whole files."""
+    h = hashlib.blake2b(digest_size=16)
+    with open_binary(path) as f:
+        h.update(f.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            h.update(f.read(PARTIAL_HASH_BYTES))
+    return h.hexdigest()
+
+
+def full_file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open_binary(path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+PERCEPTUAL_MAX_DISTANCE = 4
+
+
+def perceptual_hash(path):
+    """Difference hash (dHash) of the first frame plus its coarse average colour.
+
+    Returns ``"<64-bit dhash hex>-<colour>"``. The colour part keeps flat
+    images of different colours (which all dHash to zero) apart.
+    """
+    with Image.open(open_source(path)) as im:
+        im.draft('RGB', (64, 64))
+        rgb = im.convert('RGB')
+    small = rgb.convert('L').resize((9, 8), Image.Resampling.BILINEAR)
+    r, g, b = rgb.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    px = small.tobytes()
+    bits = 0
+    for y in range(8):
+        row = px[y * 9:(y + 1) * 9]
+        for x in range(8):
+            bits = (bits << 1) | (row[x] > row[x + 1])
+    return f"{bits:016x}-{r >> 5}{g >> 5}{b >> 5}"
+
+
+class Deduplicator:
+    """Finds byte-identical (or perceptually identical) files in the background.
+
+    Content mode narrows candidates in stages: files are bucketed by size,
+    same-size files get a partial hash, and only partial collisions are
+    fully hashed. Perceptual mode dHashes every file instead. Workers do the
+    I/O; the bucket bookkeeping runs in ``drain()`` on the render loop, so
+    paths can keep streaming in. Hashes are cached by path+mtime.
+    """
+
+    def __init__(self, db, mode='content', workers=4):
+        self.db = db
+        self.mode = mode
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS file_hashes ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER, '
+            'partial TEXT, full TEXT, dhash TEXT)')
+        self.info = {}          # path -> [mtime, size, partial, full, dhash]
+        self.by_size = {}
+        self.by_partial = {}
+        self.kept = {}          # full hash or dhash -> first path seen
+        self.bands = {}         # (band index, band bits, colour) -> dhashes
+        self.order = {}
+        self.duplicates = []
+        self.hashed = 0
+        self.cached = 0
+        self._dirty = set()
+        self.pool = BackgroundPool(self._work, workers, name='dedupe')
+
+    @property
+    def done(self):
+        return self.pool.idle
+
+    def submit(self, paths):
+        for p in paths:
+            if p not in self.order:
+                self.order[p] = len(self.order)
+                self.pool.submit(('stat', p, None))
+
+    def _work(self, job):
+        kind, path, info = job
+        try:
+            if kind == 'stat':
+                if is_url(path):
+                    mtime = source_mtime(path)
+                    size = source_size(path)
+                else:
+                    st = os.stat(path)
+                    mtime, size = st.st_mtime, st.st_size
+                rows = self.db.execute(
+                    'SELECT mtime, size, partial, full, dhash FROM file_hashes WHERE path = ?', (path,))
+                if rows and rows[0][0] == mtime and rows[0][1] == size:
+                    return list(rows[0]), True
+                return [mtime, size, None, None, None], False
+            if kind == 'partial':
+                return partial_file_hash(path, info[1])
+            if kind == 'full':
+                return full_file_hash(path)
+            return perceptual_hash(path)
+        except Exception:
+            return None
+
+    def _need(self, path, kind, slot):
+        info = self.info[path]
+        if info[slot] is None:
+            self.pool.submit((kind, path, info))
+            return False
+        return True
+
+    def _perceptual_key(self, dhash):
+        """Map a dHash onto an already-kept hash within PERCEPTUAL_MAX_DISTANCE bits.
+
+        The 64 bits are split into four 16-bit bands; two hashes that differ
+        in at most four bits share at least one band exactly, so only paths
+        in a matching band bucket need a popcount.
+        """
+        bits_hex, colour = dhash.split('-')
+        bits = int(bits_hex, 16)
+        bands = [(i, (bits >> (16 * i)) & 0xFFFF, colour) for i in range(4)]
+        for band in bands:
+            for other in self.bands.get(band, ()):
+                if bin(bits ^ other).count('1') <= PERCEPTUAL_MAX_DISTANCE:
+                    return ('d', other, colour)
+        for band in bands:
+            self.bands.setdefault(band, []).append(bits)
+        return ('d', bits, colour)
+
+    def _claim(self, key, path):
+        """Record ``path`` under a content key; returns True if it duplicates an earlier path."""
+        if key[0] == 'd':
+            key = self._perceptual_key(key[1])
+        kept = self.kept.get(key)
+        if kept is None or kept == path:
+            self.kept[key] = path
+            return False
+        # Keep whichever path came first in the playlist.
+        if self.order[path] < self.order[kept]:
+            self.kept[key] = path
+            path = kept
+        self.duplicates.append(path)
+        return True
+
+    def _on_stat(self, path):
+        if self.mode == 'perceptual':
+            if self._need(path, 'dhash', 4):
+                self._claim(('d', self.info[path][4]), path)
+            return
+        bucket = self.by_size.setdefault(self.info[path][1], [])
+        bucket.append(path)
+        if len(bucket) > 1:
+            for p in bucket:
+                if p == path or len(bucket) == 2:
+                    if self._need(p, 'partial', 2):
+                        self._on_partial(p)
+
+    def _on_partial(self, path):
+        info = self.info[path]
+        bucket = self.by_partial.setdefault((info[1], info[2]), [])
+        if path in bucket:
+            return
+        bucket.append(path)
+        if len(bucket) > 1:
+            for p in bucket:
+                if p == path or len(bucket) == 2:
+                    if self._need(p, 'full', 3):
+                        self._claim(('f', self.info[p][3]), p)
+
+    def drain(self):
+        """Process finished jobs; returns the duplicate paths found since the last call."""
+        for (kind, path, _), result in self.pool.drain():
+            if result is None:
+                continue
+            if kind == 'stat':
+                self.info[path], cached = result
+                self.cached += cached
+                self._on_stat(path)
+                continue
+            self.hashed += 1
+            self._dirty.add(path)
+            if kind == 'partial':
+                self.info[path][2] = result
+                self._on_partial(path)
+            elif kind == 'full':
+                self.info[path][3] = result
+                self._claim(('f', result), path)
+            else:
+                self.info[path][4] = result
+                self._claim(('d', result), path)
+        if len(self._dirty) >= 200 or (self._dirty and self.done):
+            self.flush()
+        found, self.duplicates = self.duplicates, []
+        return found
+
+    def flush(self):
+        rows = [(p,) + tuple(self.info[p]) for p in self._dirty]
+        self._dirty = set()
+        self.db.executemany(
+            'INSERT OR REPLACE INTO file_hashes (path, mtime, size, partial, full, dhash) '
+            'VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def stop(self):
+        self.pool.stop()
+        if self._dirty:
+            self.flush()
+
+
+# inotify(7) event bits
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+
+class ListFileWatcher:
+    """Watches a list file and reports which image paths were added or removed.
+
+    Uses inotify on Linux, watching the parent folder so jobs that replace the
+    file by rename are caught, and stat polling everywhere else. The file is
+    re-read on this thread once it stops changing; only the diff is handed to
+    the render loop through ``changes``.
+    """
+
+    POLL_INTERVAL = 2.0
+    SETTLE = 0.5
+
+    def __init__(self, path, paths):
+        self.path = path
+        self.known = set(paths)
+        self.changes = queue.Queue()
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._fd = self._open_inotify()
+        self.mode = 'inotify' if self._fd is not None else 'polling'
+        threading.Thread(target=self._run, name='list-watcher', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except OSError:
+            return None
+
+    def _open_inotify(self):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            if libc.inotify_add_watch(fd, os.fsencode(os.path.dirname(self.path)), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _wait_inotify(self, timeout):
+        """Return True if an event for our file arrived within ``timeout``."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return False
+        name = os.fsencode(os.path.basename(self.path))
+        hit = False
+        offset = 0
+        while offset + 16 <= len(data):
+            _wd, _mask, _cookie, length = struct.unpack_from('iIII', data, offset)
+            if data[offset + 16:offset + 16 + length].rstrip(b'\0') == name:
+                hit = True
+            offset += 16 + length
+        return hit
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if self._fd is not None:
+                    if not self._wait_inotify(1.0):
+                        continue
+                elif self._stop.wait(self.POLL_INTERVAL):
+                    break
+                signature = self._stat()
+                if signature is None or signature == self._signature:
+                    continue
+                # Let the writer finish before reading a half-written list.
+                while not self._stop.wait(self.SETTLE):
+                    latest = self._stat()
+                    if latest == signature:
+                        break
+                    signature = latest
+                self._signature = signature
+                if signature is not None:
+                    self._reload()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+
+    def _reload(self):
+        try:
+            signature = file_signature(self.path)
+            content, enc = read_list_text(self.path)
+        except OSError as e:
+            print(f"{Fore.YELLOW}Warning: could not re-read {self.path}: {e}")
+            return
+        paths, line_count = filter_image_lines(content)
+        ListIndex.write(self.path, paths, enc, line_count, signature)
+        current = set(paths)
+        added = [p for p in dict.fromkeys(paths) if p not in self.known]
+        removed = self.known - current
+        self.known = current
+        if added or removed:
+            self.changes.put((added, removed))
+
+
+init(autoreset=True)
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [("cb", ctypes.c_ulong),
+                ("PageFaultCount", ctypes.c_ulong),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t)]
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None if it can't be read."""
+    if os.name == 'nt':
+        try:
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        except Exception:
+            pass
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+MEMORY_CHECK_MS = 500
+
+
+_malloc_trim = None
+
+
+def trim_heap():
+    """Hand freed heap memory back to the OS where the allocator allows it (glibc)."""
+    global _malloc_trim
+    if _malloc_trim is None:
+        try:
+            _malloc_trim = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6').malloc_trim
+        except (OSError, AttributeError, TypeError):
+            _malloc_trim = False
+    if _malloc_trim:
+        _malloc_trim(0)
+
+
+class MemoryGovernor:
+    """Tracks RSS against a ceiling and decides how hard to shed image memory.
+
+    Level 1 shrinks read-ahead and the thumbnail/tile caches; level 2 also
+    drops full-resolution originals once slides are scaled and closes their
+    source files. Each check over the ceiling raises the level by one, and
+    it steps back down once RSS falls below RELAX of the ceiling.
+    """
+
+    RELAX = 0.8
+    MAX_LEVEL = 2
+
+    def __init__(self, ceiling=None):
+        self.ceiling = ceiling
+        self.level = 0
+        self.rss = None
+        self.peak = 0
+        self.evictions = 0
+        self.freed = 0
+        self.last_check = 0
+
+    def check(self):
+        """Sample RSS; returns +1/-1 if the pressure level changed, else 0."""
+        self.rss = process_rss()
+        if self.rss is None:
+            return 0
+        self.peak = max(self.peak, self.rss)
+        if not self.ceiling:
+            return 0
+        if self.rss > self.ceiling and self.level < self.MAX_LEVEL:
+            self.level += 1
+            print(f"{Fore.YELLOW}Memory: RSS {self.rss // (1024 * 1024)} MB is over the "
+                  f"{self.ceiling // (1024 * 1024)} MB limit, pressure level {self.level}")
+            return 1
+        if self.rss < self.ceiling * self.RELAX and self.level > 0:
+            self.level -= 1
+            print(f"{Fore.CYAN}Memory: RSS back to {self.rss // (1024 * 1024)} MB, pressure level {self.level}")
+            return -1
+        return 0
+
+    def log_eviction(self, what, nbytes):
+        if nbytes <= 0:
+            return
+        self.evictions += 1
+        self.freed += nbytes
+        print(f"{Fore.YELLOW}Memory: evicted {what} ({nbytes / (1024 * 1024):.1f} MB)")
+
+
+SOAK_SPEED = 60
+SOAK_MAX_GROWTH_MB = 64
+SOAK_SAMPLES = 240
+# Share of a soak run spent letting caches fill before growth is measured.
+SOAK_WARMUP = 0.25
+# Growth allowed over the measured part of a soak run, besides RSS.
+SOAK_LIMITS = {'fds': 8, 'threads': 4, 'surfaces': 32, 'images': 32}
+SOAK_BURSTS = ('skip', 'wheel', 'grid', 'inspect', 'search', 'pause', 'stats', 'hide', 'focus')
+SOAK_BURST_GAP_MS = (1000, 4000)
+# Wait after a burst's last event before sampling, so e.g. the grid has closed.
+SOAK_SETTLE_MS = 1000
+
+
+def open_fd_count():
+    """Open file descriptors of this process, or None where they can't be listed."""
+    for fd_dir in ('/proc/self/fd', '/dev/fd'):
+        try:
+            # Listing the directory holds one descriptor open itself.
+            return len(os.listdir(fd_dir)) - 1
+        except OSError:
+            continue
+    return None
+
+
+def retained_images(root):
+    """Count the pygame surfaces and PIL images reachable from ``root``.
+
+    Walks containers and this module's objects only, so the counts are what
+    the slideshow itself holds on to. Lists of paths and numbers are skipped
+    without being scanned.
+    """
+    surfaces = images = 0
+    seen = set()
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, pygame.Surface):
+            surfaces += 1
+        elif isinstance(obj, Image.Image):
+            images += 1
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, deque, set, frozenset)):
+            if obj and isinstance(next(iter(obj)), (str, bytes, int, float)):
+                continue
+            stack.extend(obj)
+        elif type(obj).__module__ == __name__ and hasattr(obj, '__dict__'):
+            stack.extend(vars(obj).values())
+    return surfaces, images
+
+
+def soak_key(key, char=''):
+    return pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=char, scancode=0)
+
+
+def soak_button(kind, button, pos):
+    return pygame.event.Event(kind, button=button, pos=pos)
+
+
+class SoakHarness:
+    """Headless endurance run that drives a real slideshow and watches it for leaks.
+
+    Slides advance ``speed`` times faster than the requested duration. Every
+    few seconds a random burst of input is posted: skipping, wheel spins, the
+    grid, inspect mode, search, pause, the stats overlay, minimise/restore or
+    focus changes. The RNG is seeded, so a failing run can be replayed.
+    Between bursts the harness samples RSS, open file descriptors, threads
+    and the surfaces and PIL images the slideshow retains. The first
+    SOAK_WARMUP of the run lets caches fill. After that, growth from the start
+    to the end of the run beyond the limits fails it.
+    """
+
+    def __init__(self, minutes, speed=SOAK_SPEED, max_growth_mb=SOAK_MAX_GROWTH_MB,
+                 log_path=None, seed=None):
+        self.run_ms = int(minutes * 60000)
+        self.speed = speed
+        self.limits = dict(SOAK_LIMITS, rss_mb=max_growth_mb)
+        self.log_path = log_path
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        self.sample_ms = max(1000, self.run_ms // SOAK_SAMPLES)
+        self.samples = []
+        self.steps = deque()
+        self.bursts = Counter()
+        self.started = None
+        self.next_burst = 0
+        self.next_sample = 0
+        self.settled = 0
+
+    def poll(self, show, now):
+        """Called by the render loop every frame: post due input, sample, stop at the end."""
+        if self.started is None:
+            self.started = now
+            self.next_burst = now + SOAK_BURST_GAP_MS[0]
+            self.next_sample = now
+            if self.log_path:
+                with open(self.log_path, 'w', encoding='utf-8') as f:
+                    f.write('seconds,slides,rss_mb,fds,threads,surfaces,images,held_mb\n')
+        if now - self.started >= self.run_ms:
+            self.sample(show, now)
+            show.running = False
+            return
+        while self.steps and self.steps[0][0] <= now:
+            _, step = self.steps.popleft()
+            event = step(show) if callable(step) else step
+            if event is not None:
+                pygame.event.post(event)
+            self.settled = now + SOAK_SETTLE_MS
+        if self.steps or now < self.settled:
+            # Mid-burst state (grid open, window minimised...) isn't comparable.
+            return
+        if now >= self.next_sample:
+            self.sample(show, now)
+            self.next_sample = now + self.sample_ms
+        if now >= self.next_burst:
+            self.queue_burst(show, now)
+            self.next_burst = now + self.rng.randint(*SOAK_BURST_GAP_MS)
+
+    def queue_burst(self, show, now):
+        rng = self.rng
+        kind = rng.choice(SOAK_BURSTS)
+        self.bursts[kind] += 1
+        w, h = show.display_surface.get_size()
+        # Below the title bar, away from the buttons and duration control.
+        center = (w // 2, (h + 50) // 2)
+        steps = []
+        if kind == 'skip':
+            key = rng.choice((pygame.K_LEFT, pygame.K_RIGHT))
+            steps += [(rng.randint(15, 90), soak_key(key)) for _ in range(rng.randint(2, 25))]
+        elif kind == 'wheel':
+            button = rng.choice((4, 5))
+            steps += [(rng.randint(5, 40), soak_button(pygame.MOUSEBUTTONDOWN, button, center))
+                      for _ in range(rng.randint(3, 30))]
+        elif kind == 'grid':
+            steps.append((0, soak_key(pygame.K_g)))
+            keys = (pygame.K_DOWN, pygame.K_UP, pygame.K_PAGEDOWN, pygame.K_PAGEUP, pygame.K_HOME, pygame.K_END)
+            steps += [(rng.randint(50, 400), soak_key(rng.choice(keys))) for _ in range(rng.randint(1, 8))]
+            if rng.random() < 0.5:
+                steps += [(300, soak_button(pygame.MOUSEBUTTONDOWN, 1, center)),
+                          (60, soak_button(pygame.MOUSEBUTTONUP, 1, center))]
+            steps.append((300, lambda s: soak_key(pygame.K_g) if s.grid else None))
+        elif kind == 'inspect':
+            steps.append((0, soak_key(pygame.K_z)))
+            steps += [(rng.randint(30, 200), soak_button(pygame.MOUSEBUTTONDOWN, rng.choice((4, 4, 5)), center))
+                      for _ in range(rng.randint(1, 10))]
+            steps.append((100, soak_button(pygame.MOUSEBUTTONDOWN, 1, center)))
+            x, y = center
+            for _ in range(rng.randint(1, 10)):
+                x += rng.randint(-120, 120)
+                y += rng.randint(-120, 120)
+                steps.append((30, pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y), rel=(0, 0), buttons=(1, 0, 0))))
+            steps.append((30, soak_button(pygame.MOUSEBUTTONUP, 1, (x, y))))
+            steps.append((rng.randint(200, 1500), lambda s: soak_key(pygame.K_z) if s.inspect else None))
+        elif kind == 'search':
+            steps.append((0, soak_key(pygame.K_SLASH, '/')))
+            if rng.random() < 0.3:
+                query = str(rng.randint(1, len(show.image_paths)))
+            else:
+                name = os.path.basename(show.image_paths[rng.randrange(len(show.image_paths))])
+                query = name[:rng.randint(1, 6)]
+            steps += [(rng.randint(40, 200), soak_key(0, ch)) for ch in query]
+            steps.append((300, soak_key(rng.choice((pygame.K_RETURN, pygame.K_ESCAPE)))))
+            steps.append((100, lambda s: soak_key(pygame.K_ESCAPE) if s.search_open else None))
+        elif kind in ('pause', 'stats'):
+            key = pygame.K_SPACE if kind == 'pause' else pygame.K_i
+            steps += [(0, soak_key(key)), (rng.randint(300, 3000), soak_key(key))]
+        elif kind == 'hide':
+            steps += [(0, pygame.event.Event(pygame.WINDOWMINIMIZED)),
+                      (rng.randint(1000, 5000), pygame.event.Event(pygame.WINDOWRESTORED))]
+        else:
+            steps += [(0, pygame.event.Event(pygame.WINDOWFOCUSLOST)),
+                      (rng.randint(500, 3000), pygame.event.Event(pygame.WINDOWFOCUSGAINED))]
+        due = now
+        for delay, step in steps:
+            due += delay
+            self.steps.append((due, step))
+
+    def sample(self, show, now):
+        surfaces, images = retained_images(show)
+        # Count what is live, not what the allocator is holding on to after a big decode.
+        trim_heap()
+        rss = process_rss()
+        row = {
+            'seconds': (now - self.started) / 1000,
+            'slides': show.load_to_screen.count,
+            'rss_mb': rss / (1024 * 1024) if rss is not None else None,
+            'fds': open_fd_count(),
+            'threads': threading.active_count(),
+            'surfaces': surfaces,
+            'images': images,
+            'held_mb': sum(show.memory_footprint().values()) / (1024 * 1024),
+        }
+        self.samples.append(row)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(','.join('' if v is None else f"{v:.1f}" if isinstance(v, float) else str(v)
+                                 for v in row.values()) + '\n')
+
+    def report(self):
+        """Print growth per metric; return True if every one stayed within its limit."""
+        last = self.samples[-1] if self.samples else {'seconds': 0, 'slides': 0}
+        bursts = ", ".join(f"{kind} {n}" for kind, n in self.bursts.most_common())
+        print(f"{Fore.CYAN}Soak: {last['seconds'] / 60:.1f} min, {last['slides']} slides, "
+              f"{sum(self.bursts.values())} input bursts ({bursts or 'none'}), seed {self.seed}")
+        measured = self.samples[int(len(self.samples) * SOAK_WARMUP):]
+        if len(measured) < 4:
+            print(f"{Fore.RED}Soak run too short to measure growth ({len(self.samples)} samples).")
+            return False
+        window = max(2, len(measured) // 5)
+        ok = True
+        for name in ('rss_mb', 'fds', 'threads', 'surfaces', 'images'):
+            values = [row[name] for row in measured if row[name] is not None]
+            if len(values) < 2 * window:
+                continue
+            start = sorted(values[:window])[window // 2]
+            end = sorted(values[-window:])[window // 2]
+            growth = end - start
+            limit = self.limits[name]
+            passed = growth <= limit
+            ok = ok and passed
+            color = Fore.GREEN if passed else Fore.RED
+            print(f"{color}  {name}: {start:.0f} -> {end:.0f} ({growth:+.0f}, limit +{limit})"
+                  f"{'' if passed else '  GROWTH'}")
+        print(f"{Fore.GREEN if ok else Fore.RED}Soak {'passed' if ok else 'FAILED'}.")
+        return ok
+
+
+def soak_test(source, minutes, duration=30, speed=SOAK_SPEED, max_growth_mb=SOAK_MAX_GROWTH_MB,
+              log_path=None, seed=None, **options):
+    """Play ``source`` headlessly under a SoakHarness; return True if it passed."""
+    # Needs no display: switch SDL to its offscreen driver unless one was chosen.
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.quit()
+    pygame.display.init()
+    harness = SoakHarness(minutes, speed, max_growth_mb, log_path, seed)
+    print(f"{Fore.CYAN}Soak test: {minutes:g} min at {speed:g}x "
+          f"({duration * 1000 / speed:.0f} ms slides), seed {harness.seed}")
+    InstantSlideshow(file_path=source, duration=duration / speed, soak=harness, **options)
+    return harness.report()
+
+
+CONTROL_COMMANDS = ('next', 'prev', 'pause', 'resume', 'toggle-pause', 'jump', 'duration', 'load', 'metrics', 'trace')
+CONTROL_TIMEOUT = 2.0
+
+
+class ControlCommand:
+    """One request from the control API, applied by the render loop between frames."""
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.received = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.latency_ms = None
+        self.done = threading.Event()
+
+
+class ControlRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end: GET /status or /metrics, POST /<command>?arg=value.
+
+    Arguments may also be sent as a JSON object body. Commands wait until
+    their effect is on screen and report the latency, unless ``wait=0``.
+    Requests from web pages are refused: anything carrying an Origin
+    header, or a Host other than this loopback address (DNS rebinding).
+    """
+
+    server_version = 'InstantSlideshow'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _trusted(self):
+        """Reply 403 and return False unless the request comes from a local script."""
+        host, port = self.server.server_address[:2]
+        allowed = {f"{name}:{port}" for name in (host, '127.0.0.1', 'localhost')}
+        if self.headers.get('Origin') is not None:
+            self._reply(403, {'ok': False, 'error': 'cross-origin requests are not allowed'})
+            return False
+        if (self.headers.get('Host') or '').lower() not in allowed:
+            self._reply(403, {'ok': False, 'error': 'unexpected Host header'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._trusted():
+            return
+        path = urlparse(self.path).path
+        if path == '/status':
+            self._reply(200, self.server.control.snapshot())
+        elif path == '/metrics':
+            self._command('metrics', {})
+        else:
+            self._reply(404, {'ok': False, 'error': f"unknown endpoint {path}"})
+
+    def do_POST(self):
+        if not self._trusted():
+            return
+        url = urlparse(self.path)
+        name = url.path.strip('/')
+        if name not in CONTROL_COMMANDS:
+            self._reply(404, {'ok': False, 'error': f"unknown command {name}"})
+            return
+        args = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+            except (ValueError, UnicodeDecodeError):
+                self._reply(400, {'ok': False, 'error': 'body is not valid JSON'})
+                return
+            if isinstance(body, dict):
+                args.update(body)
+        self._command(name, args)
+
+    def _command(self, name, args):
+        wait = str(args.pop('wait', '1')).lower() not in ('0', 'false', 'no')
+        cmd = self.server.control.submit(name, args)
+        if not wait:
+            self._reply(202, {'ok': True, 'queued': name})
+        elif not cmd.done.wait(CONTROL_TIMEOUT):
+            self._reply(503, {'ok': False, 'error': 'slideshow did not respond'})
+        elif cmd.error:
+            self._reply(400, {'ok': False, 'error': cmd.error})
+        else:
+            self._reply(200, {'ok': True, 'command': name, 'result': cmd.result,
+                              'latency_ms': round(cmd.latency_ms, 1)})
+
+
+class ControlServer:
+    """Loopback HTTP control API running on its own threads.
+
+    Request threads never touch pygame or the playlist: commands are queued
+    for the render loop, and /status is served from a snapshot the loop
+    publishes every frame. Submitting a command also wakes the loop so it
+    doesn't sleep out the rest of the frame.
+    """
+
+    def __init__(self, port, host='127.0.0.1'):
+        self.commands = queue.Queue()
+        self.wakeup = threading.Event()
+        self._status = {'running': False}
+        self._status_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), ControlRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.control = self
+        self.address = self.httpd.server_address
+        threading.Thread(target=self.httpd.serve_forever, name='control', daemon=True).start()
+        print(f"{Fore.CYAN}Control API listening on http://{self.address[0]}:{self.address[1]}")
+
+    def submit(self, name, args):
+        cmd = ControlCommand(name, args)
+        self.commands.put(cmd)
+        self.wakeup.set()
+        return cmd
+
+    def drain(self):
+        out = []
+        try:
+            while True:
+                out.append(self.commands.get_nowait())
+        except queue.Empty:
+            pass
+        return out
+
+    def publish(self, status):
+        with self._status_lock:
+            self._status = status
+
+    def snapshot(self):
+        with self._status_lock:
+            return dict(self._status)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+SYNC_STATE_INTERVAL = 0.25
+SYNC_HELLO_INTERVAL = 1.0
+SYNC_TIMEOUT = 3.0
+
+
+def parse_host_port(text, default_host):
+    host, _, port = text.rpartition(':')
+    return (host or default_host), int(port)
+
+
+def seeded_order(paths, seed):
+    """Shuffle that comes out the same on every instance given the same paths and seed."""
+    order = sorted(paths)
+    random.Random(seed).shuffle(order)
+    return order
+
+
+class SyncLeader:
+    """UDP side of a video wall's leader instance.
+
+    Followers register by sending 'hello' datagrams, which are answered with
+    the leader's clock for offset estimation. The leader sends every live
+    follower its playback state (seed, playlist hash, index, and the
+    absolute advance deadline on its monotonic clock) whenever it changes,
+    and at least every SYNC_STATE_INTERVAL. Followers that join late simply
+    start receiving state.
+    """
+
+    role = 'leader'
+
+    def __init__(self, address):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.sock.settimeout(0.5)
+        self.address = self.sock.getsockname()
+        self.seed = random.getrandbits(32)
+        self.followers = {}
+        self._lock = threading.Lock()
+        self._joined = False
+        self._stop = False
+        self._last_state = None
+        self._last_sent = 0
+        self.sent = 0
+        threading.Thread(target=self._serve, name='sync-leader', daemon=True).start()
+        print(f"{Fore.CYAN}Sync leader listening on {self.address[0]}:{self.address[1]} (seed {self.seed})")
+
+    def _serve(self):
+        while not self._stop:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+                msg = json.loads(data.decode('utf-8'))
+            except socket.timeout:
+                continue
+            except (OSError, ValueError):
+                if self._stop:
+                    return
+                continue
+            if msg.get('t') != 'hello':
+                continue
+            with self._lock:
+                if addr not in self.followers:
+                    print(f"{Fore.CYAN}Sync: follower {addr[0]}:{addr[1]} joined")
+                    self._joined = True
+                self.followers[addr] = time.monotonic()
+            reply = {'t': 'pong', 'echo': msg.get('sent'), 'leader': time.monotonic()}
+            try:
+                self.sock.sendto(json.dumps(reply).encode('utf-8'), addr)
+            except OSError:
+                pass
 
+    def _changed(self, state):
+        last = self._last_state
+        if last is None or self._joined:
+            return True
+        for key, value in state.items():
+            if key == 'deadline' and value is not None and last.get(key) is not None:
+                # Recomputed from ms ticks every frame; ignore that jitter.
+                if abs(value - last[key]) > 0.005:
+                    return True
+            elif last.get(key) != value:
+                return True
+        return False
+
+    def publish(self, state):
+        """Send ``state`` to the live followers if it changed or is due for a resend."""
+        now = time.monotonic()
+        if not self._changed(state) and now - self._last_sent < SYNC_STATE_INTERVAL:
+            return
+        with self._lock:
+            self._joined = False
+            for addr, seen in list(self.followers.items()):
+                if now - seen > SYNC_TIMEOUT * 2:
+                    print(f"{Fore.YELLOW}Sync: follower {addr[0]}:{addr[1]} went quiet, dropping it")
+                    del self.followers[addr]
+            targets = list(self.followers)
+        self._last_state = state
+        self._last_sent = now
+        data = json.dumps(dict(state, t='state', seed=self.seed, sent=now)).encode('utf-8')
+        for addr in targets:
+            try:
+                self.sock.sendto(data, addr)
+                self.sent += 1
+            except OSError:
+                pass
 
-def save_recents(recents):
-    try:
-        with open(RECENTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(recents[:MAX_RECENTS], f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"{Fore.YELLOW}Warning: could not save recents.json: {e}")
+    def stop(self):
+        self._stop = True
+        self.sock.close()
+
+
+class SyncFollower:
+    """UDP side of a follower: registers with the leader, tracks its clock, keeps the latest state.
+
+    The clock offset is estimated NTP-style from hello/pong round trips,
+    keeping the sample with the shortest round trip of the last few.
+    """
+
+    role = 'follower'
+
+    def __init__(self, leader):
+        self.leader = (socket.gethostbyname(leader[0]), leader[1])
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('', 0))
+        self.sock.settimeout(0.1)
+        self.samples = deque(maxlen=8)
+        self.offset = None
+        self.rtt = None
+        self.last_state_at = None
+        self._state = None
+        self._lock = threading.Lock()
+        self._stop = False
+        threading.Thread(target=self._run, name='sync-follower', daemon=True).start()
+        print(f"{Fore.CYAN}Sync: following {self.leader[0]}:{self.leader[1]}")
+
+    @property
+    def connected(self):
+        return self.last_state_at is not None and time.monotonic() - self.last_state_at < SYNC_TIMEOUT
+
+    def to_local(self, leader_time):
+        """Convert a time on the leader's monotonic clock to ours."""
+        return leader_time - (self.offset or 0.0)
+
+    def take_state(self):
+        with self._lock:
+            state, self._state = self._state, None
+        return state
+
+    def _run(self):
+        next_hello = 0
+        while not self._stop:
+            now = time.monotonic()
+            if now >= next_hello:
+                try:
+                    self.sock.sendto(json.dumps({'t': 'hello', 'sent': now}).encode('utf-8'), self.leader)
+                except OSError:
+                    pass
+                # Ping quickly until the clock offset is known.
+                next_hello = now + (SYNC_HELLO_INTERVAL if self.offset is not None else 0.2)
+            try:
+                data, _ = self.sock.recvfrom(65536)
+                msg = json.loads(data.decode('utf-8'))
+            except socket.timeout:
+                continue
+            except (OSError, ValueError):
+                if self._stop:
+                    return
+                continue
+            received = time.monotonic()
+            if msg.get('t') == 'pong' and msg.get('echo') is not None:
+                rtt = received - msg['echo']
+                self.samples.append((rtt, msg['leader'] - (msg['echo'] + received) / 2))
+                self.rtt, self.offset = min(self.samples)
+            elif msg.get('t') == 'state':
+                with self._lock:
+                    self._state = msg
+                self.last_state_at = received
 
+    def stop(self):
+        self._stop = True
+        self.sock.close()
 
-def draw_close_x(surface, rect, color, pad=6, width=2):
-    pygame.draw.line(surface, color, (rect.left + pad, rect.top + pad), (rect.right - pad, rect.bottom - pad), width)
-    pygame.draw.line(surface, color, (rect.left + pad, rect.bottom - pad), (rect.right - pad, rect.top + pad), width)
 
+EXPORT_SIZE = (1920, 1080)
+EXPORT_FPS = 25
+EXPORT_BACKGROUND = (0, 0, 0)
 
-def load_local_font(size):
-    path = os.path.join(SCRIPT_DIR, 'fonts', 'Noto_Sans', 'NotoSans-Regular.ttf')
-    if os.path.exists(path):
-        try:
-            return pygame.font.Font(path, size)
-        except Exception as e:
-            print(f"Failed to load local font: {e}")
-    return None
 
+def parse_size(text):
+    """argparse type for 'WxH' with both sides above zero."""
+    w, _, h = text.lower().partition('x')
+    try:
+        size = int(w), int(h)
+    except ValueError:
+        size = (0, 0)
+    if min(size) <= 0:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT with positive numbers, got {text!r}")
+    return size
 
-def add_recent(path, duration, sort_order):
-    """Add or update a recent entry, moving it to the top."""
-    path = os.path.abspath(path)
-    recents = load_recents()
-    recents = [r for r in recents if os.path.abspath(r['path']) != path]
-    recents.insert(0, {
-        'path': path,
-        'last_used': datetime.now().isoformat(timespec='seconds'),
-        'duration': int(duration),
-        'sort': sort_order,
-    })
-    save_recents(recents)
 
-init(autoreset=True)
+def positive_float(text):
+    """argparse type for a finite number above zero."""
+    try:
+        value = float(text)
+    except ValueError:
+        value = 0.0
+    if not 0 < value < math.inf:
+        raise argparse.ArgumentTypeError(f"expected a number above 0, got {text!r}")
+    return value
+
+
+def export_playlist(source, sort_order='random', dedupe=None):
+    """Build a playlist the way the slideshow would, but wait for scans and metadata to finish."""
+    kind = source_kind(source)
+    if kind == 'mix':
+        if dedupe:
+            print(f"{Fore.YELLOW}--dedupe is ignored for mixed lists; the no-repeat window keeps repeats apart.")
+        # One pass's worth of slides (as many as the lists hold), interleaved by weight.
+        mixer = PlaylistMixer(parse_mix(source))
+        mixer.restart(ordered=sort_order != 'random')
+        paths = mixer.take(sum(len(src.entries) for src in mixer.sources))
+        mixer.close()
+        return paths
+    if kind == 'list':
+        index = ListIndex.open(source)
+        if index is not None:
+            paths = index.paths()
+            index.close()
+        else:
+            content, _ = read_list_text(source)
+            paths, _ = filter_image_lines(content)
+    else:
+        scanner = (DirectoryScanner(*split_glob(source)) if kind == 'glob' else DirectoryScanner(source)).start()
+        paths = []
+        while not (scanner.done and scanner.results.empty()):
+            paths.extend(scanner.drain())
+            time.sleep(0.05)
+        paths.extend(scanner.drain())
+    if dedupe:
+        paths = dedupe_paths(paths)
+    if dedupe in ('content', 'perceptual'):
+        print(f"{Fore.MAGENTA}Looking for {dedupe} duplicates...")
+        deduper = Deduplicator(CacheDB.shared(), dedupe)
+        deduper.submit(paths)
+        duplicates = set()
+        while True:
+            # drain() may queue further hashes, so only stop once it leaves the pool idle.
+            duplicates.update(deduper.drain())
+            if deduper.done:
+                break
+            time.sleep(0.05)
+        deduper.stop()
+        paths = [p for p in paths if p not in duplicates]
+        print(f"{Fore.MAGENTA}Removed {len(duplicates)} duplicate files.")
+    if sort_order == 'random':
+        random.shuffle(paths)
+    elif sort_order == 'natural':
+        paths.sort(key=natural_key)
+    elif sort_order in METADATA_SORTS:
+        indexer = MetadataIndexer(CacheDB.shared())
+        indexer.submit(paths)
+        while not indexer.done:
+            indexer.drain()
+            time.sleep(0.05)
+        indexer.drain()
+        indexer.stop()
+        paths.sort(key=lambda p: (0, metadata_sort_value(indexer.meta[p], sort_order))
+                   if p in indexer.meta else (1, 0))
+    else:
+        paths.sort(key=str.lower)
+    return paths
+
+
+def slide_schedule(durations, slide_ms):
+    """(frame, ms) pairs filling one slide: animations loop and are cut at the slide's end."""
+    if not durations:
+        return [(0, slide_ms)]
+    schedule, t, i = [], 0, 0
+    while t < slide_ms:
+        d = min(durations[i], slide_ms - t)
+        schedule.append((i, d))
+        t += d
+        i = (i + 1) % len(durations)
+    return schedule
+
+
+def render_export_slide(path, size, slide_ms, encode):
+    """Worker: decode and scale one slide like the live view; returns (encoded frames, schedule)."""
+    with Image.open(open_source(path)) as image:
+        frames, durations, _ = read_frames(image)
+        orientation, icc_profile = image_orientation(image), image.info.get('icc_profile')
+    scaled, pos = fit_frames(frames, size, orientation, icc_profile)
+    encoded = []
+    for frame in scaled:
+        canvas = Image.new('RGB', size, EXPORT_BACKGROUND)
+        canvas.paste(frame, pos, frame)
+        encoded.append(encode(canvas))
+    return encoded, slide_schedule(durations, slide_ms)
+
+
+class FrameSequenceWriter:
+    """Numbered stills at a fixed frame rate, e.g. ``out/frame_%06d.png`` (PNG or JPEG).
+
+    Repeats of a frame are hard links to the first copy where the file
+    system allows it, so long static slides cost one encode and one file.
+    """
+
+    def __init__(self, pattern, fps):
+        self.pattern = pattern
+        self.fps = fps
+        self.format = 'JPEG' if pattern.lower().endswith(('.jpg', '.jpeg')) else 'PNG'
+        self.frames = 0
+        self.ms = 0.0
+        folder = os.path.dirname(pattern)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def encode(self, image):
+        buf = io.BytesIO()
+        image.save(buf, self.format, **({'quality': 92} if self.format == 'JPEG' else {'compress_level': 1}))
+        return buf.getvalue()
+
+    def add(self, encoded, schedule):
+        for frame, ms in schedule:
+            self.ms += ms
+            first = None
+            # Frame k shows whatever is on screen at k / fps; keeps rounding from drifting.
+            while self.frames * 1000 / self.fps < self.ms:
+                target = self.pattern % self.frames
+                # Unlink first: a frame left by an earlier export may be a link to others.
+                if os.path.lexists(target):
+                    os.remove(target)
+                try:
+                    if first is None:
+                        raise OSError
+                    os.link(first, target)
+                except OSError:
+                    with open(target, 'wb') as f:
+                        f.write(encoded[frame])
+                first = first or target
+                self.frames += 1
+
+    def close(self):
+        pass
+
+
+class AnimatedGifWriter:
+    """Streams an animated GIF: each frame is quantised and LZW-coded with its own palette.
+
+    Pillow's save_all holds every frame until the end, so the container is
+    written here and frames are appended as they arrive.
+    """
+
+    MAX_DELAY_MS = 65535 * 10
+
+    def __init__(self, path, size):
+        self.file = open(path, 'wb')
+        self.frames = 0
+        self.ms = 0
+        # Header, logical screen without a global palette, loop forever.
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', size[0], size[1], 0, 0, 0))
+        self.file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', 0) + b'\x00')
+
+    @staticmethod
+    def encode(image):
+        quantized = image.quantize(256)
+        return b''.join(GifImagePlugin.getdata(quantized, include_color_table=True))
+
+    def add(self, encoded, schedule):
+        for frame, ms in schedule:
+            self.ms += ms
+            while ms > 0:
+                delay = min(ms, self.MAX_DELAY_MS)
+                ms -= delay
+                # Graphic control extension: no transparency, delay in centiseconds.
+                self.file.write(b'!\xf9\x04\x00' + struct.pack('<H', round(delay / 10)) + b'\x00\x00')
+                self.file.write(encoded[frame])
+                self.frames += 1
+
+    def close(self):
+        self.file.write(b';')
+        self.file.close()
+
+
+class AnimatedWebPWriter:
+    """Streams an animated WebP: frames are encoded as stills and wrapped in ANMF chunks.
+
+    Like the GIF writer this avoids Pillow's save_all, which keeps every
+    frame in memory; the RIFF size is patched in once the last frame is written.
+    """
+
+    MAX_DURATION_MS = (1 << 24) - 1
+
+    def __init__(self, path, size, quality=85):
+        self.file = open(path, 'wb')
+        self.quality = quality
+        self.frames = 0
+        self.ms = 0
+        self.file.write(b'RIFF\0\0\0\0WEBP')
+        # VP8X: animation flag, canvas size minus one as 24-bit values.
+        self._chunk(b'VP8X', bytes([0x02, 0, 0, 0]) + self._u24(size[0] - 1) + self._u24(size[1] - 1))
+        # ANIM: background colour (BGRA), loop forever.
+        self._chunk(b'ANIM', bytes([0, 0, 0, 255]) + struct.pack('<H', 0))
+
+    @staticmethod
+    def _u24(value):
+        return struct.pack('<I', value)[:3]
+
+    def _chunk(self, fourcc, payload):
+        self.file.write(fourcc + struct.pack('<I', len(payload)) + payload + (b'\0' if len(payload) % 2 else b''))
+
+    def encode(self, image):
+        """Encode a still and keep only its image chunks (VP8/VP8L and ALPH)."""
+        buf = io.BytesIO()
+        image.save(buf, 'WEBP', quality=self.quality, method=4)
+        data = buf.getvalue()
+        chunks, offset = [], 12
+        while offset + 8 <= len(data):
+            fourcc, length = data[offset:offset + 4], struct.unpack_from('<I', data, offset + 4)[0]
+            end = offset + 8 + length + (length & 1)
+            if fourcc in (b'VP8 ', b'VP8L', b'ALPH'):
+                chunks.append(data[offset:end])
+            offset = end
+        return b''.join(chunks), image.size
+
+    def add(self, encoded, schedule):
+        for frame, ms in schedule:
+            self.ms += ms
+            data, (w, h) = encoded[frame]
+            while ms > 0:
+                duration = min(ms, self.MAX_DURATION_MS)
+                ms -= duration
+                # Offset 0,0; no blending, no disposal (every frame covers the canvas).
+                header = (self._u24(0) + self._u24(0) + self._u24(w - 1) + self._u24(h - 1)
+                          + self._u24(duration) + bytes([0x02]))
+                self._chunk(b'ANMF', header + data)
+                self.frames += 1
+
+    def close(self):
+        size = self.file.tell()
+        self.file.seek(4)
+        self.file.write(struct.pack('<I', size - 8))
+        self.file.close()
+
+
+def export_show(source, output, slide_ms, size=EXPORT_SIZE, fps=EXPORT_FPS, sort_order='random',
+                dedupe=None, workers=None):
+    """Render a playlist offscreen to numbered frames, an animated GIF or an animated WebP.
+
+    Slides are decoded, scaled and encoded in parallel, a bounded number
+    ahead of the writer, and written in playlist order as they finish, so
+    memory doesn't grow with the length of the show. No window is opened.
+    """
+    paths = export_playlist(source, sort_order, dedupe)
+    if not paths:
+        print(f"{Fore.RED}No images found in {source}.")
+        return False
+    lower = output.lower()
+    if lower.endswith('.gif'):
+        writer = AnimatedGifWriter(output, size)
+    elif lower.endswith('.webp'):
+        writer = AnimatedWebPWriter(output, size)
+    else:
+        pattern = output if '%' in output else os.path.join(output, 'frame_%06d.png')
+        writer = FrameSequenceWriter(pattern, fps)
+    workers = workers or os.cpu_count() or 2
+    print(f"{Fore.CYAN}Exporting {len(paths)} slides at {size[0]}x{size[1]} to {output} "
+          f"using {workers} workers...")
+    began = time.perf_counter()
+    skipped = written = 0
+    pending = deque()
+    with ThreadPoolExecutor(workers, thread_name_prefix='export') as pool:
+        todo = iter(paths)
+        try:
+            while True:
+                # Keep a couple of slides per worker in flight; never the whole show.
+                while len(pending) < workers * 2:
+                    path = next(todo, None)
+                    if path is None:
+                        break
+                    pending.append((path, pool.submit(render_export_slide, path, size, slide_ms, writer.encode)))
+                if not pending:
+                    break
+                path, future = pending.popleft()
+                try:
+                    encoded, schedule = future.result()
+                except Exception as e:
+                    print(f"{Fore.YELLOW}Skipping {path}: {e}")
+                    skipped += 1
+                    continue
+                if encoded:
+                    writer.add(encoded, schedule)
+                written += 1
+                if written % 100 == 0:
+                    print(f"{Fore.CYAN}  {written}/{len(paths)} slides, {writer.frames} frames")
+        finally:
+            for _, future in pending:
+                future.cancel()
+            writer.close()
+    elapsed = time.perf_counter() - began
+    print(f"{Fore.GREEN}Exported {len(paths) - skipped} slides as {writer.frames} frames "
+          f"({writer.ms / 1000:.1f}s of show) in {elapsed:.1f}s"
+          + (f", skipped {skipped} unreadable" if skipped else "") + ".")
+    return True
 
 
 class POINT(ctypes.Structure):
@@ -107,12 +4168,20 @@ class POINT(ctypes.Structure):
 pygame.init()
 
 class InstantSlideshow:
-    def __init__(self, file_path=None, duration=None, sort_order=None):
+    def __init__(self, file_path=None, duration=None, sort_order=None, dedupe=None,
+                 transition='none', transition_ms=400, io_workers=IO_WORKERS,
+                 read_ahead_mb=READ_AHEAD_BYTES // (1024 * 1024), memory_limit_mb=None, control=None, sync=None,
+                 soak=None, mix_window=MIX_WINDOW):
         self.file_path_arg = file_path
         self.duration_arg = duration
         self.sort_order_arg = sort_order
+        self.dedupe = dedupe
+        self.transition = transition or 'none'
+        self.transition_ms = transition_ms
         
         self.image_paths = []
+        # Bumped by every change to image_paths; caches keyed on the order check it.
+        self.playlist_version = 0
         self.current_index = 0
         self.current_image = None
         self.display_surface = None
@@ -158,7 +4227,17 @@ class InstantSlideshow:
         
         print(f"Fonts loaded - Local: {self.font_local is not None}, CJK: {self.font_cjk}, Emoji: {self.font_emoji}")
         
-        self.last_switch_time = 0
+        # None until the slide has actually been flipped onto the screen
+        self.last_switch_time = None
+        self.load_started = 0
+        self.present_pending = False  # slide clock started while hidden; stats wait for a flip
+        self.frame_interval = 1000 // 30
+        self.last_frame_time = 0
+        self.slide_lateness = LatencyStats()
+        self.load_to_screen = LatencyStats()
+        self.gif_lateness = LatencyStats()
+        self.gif_frames_shown = 0
+        self.gif_frames_dropped = 0
         self.paused = False
         self.pause_start_time = 0
         self.dragging = False
@@ -169,14 +4248,91 @@ class InstantSlideshow:
         self.drag_threshold = 6
         self.pressed_control = None
         self.pending_delete_index = -1
+        self.pending_grid_index = None
+        self.pending_search_row = None
         self.next_action = 'exit'  # set to 'picker' to return to the picker on exit
+        self.next_source = None  # playlist to open next when next_action is 'load'
+        self.control = control
+        self.soak = soak
+        self.control_pending = []
+        self.control_latency = LatencyStats()
+        self.sync = sync
+        self.sync_following = False  # follower: pacing comes from the leader
+        self.sync_deadline = None  # follower: tick at which to advance to sync_next
+        self.sync_next = None
+        self.sync_leader_deadline = None  # the same deadline on the leader's clock
+        self.sync_advanced = None  # follower: (index, leader deadline) of the last advance we did ourselves
+        self.sync_aligned = None  # 'index', 'path' or 'missing'
+        self.sync_seed = None
+        self.sync_hash = None  # (playlist_version, hash of the order) once the playlist settles
+        self.sync_index = None  # follower: (playlist_version, path -> index), built on demand
+        self.advance_target = None
+        self.advance_flip = LatencyStats()
 
         self.is_gif = False
+        self.orientation = 1
+        self.icc_profile = None
         self.gif_frames = []
         self.scaled_gif_frames = []
         self.gif_durations = []
+        self.gif_offsets = []
+        self.gif_total = 0
         self.current_gif_frame = 0
-        self.last_gif_update = 0
+        self.gif_start = None
+
+        self.scanner = None
+        self.pending_scan_paths = []
+        self.list_watcher = None
+        self.mixer = None
+        self.mix_window = mix_window
+        self.mix_offset = 0  # slides of the mix dropped from the front of image_paths
+        self.indexer = None
+        self.unsorted_meta = 0
+        self.validator = None
+        self.deduper = None
+        self.path_keys = None
+        self.prefetcher = None
+        self.reader = None
+        self.read_ahead_depth = READ_AHEAD
+        self.read_ahead_budget = read_ahead_mb * 1024 * 1024
+        self.governor = MemoryGovernor(memory_limit_mb * 1024 * 1024 if memory_limit_mb else None)
+        self.nav_direction = 1
+        self.nav_target = None  # slide interactive navigation is heading for
+        self.nav_step = 1
+        self.nav_burst = 0  # steps in the current burst
+        self.nav_last_input = 0
+        self.nav_requested = None  # nav_target whose full decode has been requested
+        self.nav_preview_index = None  # slide the preview worker was last asked for
+        self.nav_preview_shown = False  # a preview is standing in for the current slide
+        self.nav_previewer = None
+        self.nav_landing = None
+        self.nav_stats = {'steps': 0, 'landings': 0, 'previews': 0}
+        self.window_hidden = False  # minimised or hidden: nothing is drawn
+        self.window_focused = True
+        self.activity = ActivityMeter()
+        self.nav_latency = LatencyStats()
+        self.inspect = None
+        self.inspect_drag = None
+        self.grid = None
+        self.thumb_store = None
+        self.search_index = None
+        self.search_stale = False
+        self.search_open = False
+        self.search_query = ''
+        self.search_results = []
+        self.search_selected = 0
+        self.search_status = ''
+        self.search_rows = []
+        self.search_ms = LatencyStats()
+        self.show_stats = False
+        self.stats = {'skipped': 0, 'duplicates': 0, 'prefetch_hits': 0}
+
+        self.transition_state = None
+        self.transition_disabled = False
+        self.transitions_done = 0
+        self.transitions_cut = 0
+        self.transition_cost = LatencyStats()
+        self.frame_work = LatencyStats()
 
         self.load_paths()
 
@@ -188,19 +4344,163 @@ class InstantSlideshow:
         self.get_slide_duration()
         self.get_sort_order()
 
-        if hasattr(self, 'selected_file_path'):
+        # A soak run plays the source sped up; it isn't a show to come back to.
+        if hasattr(self, 'selected_file_path') and not self.soak:
             add_recent(self.selected_file_path, self.slide_duration / 1000, self.sort_order)
 
-        if self.sort_order == 'name':
-            print(f"{Fore.MAGENTA}Sorting playlist by name...")
-            self.image_paths.sort(key=lambda x: x.lower())
-        else:
-            print(f"{Fore.MAGENTA}Shuffling playlist...")
-            random.shuffle(self.image_paths)
+        self.apply_sort_order()
+        self.start_dedupe()
+
+        self.validator = HeaderValidator(CacheDB.shared())
+        self.reader = ReadAhead(io_workers, self.read_ahead_budget)
+        self.prefetcher = Prefetcher(self.reader)
 
         self.setup_window()
-        self.load_current_image()
+        self.search_index = FilenameIndex(self.image_paths)
+        self.show_valid_image(1)
         self.run()
+        self.shutdown()
+
+    def shutdown(self):
+        """Stop background workers so returning to the picker doesn't leak threads."""
+        if self.scanner:
+            self.scanner.stop()
+        if self.list_watcher:
+            self.list_watcher.stop()
+        if self.mixer:
+            self.mixer.close()
+        if self.indexer:
+            self.indexer.stop()
+        if self.validator:
+            self.validator.stop()
+        if self.prefetcher:
+            self.prefetcher.stop()
+        if self.reader:
+            self.reader.stop()
+        if self.nav_previewer:
+            self.nav_previewer.stop()
+        self.close_inspect()
+        self.close_grid()
+        if self.control:
+            self.control.publish({'running': False, 'next_action': self.next_action})
+        if self.deduper:
+            self.deduper.stop()
+        if self.slide_lateness.count or self.gif_frames_shown:
+            print(f"{Fore.CYAN}Timing accuracy:")
+            for line in self.timing_report():
+                print(f"{Fore.CYAN}  {line}")
+        if self.stats['duplicates']:
+            print(f"{Fore.CYAN}Removed {self.stats['duplicates']} duplicate images from the playlist.")
+        if self.stats['skipped']:
+            print(f"{Fore.CYAN}Skipped {self.stats['skipped']} broken or missing images this session.")
+        if self.activity.saved() >= 0.1:
+            print(f"{Fore.CYAN}Throttling while hidden or unfocused saved ~{self.activity.saved():.1f} CPU-s "
+                  f"({self.activity.breakdown()}).")
+        if self.governor.evictions:
+            print(f"{Fore.CYAN}Memory governor: {self.governor.evictions} evictions freed "
+                  f"{self.governor.freed // (1024 * 1024)} MB, peak RSS {self.governor.peak // (1024 * 1024)} MB.")
+
+    def apply_sort_order(self):
+        if self.mixer:
+            # There is no whole playlist to sort: random picks at random from each
+            # list, every other order walks each list in its own order.
+            if self.sort_order != 'random':
+                print(f"{Fore.MAGENTA}Mixing lists in list order...")
+            if self.sync and self.sync.role == 'leader':
+                # Followers draw the same mix from the seed.
+                self.restart_mix(self.sync.seed)
+            elif self.sort_order != 'random':
+                self.restart_mix()
+            return
+        if self.sort_order == 'random':
+            print(f"{Fore.MAGENTA}Shuffling playlist...")
+            if self.sync and self.sync.role == 'leader':
+                # Followers rebuild the same order from the seed.
+                self.image_paths[:] = seeded_order(self.image_paths, self.sync.seed)
+            else:
+                random.shuffle(self.image_paths)
+            self.playlist_version += 1
+            return
+
+        if self.sort_order in METADATA_SORTS:
+            print(f"{Fore.MAGENTA}Indexing metadata for {self.sort_order} sort in the background...")
+            self.indexer = MetadataIndexer(CacheDB.shared())
+            self.indexer.submit(self.image_paths)
+            # Give cached entries a moment to arrive so the first slides are in order.
+            deadline = time.monotonic() + 1.0
+            while time.monotonic() < deadline:
+                self.indexer.drain()
+                if self.indexer.done:
+                    break
+                time.sleep(0.02)
+        else:
+            print(f"{Fore.MAGENTA}Sorting playlist by {self.sort_order}...")
+        self.image_paths.sort(key=self.sort_key)
+        self.playlist_version += 1
+
+    def start_dedupe(self):
+        """Drop repeated paths now and, for content modes, start hashing in the background."""
+        if not self.dedupe:
+            return
+        if self.mixer:
+            print(f"{Fore.YELLOW}--dedupe is ignored for mixed lists; the no-repeat window keeps repeats apart.")
+            return
+        before = len(self.image_paths)
+        self.image_paths[:] = dedupe_paths(self.image_paths)
+        self.playlist_version += 1
+        self.path_keys = {path_key(p) for p in self.image_paths}
+        self.stats['duplicates'] += before - len(self.image_paths)
+        print(f"{Fore.MAGENTA}Removed {before - len(self.image_paths)} repeated paths.")
+        if self.dedupe in ('content', 'perceptual'):
+            print(f"{Fore.MAGENTA}Looking for {self.dedupe} duplicates in the background...")
+            self.deduper = Deduplicator(CacheDB.shared(), self.dedupe)
+            self.deduper.submit(self.image_paths)
+
+    def poll_deduper(self):
+        if not self.deduper:
+            return
+        duplicates = self.deduper.drain()
+        if duplicates:
+            self.stats['duplicates'] += len(duplicates)
+            self.remove_paths(set(duplicates))
+            self.update_caption()
+
+    def sort_key(self, path):
+        if self.sort_order == 'natural':
+            return natural_key(path)
+        if self.sort_order in METADATA_SORTS:
+            meta = self.indexer.meta.get(path) if self.indexer else None
+            if meta is None:
+                return (1, 0)  # not indexed yet: keep at the end until it is
+            return (0, metadata_sort_value(meta, self.sort_order))
+        return path.lower()
+
+    def sort_tail(self):
+        """Re-sort only the unplayed part of the list so the current slide stays put."""
+        start = self.current_index + 1
+        self.image_paths[start:] = sorted(self.image_paths[start:], key=self.sort_key)
+        self.playlist_version += 1
+
+    def poll_indexer(self):
+        """Fold newly indexed metadata into the playlist order.
+
+        Re-sorting happens once an eighth of the unplayed tail has new keys
+        (and once more when indexing finishes); timsort makes each pass close
+        to linear because the tail is already mostly in order.
+        """
+        if not self.indexer or self.indexer.submitted == 0:
+            return
+        self.unsorted_meta += self.indexer.drain()
+        finished = self.indexer.done
+        tail = len(self.image_paths) - self.current_index - 1
+        if self.unsorted_meta and (finished or self.unsorted_meta * 8 >= tail):
+            self.sort_tail()
+            self.unsorted_meta = 0
+            self.update_caption()
+        if finished:
+            ix = self.indexer
+            print(f"{Fore.GREEN}Metadata index complete: {ix.indexed} files ({ix.from_cache} cached, {ix.failed} unreadable).")
+            ix.submitted = 0
 
     def get_slide_duration(self):
         if self.duration_arg is not None:
@@ -231,12 +4531,28 @@ class InstantSlideshow:
             file_path = self.file_path_arg
             print(f"{Fore.CYAN}Using file path from arguments: {Style.BRIGHT}{file_path}")
         else:
-            print(f"{Fore.GREEN}Please enter the path to the text file containing image paths:")
-            file_path = input(f"{Fore.YELLOW}Path to txt file: {Style.RESET_ALL}").strip()
+            print(f"{Fore.GREEN}Please enter a text file of image paths, a folder, or a glob pattern "
+                  f"(or several lists to mix, e.g. new.txt=4 + archive.txt):")
+            file_path = input(f"{Fore.YELLOW}Path: {Style.RESET_ALL}").strip()
         
         if file_path.startswith('"') and file_path.endswith('"'):
             file_path = file_path[1:-1]
-            
+
+        kind = source_kind(file_path)
+        if kind == 'mix':
+            self.load_mix(file_path)
+            return
+        if kind == 'glob':
+            root, matcher, max_depth = split_glob(file_path)
+            if not os.path.isdir(root):
+                print(f"{Fore.RED}Folder not found for pattern: {file_path}")
+                if not self.file_path_arg:
+                    input("Press Enter to exit...")
+                sys.exit()
+            self.selected_file_path = os.path.abspath(file_path)
+            self.start_scan(root, matcher, max_depth)
+            return
+
         if not os.path.exists(file_path):
             print(f"{Fore.RED}File not found: {file_path}")
             if not self.file_path_arg:
@@ -246,32 +4562,222 @@ class InstantSlideshow:
         file_path = os.path.abspath(file_path)
         self.selected_file_path = file_path
 
+        if kind == 'dir':
+            self.start_scan(file_path)
+            return
+
+        index = ListIndex.open(file_path)
+        if index is not None:
+            self.image_paths, line_count = index.paths(), index.line_count
+            index.close()
+            print(f"{Fore.GREEN}Loaded {Style.BRIGHT}{len(self.image_paths)}{Style.NORMAL}{Fore.GREEN} valid images "
+                  f"from {line_count} lines (list index).")
+            self.list_watcher = ListFileWatcher(file_path, self.image_paths)
+            return
+
         print(f"{Fore.CYAN}Reading paths from file...")
-        
-        # Try multiple encodings to handle special characters/box chars
-        encodings = ['utf-8', 'utf-16', 'cp1252', 'latin-1']
-        content = None
-        
-        for enc in encodings:
-            try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    content = f.read()
-                print(f"{Fore.GREEN}Successfully read file using {enc} encoding.")
-                break
-            except UnicodeError:
-                continue
-                
-        if content is None:
-            print(f"{Fore.YELLOW}Could not detect encoding, trying with errors='ignore'...")
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+        signature = file_signature(file_path)
+        content, enc = read_list_text(file_path)
+        if enc:
+            print(f"{Fore.GREEN}Successfully read file using {enc} encoding.")
+        else:
+            print(f"{Fore.YELLOW}Could not detect encoding, read with errors='ignore'.")
 
         # Filter for valid image extensions
-        valid_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.pcx', '.tga')
-        all_lines = [line.strip() for line in content.splitlines() if line.strip()]
-        
-        self.image_paths = [p for p in all_lines if p.lower().endswith(valid_extensions)]
-        print(f"{Fore.GREEN}Loaded {Style.BRIGHT}{len(self.image_paths)}{Style.NORMAL}{Fore.GREEN} valid images from {len(all_lines)} lines.")
+        self.image_paths, line_count = filter_image_lines(content)
+        print(f"{Fore.GREEN}Loaded {Style.BRIGHT}{len(self.image_paths)}{Style.NORMAL}{Fore.GREEN} valid images from {line_count} lines.")
+        # Save the filtered result so the next open skips all of the above.
+        ListIndex.write_async(file_path, self.image_paths, enc, line_count, signature)
+        self.list_watcher = ListFileWatcher(file_path, self.image_paths)
+
+    def load_mix(self, source):
+        """Start a weighted mix of list files; slides are drawn from it as the show plays."""
+        mix = parse_mix(source)
+        missing = [path for path, _ in mix if not os.path.isfile(path)]
+        if missing:
+            print(f"{Fore.RED}List file not found: {', '.join(missing)}")
+            if not self.file_path_arg:
+                input("Press Enter to exit...")
+            sys.exit()
+        mix = [(os.path.abspath(path), weight) for path, weight in mix]
+        self.selected_file_path = format_mix(mix)
+        print(f"{Fore.CYAN}Mixing {len(mix)} lists...")
+        self.mixer = PlaylistMixer(mix, self.mix_window)
+        for src in self.mixer.sources:
+            print(f"{Fore.GREEN}  {Style.BRIGHT}{len(src.entries)}{Style.NORMAL}{Fore.GREEN} images from "
+                  f"{os.path.basename(src.path)} (weight {src.weight:g}"
+                  f"{', list index' if src.index is not None else ''})")
+        self.image_paths = self.mixer.take(MIX_CHUNK)
+        self.playlist_version += 1
+
+    def restart_mix(self, seed=None):
+        """Draw the mix again from its first pick, from ``seed`` when synced."""
+        self.mixer.restart(ordered=self.sort_order != 'random', seed=seed)
+        self.image_paths[:] = self.mixer.take(MIX_CHUNK)
+        self.current_index = 0
+        self.mix_offset = 0
+        self.playlist_version += 1
+        self.search_stale = True
+
+    def poll_mixer(self):
+        """Draw more slides from the mix once fewer than half a chunk are left ahead.
+
+        Slides more than MIX_HISTORY behind the playhead are dropped at the
+        same time, so a show that runs for days doesn't grow without bound.
+        """
+        if self.mixer and len(self.image_paths) - self.current_index <= MIX_CHUNK // 2:
+            chunk = self.mixer.take(MIX_CHUNK)
+            self.image_paths.extend(chunk)
+            self.playlist_version += 1
+            self.search_extend(chunk)
+            # Not while something holds an index into the playlist.
+            if (self.nav_target is None and not self.grid and not self.search_open
+                    and self.pending_delete_index == -1):
+                self.drop_mix_history(self.current_index)
+            self.update_caption()
+
+    def catch_up_mix(self, pos):
+        """Draw the mix through pick ``pos + 1`` (counted from its start) for a follower joining late."""
+        while self.mix_offset + len(self.image_paths) <= pos + 1:
+            chunk = self.mixer.take(MIX_CHUNK)
+            self.image_paths.extend(chunk)
+            self.playlist_version += 1
+            self.search_extend(chunk)
+            self.drop_mix_history(pos - self.mix_offset)
+
+    def drop_mix_history(self, keep_from):
+        """Forget mixed slides more than MIX_HISTORY before index ``keep_from``."""
+        drop = min(keep_from - MIX_HISTORY, len(self.image_paths))
+        if drop <= 0:
+            return
+        del self.image_paths[:drop]
+        self.mix_offset += drop
+        self.playlist_version += 1
+        self.search_stale = True
+        self.current_index = max(0, self.current_index - drop)
+        if self.sync_next is not None:
+            self.sync_next = max(0, self.sync_next - drop)
+        if self.sync_advanced is not None:
+            self.sync_advanced = (self.sync_advanced[0] - drop, self.sync_advanced[1])
+
+    def start_scan(self, root, matcher=None, max_depth=None):
+        """Walk a folder in the background and wait only for the first images."""
+        print(f"{Fore.CYAN}Scanning {Style.BRIGHT}{root}{Style.NORMAL}{Fore.CYAN} for images...")
+        self.scanner = DirectoryScanner(root, matcher, max_depth).start()
+        self.scanner.wait_first()
+        self.image_paths = self.scanner.drain()
+        if self.scanner.done:
+            self.image_paths.extend(self.scanner.drain())
+            print(f"{Fore.GREEN}Found {Style.BRIGHT}{len(self.image_paths)}{Style.NORMAL}{Fore.GREEN} images.")
+        else:
+            print(f"{Fore.GREEN}Starting with {len(self.image_paths)} images, still scanning in the background...")
+        self.playlist_version += 1
+
+    def poll_scanner(self, max_items=20000):
+        """Merge newly scanned paths into the playlist without disturbing playback."""
+        if not self.scanner:
+            return
+        finished = self.scanner.done
+        new_paths = self.scanner.drain(max_items)
+        if finished and self.scanner.results.empty():
+            self.scanner = None
+        if not new_paths and self.scanner is not None:
+            return
+
+        self.merge_new_paths(new_paths, flush=self.scanner is None)
+        self.update_caption()
+        if self.scanner is None:
+            print(f"{Fore.GREEN}Scan finished: {Style.BRIGHT}{len(self.image_paths)}{Style.NORMAL}{Fore.GREEN} images.")
+
+    def search_extend(self, paths):
+        """Add paths appended to the playlist to the search index, if one was built."""
+        if self.search_index is not None and paths:
+            self.search_index.extend(paths)
+
+    def merge_new_paths(self, new_paths, flush=True):
+        """Add paths to the unplayed part of the playlist in the current sort order.
+
+        Random order places each new path at a random spot in the unplayed
+        part of the list (an inside-out Fisher-Yates step); synced shows draw
+        the spots from the shared seed, so instances that get the same paths
+        place them the same way. Path-based orders
+        buffer paths and merge them into the unplayed tail once the buffer
+        reaches a quarter of the playlist (or on ``flush``), so total sorting
+        work stays O(n log n). Metadata orders hand them to the indexer.
+        """
+        if self.path_keys is not None:
+            fresh = []
+            for p in new_paths:
+                key = path_key(p)
+                if key not in self.path_keys:
+                    self.path_keys.add(key)
+                    fresh.append(p)
+            self.stats['duplicates'] += len(new_paths) - len(fresh)
+            new_paths = fresh
+        if self.deduper:
+            self.deduper.submit(new_paths)
+
+        start = self.current_index + 1
+        if self.sort_order == 'random':
+            seed = self.sync.seed if self.sync and self.sync.role == 'leader' else self.sync_seed
+            # Derived from the playlist state, not from earlier merges, so a
+            # follower that joined late still draws what the leader drew.
+            rng = random.Random(f"{seed}/{len(self.image_paths)}/{new_paths[0]}") if seed is not None and new_paths else random
+            for path in new_paths:
+                self.image_paths.append(path)
+                j = rng.randint(start, len(self.image_paths) - 1)
+                self.image_paths[-1], self.image_paths[j] = self.image_paths[j], path
+            self.search_extend(new_paths)
+        elif self.sort_order in METADATA_SORTS:
+            # Unindexed paths sort last; poll_indexer moves them into place.
+            self.image_paths.extend(new_paths)
+            self.search_extend(new_paths)
+            self.indexer.submit(new_paths)
+        else:
+            self.pending_scan_paths.extend(new_paths)
+            if flush or len(self.pending_scan_paths) * 4 >= len(self.image_paths):
+                tail = self.image_paths[start:] + self.pending_scan_paths
+                tail.sort(key=self.sort_key)
+                self.image_paths[start:] = tail
+                self.search_extend(self.pending_scan_paths)
+                self.pending_scan_paths = []
+        self.playlist_version += 1
+
+    def remove_paths(self, removed):
+        """Drop every occurrence of the paths in ``removed`` while keeping the playhead.
+
+        If the current slide itself is gone, the slide that followed it is shown.
+        """
+        current = self.image_paths[self.current_index]
+        before = sum(1 for p in self.image_paths[:self.current_index] if p in removed)
+        self.image_paths[:] = [p for p in self.image_paths if p not in removed]
+        self.playlist_version += 1
+        self.search_stale = True
+        if self.path_keys is not None:
+            self.path_keys.difference_update(path_key(p) for p in removed)
+        if not self.image_paths:
+            print(f"{Fore.YELLOW}Playlist is empty. Exiting.")
+            self.running = False
+            return
+        self.current_index -= before
+        if current in removed:
+            if self.current_index >= len(self.image_paths):
+                self.current_index = 0
+            self.show_valid_image(1)
+
+    def poll_list_watcher(self):
+        if not self.list_watcher:
+            return
+        try:
+            added, removed = self.list_watcher.changes.get_nowait()
+        except queue.Empty:
+            return
+        print(f"{Fore.CYAN}List file changed: {Style.BRIGHT}+{len(added)} / -{len(removed)}{Style.NORMAL}{Fore.CYAN} images.")
+        if removed:
+            self.remove_paths(removed)
+        if added and self.running:
+            self.merge_new_paths(added)
+        self.update_caption()
 
     def setup_window(self):
         os.environ['SDL_VIDEO_CENTERED'] = '1'
@@ -291,103 +4797,565 @@ class InstantSlideshow:
         self.display_surface = pygame.display.set_mode((self.width, self.height), pygame.NOFRAME)
         pygame.display.set_caption("Instant Slideshow")
 
+    @traced('load_current_image')
     def load_current_image(self):
-        self.last_switch_time = pygame.time.get_ticks()
+        # The slide clock starts at the first flip after loading, not here,
+        # so a slow decode doesn't eat into the slide's display time.
+        self.load_started = pygame.time.get_ticks()
+        self.last_switch_time = None
+        self.gif_start = None
+        # Any load supersedes a navigation burst that hasn't landed yet.
+        self.nav_target = self.nav_preview_index = self.nav_requested = None
+        self.nav_preview_shown = False
+        self.close_inspect()
         if not self.image_paths:
             return
             
         path = self.image_paths[self.current_index]
-        # Replace backslashes with forward slashes to avoid Yen symbol rendering in CJK fonts
-        display_path = path.replace('\\', '/')
-        self.caption_text = f"Slide {self.current_index + 1}/{len(self.image_paths)} - {display_path}"
-        pygame.display.set_caption(self.caption_text)
-        
+        self.update_caption()
+
         try:
-            # Use PIL to load image
-            self.pil_image = Image.open(path)
-            
-            # Check if animated GIF
-            self.is_gif = getattr(self.pil_image, "is_animated", False)
-            
-            if self.is_gif:
-                self.gif_frames = []
-                self.gif_durations = []
-                self.current_gif_frame = 0
-                
-                # Extract all frames
-                for i in range(self.pil_image.n_frames):
-                    self.pil_image.seek(i)
-                    # Convert to RGBA to ensure consistency
-                    frame = self.pil_image.copy().convert('RGBA')
-                    self.gif_frames.append(frame)
-                    # Get duration (default to 100ms if not specified)
-                    self.gif_durations.append(self.pil_image.info.get('duration', 100))
+            size = self.display_surface.get_size()
+            slide = self.prefetcher.take(path, size) if self.prefetcher else None
+            if slide is None:
+                data = self.reader.take(path) if self.reader else None
+                slide = decode_slide(path, size, data)
             else:
-                # Static image
-                self.original_image = self.pil_image.convert('RGBA')
-                
-            self.rescale_image()
-            
+                self.stats['prefetch_hits'] += 1
+            self.apply_slide(slide)
         except Exception as e:
             print(f"Error loading image {path}: {e}")
+            self.load_error = str(e) or type(e).__name__
+            # Only a broken image is worth remembering across runs; a failed read may work next time.
+            self.load_error_persists = is_format_error(e)
             self.current_image = None
             self.is_gif = False
 
+    def apply_slide(self, slide):
+        self.pil_image = slide.pil_image
+        self.is_gif = slide.is_gif
+        self.current_gif_frame = 0
+        if self.is_gif:
+            self.gif_frames = slide.gif_frames
+            self.gif_durations = slide.gif_durations
+            self.gif_offsets = [0]
+            for duration in self.gif_durations[:-1]:
+                self.gif_offsets.append(self.gif_offsets[-1] + duration)
+            self.gif_total = sum(self.gif_durations)
+            self.scaled_gif_frames = slide.surfaces
+        else:
+            self.original_image = slide.original_image
+        self.orientation = slide.orientation
+        self.icc_profile = slide.icc_profile
+        self.img_x, self.img_y = slide.pos
+        # Display-format surfaces blit (and alpha-blend) much faster.
+        surfaces = [surf.convert_alpha() for surf in slide.surfaces]
+        if self.is_gif:
+            self.scaled_gif_frames = surfaces
+        self.current_image = surfaces[0] if surfaces else None
+        if self.governor.level >= 2:
+            self.governor.log_eviction("full-resolution frames of the new slide", self.release_originals())
+
+    def release_originals(self):
+        """Drop the current slide's full-resolution frames and close its file; returns bytes freed."""
+        pil_image = getattr(self, 'pil_image', None)
+        freed = (pil_nbytes(pil_image) + pil_nbytes(getattr(self, 'original_image', None))
+                 + sum(pil_nbytes(f) for f in self.gif_frames))
+        if pil_image is not None:
+            pil_image.close()
+        self.pil_image = None
+        self.original_image = None
+        self.gif_frames = []
+        return freed
+
+    def poll_memory(self, now):
+        gov = self.governor
+        if now - gov.last_check < MEMORY_CHECK_MS:
+            return
+        gov.last_check = now
+        if gov.check():
+            self.apply_memory_level()
+        if gov.level:
+            self.shed_memory()
+
+    def apply_memory_level(self):
+        """Size the caches and prefetching for the governor's current pressure level."""
+        level = self.governor.level
+        self.read_ahead_depth = READ_AHEAD if level == 0 else 1
+        if self.reader:
+            self.reader.budget = (self.read_ahead_budget if level == 0
+                                  else max(8 * 1024 * 1024, self.read_ahead_budget // 4))
+        if self.prefetcher:
+            self.prefetcher.keep_source = level < 2
+        if self.grid:
+            self.grid.cache_limit = GRID_THUMB_CACHE if level == 0 else GRID_THUMB_CACHE // 4
+        if self.inspect:
+            self.inspect.pyramid.cache_limit = TILE_CACHE_BYTES if level == 0 else TILE_CACHE_BYTES // 4
+
+    def shed_memory(self):
+        """Evict whatever the current pressure level says we can do without."""
+        gov = self.governor
+        if self.reader:
+            before = self.reader.buffered_bytes
+            # Re-issuing the read-ahead at the reduced depth drops the rest.
+            self.prefetch_next(self.nav_direction)
+            gov.log_eviction("read-ahead buffers", before - self.reader.buffered_bytes)
+        if self.grid:
+            gov.log_eviction("grid thumbnails", self.grid.trim())
+        if self.inspect:
+            gov.log_eviction("inspect tiles", self.inspect.pyramid.trim())
+        if gov.level >= 2:
+            gov.log_eviction("full-resolution frames of the current slide", self.release_originals())
+            if self.prefetcher:
+                gov.log_eviction("full-resolution frames of the prefetched slide", self.prefetcher.release_sources())
+        # Freed image buffers often stay in the heap; RSS only drops once it's trimmed.
+        trim_heap()
+
+    def memory_footprint(self):
+        """Bytes held in decoded pixel buffers (and read-ahead file data), by owner."""
+        scaled = self.scaled_gif_frames if self.is_gif else [self.current_image]
+        footprint = {
+            'source': (pil_nbytes(getattr(self, 'pil_image', None))
+                       + pil_nbytes(getattr(self, 'original_image', None))
+                       + sum(pil_nbytes(f) for f in self.gif_frames)),
+            'scaled': sum(surface_nbytes(surf) for surf in scaled),
+            'prefetched': self.prefetcher.ready_nbytes() if self.prefetcher else 0,
+            'read-ahead': self.reader.buffered_bytes if self.reader else 0,
+            'thumbnails': self.grid.nbytes() if self.grid else 0,
+            'tiles': self.inspect.pyramid.cache_bytes if self.inspect else 0,
+            'transition': 0,
+        }
+        if self.transition_state:
+            footprint['transition'] = (surface_nbytes(self.transition_state['from'])
+                                       + surface_nbytes(self.transition_state['to']))
+        return footprint
+
+    def prefetch_next(self, direction=1):
+        """Read the next few slides into memory and start decoding the first of them."""
+        if not self.prefetcher or len(self.image_paths) < 2:
+            return
+        n = len(self.image_paths)
+        idx = self.current_index
+        upcoming = []
+        # While hidden only the next slide is needed to keep the schedule.
+        depth = 1 if self.window_hidden else self.read_ahead_depth
+        for _ in range(n - 1):
+            idx = (idx + direction) % n
+            path = self.image_paths[idx]
+            if not (self.validator and self.validator.is_bad(path)):
+                upcoming.append(path)
+                if len(upcoming) >= depth:
+                    break
+        if not upcoming:
+            return
+        if self.reader:
+            self.reader.want(upcoming)
+        self.prefetcher.request(upcoming[0], self.display_surface.get_size())
+
+    def update_caption(self, index=None):
+        if not self.image_paths:
+            return
+        index = self.current_index if index is None else index
+        path = self.image_paths[index]
+        # Replace backslashes with forward slashes to avoid Yen symbol rendering in CJK fonts
+        display_path = path.replace('\\', '/')
+        count = self.mix_offset + len(self.image_paths)
+        total = f"{count}+" if self.scanner or self.mixer else f"{count}"
+        self.caption_text = f"Slide {self.mix_offset + index + 1}/{total} - {display_path}"
+        pygame.display.set_caption(self.caption_text)
+
+    def toggle_inspect(self):
+        """Enter or leave zoom/pan inspect mode for the current slide."""
+        if self.inspect:
+            self.close_inspect()
+            return
+        if not self.image_paths or self.current_image is None:
+            return
+        try:
+            self.inspect = InspectView(self.image_paths[self.current_index], self.current_image,
+                                       (self.img_x, self.img_y), self.display_surface.get_size(),
+                                       self.orientation, self.icc_profile)
+        except Exception as e:
+            print(f"{Fore.RED}Could not open image for inspection: {e}")
+            return
+        self.apply_memory_level()
+        self.transition_state = None
+        self.inspect_started = pygame.time.get_ticks()
+
+    def close_inspect(self):
+        if not self.inspect:
+            return
+        self.inspect.close()
+        self.inspect = None
+        self.inspect_drag = None
+        # Inspecting doesn't count against the slide's display time.
+        if self.last_switch_time is not None and not self.paused:
+            self.last_switch_time += pygame.time.get_ticks() - self.inspect_started
+
+    def toggle_grid(self):
+        """Open the thumbnail grid scrolled to the current slide, or close it."""
+        if self.grid:
+            self.close_grid()
+            return
+        if not self.image_paths:
+            return
+        self.close_search()
+        self.close_inspect()
+        if self.thumb_store is None:
+            self.thumb_store = ThumbnailStore(CacheDB.shared())
+        self.grid = ThumbnailGrid(self.image_paths, self.display_surface.get_size(), 50, self.thumb_store)
+        self.grid.scroll_to(self.current_index)
+        self.apply_memory_level()
+        self.transition_state = None
+        self.grid_started = pygame.time.get_ticks()
+
+    def close_grid(self, select=None):
+        """Leave the grid, showing slide ``select`` if one was clicked."""
+        if not self.grid:
+            return
+        self.grid.close()
+        self.grid = None
+        if select is not None and select != self.current_index:
+            self.current_index = select
+            self.show_valid_image(1)
+        elif self.last_switch_time is not None and not self.paused:
+            # Browsing the grid doesn't count against the slide's display time.
+            self.last_switch_time += pygame.time.get_ticks() - self.grid_started
+
+    def slide_timer_held(self):
+        """True while a mode that pauses the slide clock (inspect, grid, search) is open,
+        or while navigation is on its way to another slide."""
+        return (self.inspect is not None or self.grid is not None or self.search_open
+                or self.nav_target is not None)
+
+    def open_search(self):
+        self.close_grid()
+        self.close_inspect()
+        # Appended paths are added to the index as they arrive; rebuild it
+        # only once paths have been removed or the whole order was redrawn.
+        if self.search_index is None or self.search_stale:
+            self.search_index = FilenameIndex(self.image_paths)
+            self.search_stale = False
+        self.search_open = True
+        self.search_query = ''
+        self.search_started = pygame.time.get_ticks()
+        self.update_search()
+
+    def close_search(self, choice=None):
+        """Close the search overlay, jumping to result ``choice`` if given."""
+        if not self.search_open:
+            return
+        self.search_open = False
+        self.search_rows = []
+        if choice is not None:
+            target = self.resolve_search_result(self.search_results[choice])
+            if target is not None:
+                self.jump_to(target)
+                return
+        if self.last_switch_time is not None and not self.paused:
+            self.last_switch_time += pygame.time.get_ticks() - self.search_started
+
+    def update_search(self):
+        """Re-run the query; results are ``(label, kind, value)`` tuples."""
+        query = self.search_query.strip()
+        self.search_selected = 0
+        self.search_results = []
+        if not query:
+            self.search_status = "Type a slide number or part of a file name"
+            return
+        # Slide numbers count from the start of a mix, as in the caption.
+        if query.isdigit() and self.mix_offset < int(query) <= self.mix_offset + len(self.image_paths):
+            self.search_results.append((f"Go to slide {int(query)}", 'slide', int(query) - 1))
+        index = self.search_index
+        began = time.perf_counter()
+        hits, complete = index.search(query)
+        elapsed = (time.perf_counter() - began) * 1000
+        self.search_ms.add(elapsed)
+        for i in hits:
+            path = index.paths[i].replace('\\', '/')
+            self.search_results.append((f"{os.path.basename(path)}  -  {os.path.dirname(path)}", 'path', i))
+        self.search_status = f"{len(hits)} matches in {elapsed:.1f} ms"
+        if not index.ready:
+            self.search_status += " (index building)"
+        elif not complete:
+            self.search_status += " (partial)"
+
+    def resolve_search_result(self, result):
+        """Map a search result to a live playlist index, or None if it's gone."""
+        _, kind, value = result
+        if kind == 'slide':
+            if value < self.mix_offset:
+                print(f"{Fore.YELLOW}Slide {value + 1} has been dropped from the mix's history.")
+                return None
+            return min(value - self.mix_offset, len(self.image_paths) - 1)
+        path = self.search_index.paths[value]
+        # Usually the playlist hasn't moved since the snapshot.
+        if value < len(self.image_paths) and self.image_paths[value] == path:
+            return value
+        try:
+            return self.image_paths.index(path)
+        except ValueError:
+            print(f"{Fore.YELLOW}{path} is no longer in the playlist.")
+            return None
+
+    def handle_search_key(self, event):
+        if event.key == pygame.K_ESCAPE:
+            self.close_search()
+        elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+            if self.search_results:
+                self.close_search(self.search_selected)
+        elif event.key == pygame.K_UP:
+            self.search_selected = max(0, self.search_selected - 1)
+        elif event.key == pygame.K_DOWN:
+            self.search_selected = min(len(self.search_results) - 1, self.search_selected + 1)
+        elif event.key == pygame.K_BACKSPACE:
+            self.search_query = self.search_query[:-1]
+            self.update_search()
+        elif event.unicode and event.unicode.isprintable():
+            self.search_query += event.unicode
+            self.update_search()
+
+    def draw_search_overlay(self):
+        font = self.font_local if self.font_local else self.font_cjk
+        w, h = self.display_surface.get_size()
+        line_h = font.get_linesize() + 6
+        box_w = min(720, w - 40)
+        x0, y0 = (w - box_w) // 2, 62
+        max_rows = max(1, min(12, (h - y0 - 16) // line_h - 2))
+        first = max(0, self.search_selected - max_rows + 1)
+        rows = self.search_results[first:first + max_rows]
+        box = pygame.Rect(x0, y0, box_w, line_h * (2 + len(rows)) + 12)
+
+        panel = pygame.Surface(box.size, pygame.SRCALPHA)
+        panel.fill((18, 18, 22, 230))
+        self.display_surface.blit(panel, box.topleft)
+        pygame.draw.rect(self.display_surface, (50, 50, 60), box, 1)
+        self.display_surface.set_clip(box.inflate(-12, 0))
+        self.draw_text_mixed(self.display_surface, f"Search: {self.search_query}_", (x0 + 12, y0 + 6), (255, 255, 255))
+        self.draw_text_mixed(self.display_surface, self.search_status, (x0 + 12, y0 + 6 + line_h), (130, 130, 130))
+        self.search_rows = []
+        for n, (label, _, _) in enumerate(rows):
+            row = pygame.Rect(x0 + 4, y0 + 6 + line_h * (2 + n), box_w - 8, line_h)
+            if first + n == self.search_selected:
+                pygame.draw.rect(self.display_surface, (56, 60, 76), row)
+            self.draw_text_mixed(self.display_surface, label, (row.left + 8, row.top + 3), (220, 220, 220))
+            self.search_rows.append((row, first + n))
+        self.display_surface.set_clip(None)
+
+    def search_row_at(self, pos):
+        for row, choice in self.search_rows:
+            if row.collidepoint(pos):
+                return choice
+        return None
+
+    def jump_to(self, index, direction=None):
+        """Show slide ``index`` (0-based) directly."""
+        if not self.image_paths:
+            return
+        old = self.current_image, (getattr(self, 'img_x', 0), getattr(self, 'img_y', 0))
+        if direction is None:
+            direction = 1 if index >= self.current_index else -1
+        self.current_index = index % len(self.image_paths)
+        self.show_valid_image(direction)
+        self.begin_transition(*old, direction=direction)
+
+    @traced('rescale_image')
     def rescale_image(self):
         if not hasattr(self, 'pil_image'):
             return
 
-        # Determine dimensions from the first frame or the static image
+        # Rescale from the first frame or the static image
         if self.is_gif and self.gif_frames:
-            img_w, img_h = self.gif_frames[0].size
-        elif hasattr(self, 'original_image'):
-            img_w, img_h = self.original_image.size
+            frames = self.gif_frames
+        elif getattr(self, 'original_image', None) is not None:
+            frames = [self.original_image]
         else:
-            return
-        
-        win_w = self.display_surface.get_width()
-        win_h = self.display_surface.get_height()
-        
-        ratio = min(win_w/img_w, win_h/img_h)
-        new_w = int(img_w * ratio)
-        new_h = int(img_h * ratio)
-        
-        if new_w > 0 and new_h > 0:
-            # Center image on surface
-            self.img_x = (win_w - new_w) // 2
-            self.img_y = (win_h - new_h) // 2
-            
+            # The memory governor dropped the originals; decode them again.
+            try:
+                slide = decode_slide(self.image_paths[self.current_index], self.display_surface.get_size())
+            except Exception as e:
+                print(f"Error reloading image for rescale: {e}")
+                return
+            frames = slide.gif_frames if self.is_gif else [slide.original_image]
+
+        surfaces, pos = scale_frames(frames, self.display_surface.get_size(), self.orientation, self.icc_profile)
+        if surfaces:
+            self.img_x, self.img_y = pos
             if self.is_gif:
-                self.scaled_gif_frames = []
-                # Rescale all frames
-                for frame in self.gif_frames:
-                    scaled = frame.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                    # Convert PIL image to Pygame surface
-                    mode = scaled.mode
-                    size = scaled.size
-                    data = scaled.tobytes()
-                    surf = pygame.image.frombytes(data, size, mode)
-                    self.scaled_gif_frames.append(surf)
-                
-                if self.scaled_gif_frames:
-                    self.current_image = self.scaled_gif_frames[0]
-            else:
-                scaled = self.original_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                mode = scaled.mode
-                size = scaled.size
-                data = scaled.tobytes()
-                self.current_image = pygame.image.frombytes(data, size, mode)
+                self.scaled_gif_frames = surfaces
+            self.current_image = surfaces[0]
+
+    def navigate(self, step):
+        """Head ``step`` slides from the current (or already targeted) slide.
+
+        Keyboard, mouse and wheel navigation only move a target index here;
+        settle_navigation decodes and shows the slide it ends up on, so
+        skipping quickly through many slides costs one full decode.
+        """
+        if not self.image_paths:
+            return
+        now = pygame.time.get_ticks()
+        if self.nav_target is None or now - self.nav_last_input >= NAV_SETTLE_MS:
+            self.nav_burst = 0
+        if self.nav_target is None:
+            self.nav_target = self.current_index
+        self.close_inspect()
+        self.nav_target = (self.nav_target + step) % len(self.image_paths)
+        self.nav_step = 1 if step > 0 else -1
+        self.nav_burst += 1
+        self.nav_last_input = now
+        self.nav_stats['steps'] += 1
+        if self.nav_requested is not None and self.nav_requested != self.nav_target:
+            # Passed it already: stop decoding it and reading anything queued for it.
+            self.nav_requested = None
+            if self.prefetcher:
+                self.prefetcher.cancel()
+            if self.reader:
+                self.reader.want([])
+        self.update_caption(self.nav_target)
+
+    def settle_navigation(self, now):
+        """Show a preview while a burst is running; land once input pauses and the slide is decoded."""
+        if self.nav_target is None:
+            return
+        if not self.image_paths:
+            self.nav_target = None
+            return
+        self.nav_target %= len(self.image_paths)
+        path = self.image_paths[self.nav_target]
+        if self.nav_previewer:
+            for (index, preview_path), image in self.nav_previewer.drain():
+                if image is not None and index == self.nav_target and preview_path == path:
+                    self.show_nav_preview(image)
+        if self.nav_target == self.current_index and not self.nav_preview_shown:
+            self.nav_target = self.nav_requested = None  # went there and back again
+            self.prefetch_next(self.nav_direction)
+            return
+        size = self.display_surface.get_size()
+        if self.nav_burst > 1 and now - self.nav_last_input < NAV_SETTLE_MS:
+            self.request_nav_preview(self.nav_target)
+            return
+        if self.prefetcher and self.nav_requested != self.nav_target:
+            self.nav_requested = self.nav_target
+            if self.reader:
+                self.reader.want([path])
+            self.prefetcher.request(path, size)
+        if self.prefetcher and not self.prefetcher.ready(path, size):
+            # Still decoding; keep the UI responsive in the meantime.
+            self.request_nav_preview(self.nav_target)
+            return
+        target = self.nav_target
+        self.nav_target = None
+        self.nav_stats['landings'] += 1
+        self.nav_landing = self.nav_last_input
+        self.jump_to(target, direction=self.nav_step)
+
+    def request_nav_preview(self, index):
+        """Have the preview worker make a low-resolution image of slide ``index``.
+
+        Only the latest request is kept, so a fast burst never queues up
+        previews of slides already passed.
+        """
+        if self.nav_preview_index == index:
+            return
+        self.nav_preview_index = index
+        if self.nav_previewer is None:
+            if self.thumb_store is None:
+                self.thumb_store = ThumbnailStore(CacheDB.shared())
+            self.nav_previewer = BackgroundPool(self.load_nav_preview, workers=1, name='nav-preview')
+        self.nav_previewer.clear()
+        self.nav_previewer.submit((index, self.image_paths[index]))
+
+    def load_nav_preview(self, item):
+        """Worker: the grid's cached thumbnail if there is one, else a reduced decode."""
+        _, path = item
+        try:
+            return (self.thumb_store.load(path, source_mtime(path), GRID_THUMB)
+                    or make_thumbnail(path, NAV_PREVIEW_EDGE))
+        except Exception:
+            return None
+
+    def show_nav_preview(self, image):
+        win_w, win_h = self.display_surface.get_size()
+        ratio = min(win_w / image.width, win_h / image.height)
+        new_size = (max(1, int(image.width * ratio)), max(1, int(image.height * ratio)))
+        surface = pygame.image.frombytes(image.tobytes(), image.size, image.mode)
+        self.current_image = pygame.transform.smoothscale(surface, new_size)
+        self.img_x, self.img_y = (win_w - new_size[0]) // 2, (win_h - new_size[1]) // 2
+        self.gif_start = None  # stop the old slide's animation drawing over the preview
+        self.nav_preview_shown = True
+        self.nav_stats['previews'] += 1
+
+    def advance_due(self):
+        """Tick at which the slide should auto-advance, or None if not scheduled yet."""
+        if self.sync_following:
+            return self.sync_deadline
+        if self.last_switch_time is None:
+            return None
+        return self.last_switch_time + self.slide_duration
+
+    def advance(self):
+        """Auto-advance: the next slide, or the one the sync leader is moving to."""
+        if self.sync_following and self.sync_next is not None:
+            self.sync_advanced = (self.current_index, self.sync_leader_deadline)
+            target, self.sync_next, self.sync_deadline = self.sync_next, None, None
+            self.jump_to(target, direction=1)
+        else:
+            self.next_image()
 
     def next_image(self):
         if not self.image_paths: return
+        old = self.current_image, (getattr(self, 'img_x', 0), getattr(self, 'img_y', 0))
         self.current_index = (self.current_index + 1) % len(self.image_paths)
-        self.load_current_image()
+        self.show_valid_image(1)
+        self.begin_transition(*old, direction=1)
 
     def prev_image(self):
         if not self.image_paths: return
+        old = self.current_image, (getattr(self, 'img_x', 0), getattr(self, 'img_y', 0))
         self.current_index = (self.current_index - 1) % len(self.image_paths)
-        self.load_current_image()
+        self.show_valid_image(-1)
+        self.begin_transition(*old, direction=-1)
+
+    def show_valid_image(self, direction):
+        """Load the current slide, stepping past known-bad or unloadable files.
+
+        At most HeaderValidator.AHEAD files are tried here, so a long run of
+        unreadable ones doesn't freeze the window; after that (or after one
+        lap of the playlist) the error slide shows and the validator marks
+        the rest in the background.
+        """
+        attempts = 0
+        for _ in range(len(self.image_paths)):
+            path = self.image_paths[self.current_index]
+            if not (self.validator and self.validator.is_bad(path)):
+                self.load_current_image()
+                if self.current_image is not None or not self.validator:
+                    break
+                self.validator.mark_bad(path, getattr(self, 'load_error', 'decode failed'),
+                                        persist=getattr(self, 'load_error_persists', True))
+                attempts += 1
+                if attempts >= HeaderValidator.AHEAD:
+                    break
+            self.stats['skipped'] += 1
+            self.current_index = (self.current_index + direction) % len(self.image_paths)
+        else:
+            self.load_current_image()
+        self.nav_direction = direction
+        self.validate_around()
+        self.prefetch_next(direction)
+
+    def validate_around(self):
+        """Queue header probes for the slides just ahead of and behind the playhead."""
+        if not self.validator or not self.image_paths:
+            return
+        n = len(self.image_paths)
+        ahead = min(n, HeaderValidator.AHEAD)
+        behind = min(n - ahead, HeaderValidator.BEHIND)
+        self.validator.request(self.image_paths[(self.current_index + i) % n]
+                               for i in range(-behind, ahead + 1))
 
+    @traced('draw_text_mixed')
     def draw_text_mixed(self, surface, text, pos, color):
         x, y = pos
         
@@ -464,6 +5432,71 @@ class InstantSlideshow:
             except:
                 pass
 
+    def begin_transition(self, old_image, old_pos, direction=1):
+        """Snapshot the outgoing and incoming slides as opaque display-format frames.
+
+        Building both frames once up front keeps each transition frame down to
+        two plain blits, one of them with surface alpha.
+        """
+        self.transition_state = None
+        if (self.transition == 'none' or self.transition_disabled
+                or old_image is None or self.current_image is None):
+            return
+        size = self.display_surface.get_size()
+        frames = []
+        for image, pos in ((old_image, old_pos), (self.current_image, (self.img_x, self.img_y))):
+            frame = pygame.Surface(size).convert()
+            frame.fill((0, 0, 0))
+            frame.blit(image, pos)
+            frames.append(frame)
+        self.transition_state = {
+            'from': frames[0], 'to': frames[1], 'start': None,
+            'direction': direction, 'overruns': 0,
+        }
+
+    def draw_transition(self, now):
+        """Draw one transition frame; returns False once there's nothing to draw.
+
+        A frame whose blending takes longer than TRANSITION_BUDGET_MS counts
+        as an overrun; two overruns cut to the new slide, and after three cut
+        transitions they're turned off for the session.
+        """
+        state = self.transition_state
+        if state is None:
+            return False
+        if state['start'] is None:
+            state['start'] = now
+        t = (now - state['start']) / self.transition_ms if self.transition_ms > 0 else 1
+        if t >= 1:
+            self.transition_state = None
+            self.transitions_done += 1
+            return False
+
+        began = time.perf_counter()
+        if self.transition == 'slide':
+            w = self.display_surface.get_width()
+            eased = 1 - (1 - t) ** 3
+            shift = int(w * eased) * state['direction']
+            self.display_surface.blit(state['from'], (-shift, 0))
+            self.display_surface.blit(state['to'], (state['direction'] * w - shift, 0))
+        else:
+            self.display_surface.blit(state['from'], (0, 0))
+            state['to'].set_alpha(int(255 * t))
+            self.display_surface.blit(state['to'], (0, 0))
+        cost = (time.perf_counter() - began) * 1000
+        self.transition_cost.add(cost)
+
+        if cost > TRANSITION_BUDGET_MS:
+            state['overruns'] += 1
+            if state['overruns'] >= 2:
+                self.transition_state = None
+                self.transitions_cut += 1
+                if self.transitions_cut >= 3 and not self.transition_disabled:
+                    self.transition_disabled = True
+                    print(f"{Fore.YELLOW}Transitions exceed the {TRANSITION_BUDGET_MS}ms frame budget; "
+                          f"falling back to hard cuts.")
+        return True
+
     def toggle_pause(self):
         self.paused = not self.paused
         current_time = pygame.time.get_ticks()
@@ -473,12 +5506,25 @@ class InstantSlideshow:
             # Add the duration we were paused to the last switch time
             # effectively pushing the deadline forward
             offset = current_time - self.pause_start_time
-            self.last_switch_time += offset
-            self.last_gif_update += offset
+            if self.last_switch_time is not None:
+                self.last_switch_time += offset
+            if self.gif_start is not None:
+                self.gif_start += offset
 
     def open_current_folder(self):
         if not self.image_paths: return
         path = self.image_paths[self.current_index]
+        if is_url(path):
+            # Remote image: open its parent URL in the browser instead.
+            path = path.rsplit('/', 1)[0] + '/'
+            try:
+                if os.name == 'nt':
+                    os.startfile(path)
+                else:
+                    subprocess.Popen(['open' if sys.platform == 'darwin' else 'xdg-open', path])
+            except Exception as e:
+                print(f"Error opening folder: {e}")
+            return
         try:
             if os.name == 'nt':
                 # Windows: Select file in explorer
@@ -522,10 +5568,14 @@ class InstantSlideshow:
             pass
         pygame.display.flip()
 
+    @traced('delete_image_at')
     def delete_image_at(self, idx):
         if not self.image_paths or idx < 0 or idx >= len(self.image_paths):
             return
         path = self.image_paths[idx]
+        if is_url(path):
+            print(f"{Fore.YELLOW}Can't delete a remote image: {path}")
+            return
 
         self._draw_busy_overlay("Deleting...")
 
@@ -541,6 +5591,10 @@ class InstantSlideshow:
             pygame.event.clear([pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP])
 
         del self.image_paths[idx]
+        self.playlist_version += 1
+        self.search_stale = True
+        if self.path_keys is not None:
+            self.path_keys.discard(path_key(path))
 
         if not self.image_paths:
             print(f"{Fore.YELLOW}Playlist is empty. Exiting.")
@@ -553,7 +5607,7 @@ class InstantSlideshow:
         if self.current_index >= len(self.image_paths):
             self.current_index = 0
         if was_current:
-            self.load_current_image()
+            self.show_valid_image(1)
 
     def get_sort_order(self):
         if self.sort_order_arg:
@@ -567,13 +5621,12 @@ class InstantSlideshow:
             print(f"{Fore.CYAN}Using default sort order: {Style.BRIGHT}random")
             return
 
-        print(f"{Fore.GREEN}Enter sort order (random/name) [default: random]:")
+        print(f"{Fore.GREEN}Enter sort order ({'/'.join(SORT_ORDERS)}) [default: random]:")
         user_input = input(f"{Fore.YELLOW}Sort: {Style.RESET_ALL}").strip().lower()
-        
-        if user_input.startswith('n'):
-            self.sort_order = 'name'
-        else:
-            self.sort_order = 'random'
+
+        # Prefix match in SORT_ORDERS order, so 'n' still means name
+        matches = [o for o in SORT_ORDERS if user_input and o.startswith(user_input)]
+        self.sort_order = matches[0] if matches else 'random'
         print(f"{Fore.CYAN}Sort order set to {Style.BRIGHT}{self.sort_order}")
 
     def run(self):
@@ -583,16 +5636,17 @@ class InstantSlideshow:
         margin = 12
         spacing = 10
 
-        # Button areas (right-to-left): [close] [folder] [media] [trash] [back] [+ dur -]
+        # Button areas (right-to-left): [close] [folder] [media] [trash] [back] [grid] [+ dur -]
         close_rect = pygame.Rect(width - btn_size - margin, margin, btn_size, btn_size)
         folder_rect = pygame.Rect(width - btn_size - margin - btn_size - spacing, margin, btn_size, btn_size)
         media_rect = pygame.Rect(folder_rect.left - spacing - btn_size, margin, btn_size, btn_size)
         trash_rect = pygame.Rect(media_rect.left - spacing - btn_size, margin, btn_size, btn_size)
         back_rect = pygame.Rect(trash_rect.left - spacing - btn_size, margin, btn_size, btn_size)
+        grid_rect = pygame.Rect(back_rect.left - spacing - btn_size, margin, btn_size, btn_size)
 
         dur_btn_w = 20
         dur_text_w = 50
-        plus_rect = pygame.Rect(back_rect.left - spacing - dur_btn_w, margin, dur_btn_w, btn_size)
+        plus_rect = pygame.Rect(grid_rect.left - spacing - dur_btn_w, margin, dur_btn_w, btn_size)
         dur_text_rect = pygame.Rect(plus_rect.left - dur_text_w, margin, dur_text_w, btn_size)
         minus_rect = pygame.Rect(dur_text_rect.left - dur_btn_w, margin, dur_btn_w, btn_size)
         dur_control_rect = pygame.Rect(minus_rect.left, margin, plus_rect.right - minus_rect.left, btn_size)
@@ -603,41 +5657,86 @@ class InstantSlideshow:
         media_hit_rect = media_rect.inflate(hit_padding, hit_padding)
         trash_hit_rect = trash_rect.inflate(hit_padding, hit_padding)
         back_hit_rect = back_rect.inflate(hit_padding, hit_padding)
+        grid_hit_rect = grid_rect.inflate(hit_padding, hit_padding)
         plus_hit_rect = plus_rect.inflate(hit_padding, hit_padding)
         minus_hit_rect = minus_rect.inflate(hit_padding, hit_padding)
         dur_control_hit_rect = dur_control_rect.inflate(hit_padding, hit_padding)
 
         dur_font = self.font_local if self.font_local else self.font_cjk
+        grid_page = max(1, (self.display_surface.get_height() - header_h) // GRID_CELL - 1)
+        grid_scroll_keys = {pygame.K_UP: -1, pygame.K_DOWN: 1,
+                            pygame.K_PAGEUP: -grid_page, pygame.K_PAGEDOWN: grid_page}
 
         while self.running:
+            trace_phase('poll')
+            self.poll_memory(pygame.time.get_ticks())
+            self.poll_control()
+            self.poll_sync()
+            self.poll_scanner()
+            self.poll_mixer()
+            self.poll_list_watcher()
+            self.poll_indexer()
+            self.poll_deduper()
+            if self.validator:
+                self.validator.drain()
+            if self.soak:
+                self.soak.poll(self, pygame.time.get_ticks())
             current_time = pygame.time.get_ticks()
 
+            trace_phase('advance')
             # Freeze auto-advance while a UI button is held so the release
             # acts on the image the user was looking at when they pressed.
+            due = self.advance_due()
             if (not self.paused
                     and self.pressed_control is None
-                    and current_time - self.last_switch_time > self.slide_duration):
-                self.next_image()
+                    and not self.slide_timer_held()
+                    and due is not None
+                    and current_time >= due):
+                self.slide_lateness.add(current_time - due)
+                self.advance_target = due
+                self.advance()
 
-            if not self.paused and self.is_gif and self.scaled_gif_frames:
-                if current_time - self.last_gif_update > self.gif_durations[self.current_gif_frame]:
-                    self.current_gif_frame = (self.current_gif_frame + 1) % len(self.scaled_gif_frames)
-                    self.current_image = self.scaled_gif_frames[self.current_gif_frame]
-                    self.last_gif_update = current_time
+            if not self.paused and not self.window_hidden:
+                self.update_gif_frame(current_time)
 
+            trace_phase('events')
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
                 
                 elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
+                    if self.search_open:
+                        self.handle_search_key(event)
+                    elif event.key == pygame.K_SLASH or (event.key == pygame.K_f and event.mod & pygame.KMOD_CTRL):
+                        self.open_search()
+                    elif self.grid and event.key in (pygame.K_ESCAPE, pygame.K_g):
+                        self.close_grid()
+                    elif self.grid and event.key in grid_scroll_keys:
+                        self.grid.scroll_by(grid_scroll_keys[event.key] * GRID_CELL)
+                    elif self.grid and event.key == pygame.K_HOME:
+                        self.grid.scroll_by(-self.grid.max_scroll)
+                    elif self.grid and event.key == pygame.K_END:
+                        self.grid.scroll_by(self.grid.max_scroll)
+                    elif self.grid and event.key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_z):
+                        pass
+                    elif event.key == pygame.K_ESCAPE and self.inspect:
+                        self.close_inspect()
+                    elif event.key == pygame.K_g:
+                        self.toggle_grid()
+                    elif event.key == pygame.K_ESCAPE:
                         self.running = False
+                    elif event.key == pygame.K_z:
+                        self.toggle_inspect()
                     elif event.key == pygame.K_RIGHT:
-                        self.next_image()
+                        self.navigate(1)
                     elif event.key == pygame.K_LEFT:
-                        self.prev_image()
+                        self.navigate(-1)
                     elif event.key == pygame.K_SPACE:
                         self.toggle_pause()
+                    elif event.key == pygame.K_i:
+                        self.show_stats = not self.show_stats
+                    elif event.key == pygame.K_t and Tracer.active:
+                        Tracer.active.dump('key')
                 
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1: # Left Click
@@ -656,6 +5755,8 @@ class InstantSlideshow:
                             self.pending_delete_index = self.current_index
                         elif back_hit_rect.collidepoint(event.pos):
                             self.pressed_control = 'back'
+                        elif grid_hit_rect.collidepoint(event.pos):
+                            self.pressed_control = 'grid'
                         elif plus_hit_rect.collidepoint(event.pos):
                             self.pressed_control = 'plus'
                         elif minus_hit_rect.collidepoint(event.pos):
@@ -667,22 +5768,46 @@ class InstantSlideshow:
                                 self.drag_start_pos = event.pos
                                 self.drag_offset_x = event.pos[0]
                                 self.drag_offset_y = event.pos[1]
+                        elif self.search_open:
+                            self.pending_search_row = self.search_row_at(event.pos)
+                            if self.pending_search_row is None:
+                                self.close_search()
+                            else:
+                                self.pressed_control = 'search_row'
+                        elif self.grid:
+                            self.pressed_control = 'grid_cell'
+                            self.pending_grid_index = self.grid.index_at(event.pos)
+                        elif self.inspect:
+                            self.inspect_drag = event.pos
                         else:
-                            self.prev_image()
+                            self.navigate(-1)
                     elif event.button == 2: # Middle Click
                         self.toggle_pause()
                     elif event.button == 3: # Right Click
-                        self.next_image()
+                        if not (self.grid or self.search_open):
+                            self.navigate(1)
                     elif event.button == 4: # Scroll Up
                         if dur_control_rect.collidepoint(event.pos):
                             self.slide_duration = min(self.slide_duration + 1000, 3600000)
+                        elif self.search_open:
+                            self.search_selected = max(0, self.search_selected - 1)
+                        elif self.grid:
+                            self.grid.scroll_by(-GRID_CELL / 2)
+                        elif self.inspect:
+                            self.inspect.zoom_at(event.pos, 1.25)
                         else:
-                            self.prev_image()
+                            self.navigate(-1)
                     elif event.button == 5: # Scroll Down
                         if dur_control_rect.collidepoint(event.pos):
                             self.slide_duration = max(self.slide_duration - 1000, 1000)
+                        elif self.search_open:
+                            self.search_selected = min(len(self.search_results) - 1, self.search_selected + 1)
+                        elif self.grid:
+                            self.grid.scroll_by(GRID_CELL / 2)
+                        elif self.inspect:
+                            self.inspect.zoom_at(event.pos, 1 / 1.25)
                         else:
-                            self.next_image()
+                            self.navigate(1)
 
                 elif event.type == pygame.MOUSEBUTTONUP:
                     if event.button == 1:
@@ -698,6 +5823,15 @@ class InstantSlideshow:
                             elif self.pressed_control == 'back' and back_hit_rect.collidepoint(event.pos):
                                 self.next_action = 'picker'
                                 self.running = False
+                            elif self.pressed_control == 'grid' and grid_hit_rect.collidepoint(event.pos):
+                                self.toggle_grid()
+                            elif (self.pressed_control == 'grid_cell' and self.grid
+                                    and self.pending_grid_index is not None
+                                    and self.grid.index_at(event.pos) == self.pending_grid_index):
+                                self.close_grid(select=self.pending_grid_index)
+                            elif (self.pressed_control == 'search_row' and self.search_open
+                                    and self.search_row_at(event.pos) == self.pending_search_row):
+                                self.close_search(self.pending_search_row)
                             elif self.pressed_control == 'plus' and plus_hit_rect.collidepoint(event.pos):
                                 self.slide_duration = min(self.slide_duration + 1000, 3600000)
                             elif self.pressed_control == 'minus' and minus_hit_rect.collidepoint(event.pos):
@@ -706,8 +5840,21 @@ class InstantSlideshow:
                         self.pressed_control = None
                         self.pending_drag = False
                         self.dragging = False
+                        self.inspect_drag = None
+
+                elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+                    self.update_window_state(hidden=True)
+                elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN,
+                                    pygame.WINDOWMAXIMIZED, pygame.WINDOWEXPOSED):
+                    self.update_window_state(hidden=False)
+                elif event.type in (pygame.WINDOWFOCUSLOST, pygame.WINDOWFOCUSGAINED):
+                    self.update_window_state(focused=event.type == pygame.WINDOWFOCUSGAINED)
 
                 elif event.type == pygame.MOUSEMOTION:
+                    if self.inspect and self.inspect_drag:
+                        self.inspect.pan(event.pos[0] - self.inspect_drag[0], event.pos[1] - self.inspect_drag[1])
+                        self.inspect_drag = event.pos
+
                     if self.pending_drag and not self.dragging:
                         dx = abs(event.pos[0] - self.drag_start_pos[0])
                         dy = abs(event.pos[1] - self.drag_start_pos[1])
@@ -720,26 +5867,55 @@ class InstantSlideshow:
                         hwnd = pygame.display.get_wm_info()['window']
                         ctypes.windll.user32.SetWindowPos(hwnd, 0, pt.x - self.drag_offset_x, pt.y - self.drag_offset_y, 0, 0, 0x0001 | 0x0004)
 
+            trace_phase('settle')
+            self.settle_navigation(pygame.time.get_ticks())
+
+            if self.window_hidden:
+                # Nobody can see it: keep the slide schedule, skip drawing.
+                self.mark_presented(flipped=False)
+                self.finish_control_commands()
+                trace_frame_end()
+                self.wait_for_next_frame()
+                continue
+
+            trace_phase('draw')
+            frame_began = time.perf_counter()
             self.display_surface.fill((0, 0, 0))
+            mouse_pos = pygame.mouse.get_pos()
+            grid_hover = self.grid.index_at(mouse_pos) if self.grid else None
 
-            if self.current_image:
+            if self.grid:
+                self.grid.draw(self.display_surface, self.current_index, grid_hover)
+            elif self.inspect:
+                self.inspect.draw(self.display_surface)
+            elif self.draw_transition(current_time):
+                pass
+            elif self.current_image:
                 self.display_surface.blit(self.current_image, (self.img_x, self.img_y))
             else:
                 err_surf = self.font_cjk.render("Could not load image", True, (255, 255, 255))
                 self.display_surface.blit(err_surf, err_surf.get_rect(center=(self.width // 2, self.height // 2)))
 
+            trace_phase('header')
             header_surf = pygame.Surface((self.display_surface.get_width(), header_h), pygame.SRCALPHA)
             header_surf.fill((0, 0, 0, 180))
             self.display_surface.blit(header_surf, (0, 0))
 
-            if hasattr(self, 'caption_text'):
+            if self.grid:
+                if grid_hover is not None:
+                    hover_path = self.image_paths[grid_hover].replace('\\', '/')
+                    display_text = f"Slide {grid_hover + 1}/{len(self.image_paths)} - {hover_path}"
+                else:
+                    display_text = f"{len(self.image_paths)} images"
+                self.draw_text_mixed(self.display_surface, display_text, (15, 15), (0, 255, 0))
+            elif hasattr(self, 'caption_text'):
                 display_text = self.caption_text
                 if self.paused:
                     display_text += " [PAUSED]"
+                if self.inspect:
+                    display_text += f" [ZOOM {self.inspect.zoom * 100:.0f}%]"
                 self.draw_text_mixed(self.display_surface, display_text, (15, 15), (0, 255, 0))
 
-            mouse_pos = pygame.mouse.get_pos()
-
             close_color = (255, 80, 80) if close_hit_rect.collidepoint(mouse_pos) else (180, 180, 180)
             draw_close_x(self.display_surface, close_rect, close_color)
 
@@ -764,6 +5940,11 @@ class InstantSlideshow:
             pygame.draw.rect(self.display_surface, back_color, body, 2)
             pygame.draw.rect(self.display_surface, back_color, pygame.Rect(back_rect.centerx - 2, body.bottom - 6, 4, 6), 2)
 
+            grid_color = (100, 200, 255) if (self.grid or grid_hit_rect.collidepoint(mouse_pos)) else (180, 180, 180)
+            for gx in (grid_rect.left + 3, grid_rect.left + 13):
+                for gy in (grid_rect.top + 3, grid_rect.top + 13):
+                    pygame.draw.rect(self.display_surface, grid_color, (gx, gy, 8, 8))
+
             is_trash_hover = trash_hit_rect.collidepoint(mouse_pos)
             is_trash_pressed = self.pressed_control == 'trash' and is_trash_hover
             if is_trash_pressed:
@@ -800,8 +5981,452 @@ class InstantSlideshow:
             except Exception as e:
                 print(f"dur render failed: {e}")
 
+            trace_phase('overlays')
+            if self.search_open:
+                self.draw_search_overlay()
+
+            if self.show_stats:
+                self.draw_stats_overlay()
+
+            trace_phase('flip')
             pygame.display.flip()
-            self.clock.tick(30)
+            self.frame_work.add((time.perf_counter() - frame_began) * 1000)
+            trace_phase('present')
+            self.mark_presented()
+            self.finish_control_commands()
+            trace_frame_end()
+            self.wait_for_next_frame()
+
+    def mark_presented(self, flipped=True):
+        """Start the slide (and GIF) clock on the first flip that shows the new slide.
+
+        While hidden there is no flip: the clock still starts so the schedule
+        keeps going, but the latency stats wait for the first real flip.
+        """
+        now = pygame.time.get_ticks()
+        if self.last_switch_time is None:
+            self.last_switch_time = now
+            self.present_pending = True
+            if self.is_gif and self.scaled_gif_frames:
+                self.gif_start = now
+                self.current_gif_frame = 0
+        if flipped and self.present_pending:
+            self.present_pending = False
+            self.load_to_screen.add(now - self.load_started)
+            if self.advance_target is not None:
+                self.advance_flip.add(now - self.advance_target)
+                self.advance_target = None
+            if self.nav_landing is not None:
+                self.nav_latency.add(now - self.nav_landing)
+                self.nav_landing = None
+            if self.is_gif and self.scaled_gif_frames:
+                self.gif_frames_shown += 1
+
+    def update_gif_frame(self, now):
+        """Show the GIF frame scheduled for ``now``, dropping any frames we're late for.
+
+        Frame times are offsets from ``gif_start``, so a slow loop never
+        delays the rest of the animation.
+        """
+        if not (self.is_gif and self.scaled_gif_frames and self.gif_start is not None and self.gif_total):
+            return
+        elapsed = (now - self.gif_start) % self.gif_total
+        frame = bisect.bisect_right(self.gif_offsets, elapsed) - 1
+        if frame == self.current_gif_frame:
+            return
+        n = len(self.scaled_gif_frames)
+        self.gif_frames_dropped += (frame - self.current_gif_frame - 1) % n
+        self.gif_frames_shown += 1
+        self.gif_lateness.add(elapsed - self.gif_offsets[frame])
+        self.current_gif_frame = frame
+        self.current_image = self.scaled_gif_frames[frame]
+
+    def next_deadline(self, now):
+        """Absolute tick of the next slide advance or GIF frame change, if any."""
+        deadline = self.advance_due()
+        if self.paused or deadline is None or self.slide_timer_held():
+            return None
+        if self.is_gif and self.gif_start is not None and self.gif_total and not self.window_hidden:
+            elapsed = now - self.gif_start
+            cycle_start = self.gif_start + elapsed - elapsed % self.gif_total
+            nxt = self.current_gif_frame + 1
+            frame_due = cycle_start + (self.gif_offsets[nxt] if nxt < len(self.gif_offsets) else self.gif_total)
+            deadline = min(deadline, frame_due)
+        return deadline
+
+    def wait_for_next_frame(self):
+        """Sleep until the next frame, waking early for a pending deadline."""
+        now = pygame.time.get_ticks()
+        # Transitions, grid scrolling and navigation bursts run at 60 FPS so they look smooth.
+        busy = self.transition_state or self.grid or self.nav_target is not None
+        if self.window_hidden:
+            interval = HIDDEN_FRAME_MS
+        elif busy:
+            interval = self.frame_interval // 2
+        elif not self.window_focused:
+            interval = UNFOCUSED_FRAME_MS
+        else:
+            interval = self.frame_interval
+        due = self.last_frame_time + interval
+        deadline = self.next_deadline(now)
+        if deadline is not None:
+            due = min(due, deadline)
+        if self.control:
+            # Sleep on the control server's event so a command cuts the wait short.
+            if due > now and not self.control.commands.qsize():
+                self.control.wakeup.wait((due - now) / 1000)
+            self.control.wakeup.clear()
+        elif due > now and self.window_hidden:
+            # Wake soon after an event arrives, so restoring the window redraws at
+            # once; the event stays queued for the loop to handle in order.
+            while now < due and not pygame.event.peek():
+                pygame.time.wait(min(HIDDEN_EVENT_POLL_MS, due - now))
+                now = pygame.time.get_ticks()
+        elif due > now:
+            pygame.time.wait(due - now)
+        self.last_frame_time = pygame.time.get_ticks()
+
+    def update_window_state(self, hidden=None, focused=None):
+        """Apply a minimise/restore or focus change; frame pacing follows ``activity.state``."""
+        was_hidden = self.window_hidden
+        if hidden is not None:
+            self.window_hidden = hidden
+        if focused is not None:
+            self.window_focused = focused
+        state = 'hidden' if self.window_hidden else 'visible' if self.window_focused else 'unfocused'
+        if state != self.activity.state:
+            self.activity.switch(state)
+        if was_hidden and not self.window_hidden:
+            # GIFs weren't advanced while hidden; jump to the frame due now without counting drops.
+            now = pygame.time.get_ticks()
+            if self.is_gif and self.scaled_gif_frames and self.gif_start is not None and self.gif_total:
+                elapsed = (now - self.gif_start) % self.gif_total
+                self.current_gif_frame = bisect.bisect_right(self.gif_offsets, elapsed) - 1
+                self.current_image = self.scaled_gif_frames[self.current_gif_frame]
+            if self.present_pending:
+                # Time the slide shown while hidden from the restore, not from its load.
+                self.load_started = max(self.load_started, now)
+                if self.advance_target is not None:
+                    self.advance_target = max(self.advance_target, now)
+                if self.nav_landing is not None:
+                    self.nav_landing = max(self.nav_landing, now)
+            self.last_frame_time = now - self.frame_interval
+
+    def poll_control(self):
+        """Apply queued control API commands; they complete after the next flip."""
+        if not self.control:
+            return
+        for cmd in self.control.drain():
+            try:
+                cmd.result = self.run_command(cmd.name, cmd.args)
+            except (ValueError, TypeError, KeyError) as e:
+                cmd.error = str(e) or type(e).__name__
+                cmd.done.set()
+                continue
+            self.control_pending.append(cmd)
+
+    def run_command(self, name, args):
+        if name == 'next':
+            self.next_image()
+        elif name == 'prev':
+            self.prev_image()
+        elif name in ('pause', 'resume', 'toggle-pause'):
+            if name == 'toggle-pause' or self.paused != (name == 'pause'):
+                self.toggle_pause()
+        elif name == 'jump':
+            index = int(args['index']) - self.mix_offset
+            if not 1 <= index <= len(self.image_paths):
+                raise ValueError(f"index must be between {self.mix_offset + 1} and "
+                                 f"{self.mix_offset + len(self.image_paths)}")
+            self.jump_to(index - 1)
+        elif name == 'duration':
+            self.slide_duration = max(1000, min(int(float(args['seconds']) * 1000), 3600000))
+        elif name == 'load':
+            source = str(args['source'])
+            if not source_exists(source):
+                raise ValueError(f"{source} does not exist")
+            self.next_source = source
+            self.next_action = 'load'
+            self.running = False
+        elif name == 'metrics':
+            return {'stats': self.stats_lines(), 'footprint': self.memory_footprint()}
+        elif name == 'trace':
+            if Tracer.active is None:
+                raise ValueError("tracing is off; start the slideshow with --trace DIR")
+            return {'trace': Tracer.active.dump('control')}
+        return self.status()
+
+    def finish_control_commands(self):
+        """Called right after a flip: everything applied so far is now on screen."""
+        if self.control_pending:
+            now = time.perf_counter()
+            for cmd in self.control_pending:
+                cmd.latency_ms = (now - cmd.received) * 1000
+                self.control_latency.add(cmd.latency_ms)
+                cmd.done.set()
+            self.control_pending = []
+        if self.control:
+            self.control.publish(self.status())
+
+    def status(self):
+        remaining = None
+        if self.last_switch_time is not None and not self.paused and not self.slide_timer_held():
+            remaining = max(0, self.last_switch_time + self.slide_duration - pygame.time.get_ticks())
+        mode = 'inspect' if self.inspect else 'grid' if self.grid else 'search' if self.search_open else 'slideshow'
+        return {
+            'running': self.running,
+            'index': self.mix_offset + self.current_index + 1,
+            'total': self.mix_offset + len(self.image_paths),
+            'path': self.image_paths[self.current_index] if self.image_paths else None,
+            'paused': self.paused,
+            'duration': self.slide_duration / 1000,
+            'remaining_ms': remaining,
+            'mode': mode,
+            'window': self.activity.state,
+            'source': getattr(self, 'selected_file_path', self.file_path_arg),
+        }
+
+    def playlist_settled(self):
+        """False while a scan, metadata sort or content dedupe is still reshaping the playlist."""
+        return (self.scanner is None and not (self.indexer and self.indexer.submitted)
+                and not (self.deduper and not self.deduper.done))
+
+    def sync_digest(self):
+        """Hash of the playlist order, or None while the playlist is still settling.
+
+        Hashed once per playlist version, and not at all during a scan or
+        sort that bumps the version every batch; followers align by path
+        until then.
+        """
+        if not self.playlist_settled():
+            return None
+        if self.sync_hash is None or self.sync_hash[0] != self.playlist_version:
+            digest = hashlib.blake2b('\n'.join(self.image_paths).encode('utf-8', 'surrogatepass'),
+                                     digest_size=16).hexdigest()
+            self.sync_hash = (self.playlist_version, digest)
+        return self.sync_hash[1]
+
+    def sync_find(self, path, hint):
+        """Follower: index of ``path`` in this playlist, or None.
+
+        The leader's index and the slides at our playhead are tried first;
+        the full path -> index map is only built when they all miss.
+        """
+        paths = self.image_paths
+        for i in (hint, self.current_index, self.current_index + 1, self.sync_next):
+            if i is not None and 0 <= i < len(paths) and paths[i] == path:
+                return i
+        if self.sync_index is None or self.sync_index[0] != self.playlist_version:
+            self.sync_index = (self.playlist_version, {p: i for i, p in enumerate(paths)})
+        return self.sync_index[1].get(path)
+
+    def poll_sync(self):
+        """Leader: publish playback state. Follower: apply the leader's latest state."""
+        if not self.sync or not self.image_paths:
+            return
+        if self.sync.role == 'leader':
+            self.sync.publish(self.sync_state())
+            return
+        state = self.sync.take_state()
+        if state:
+            self.apply_sync_state(state)
+        elif self.sync_following and not self.sync.connected:
+            print(f"{Fore.YELLOW}Sync: lost the leader, continuing on local timing")
+            self.sync_following = False
+            self.sync_deadline = self.sync_next = None
+
+    def sync_state(self):
+        n = len(self.image_paths)
+        nxt = (self.current_index + 1) % n
+        due = self.advance_due()
+        deadline = None
+        if due is not None and not self.slide_timer_held():
+            # Ticks are process-local; send an absolute time on the leader's monotonic clock.
+            deadline = time.monotonic() + (due - pygame.time.get_ticks()) / 1000
+        return {
+            'hash': self.sync_digest(),
+            'index': self.current_index,
+            'path': self.image_paths[self.current_index],
+            'next': nxt,
+            'next_path': self.image_paths[nxt],
+            'deadline': deadline,
+            'paused': self.paused or self.slide_timer_held(),
+            'duration': self.slide_duration,
+            # Mixes are drawn alike from the seed; this is the slide's pick number.
+            'mix_pos': self.mix_offset + self.current_index if self.mixer else None,
+        }
+
+    def apply_sync_state(self, state):
+        """Line up with the leader's slide and adopt its advance deadline."""
+        reload = False
+        if state['seed'] != self.sync_seed and (self.mixer or self.sort_order == 'random'):
+            self.sync_seed = state['seed']
+            if self.mixer:
+                self.restart_mix(self.sync_seed)
+                reload = True
+            else:
+                current = self.image_paths[self.current_index]
+                self.image_paths[:] = seeded_order(self.image_paths, self.sync_seed)
+                self.playlist_version += 1
+                self.search_stale = True
+                self.current_index = self.image_paths.index(current)
+        mix_pos = state.get('mix_pos')
+        if self.mixer and mix_pos is not None:
+            self.catch_up_mix(mix_pos)
+        mix_index = mix_pos - self.mix_offset if self.mixer and mix_pos is not None else -1
+        if 0 <= mix_index < len(self.image_paths) - 1 and self.image_paths[mix_index] == state['path']:
+            aligned = 'mix'
+            target, nxt = mix_index, mix_index + 1
+        elif (state['hash'] is not None and len(self.image_paths) > max(state['index'], state['next'])
+              and state['hash'] == self.sync_digest()):
+            aligned = 'index'
+            target, nxt = state['index'], state['next']
+        else:
+            # Different playlist (or a different shuffle, or still settling): find the leader's slide by path.
+            aligned = 'path'
+            target = self.sync_find(state['path'], state['index'])
+            nxt = self.sync_find(state['next_path'], state['next'])
+            if target is None:
+                if self.sync_aligned != 'missing':
+                    print(f"{Fore.YELLOW}Sync: leader is showing a slide that isn't in this playlist")
+                self.sync_aligned = 'missing'
+                self.sync_following = False
+                return
+        advanced = self.sync_advanced
+        if (advanced and advanced[0] == target and state['deadline'] is not None and advanced[1] is not None
+                and abs(advanced[1] - state['deadline']) < 0.05):
+            # Sent before the leader reached the deadline we already acted on.
+            return
+        if not self.sync_following or aligned != self.sync_aligned:
+            print(f"{Fore.GREEN}Sync: following the leader (aligned by {aligned})")
+        self.sync_aligned = aligned
+        self.sync_following = True
+        self.sync_advanced = None
+        if self.paused != state['paused']:
+            # Through toggle_pause so the slide clock skips the paused time.
+            self.toggle_pause()
+        self.slide_duration = state['duration']
+        if target != self.current_index or reload:
+            self.jump_to(target)
+        self.sync_next = nxt
+        self.sync_deadline = None
+        self.sync_leader_deadline = state['deadline']
+        if state['deadline'] is not None:
+            wait = self.sync.to_local(state['deadline']) - time.monotonic()
+            self.sync_deadline = pygame.time.get_ticks() + round(wait * 1000)
+
+    def sync_line(self):
+        if self.sync.role == 'leader':
+            host, port = self.sync.address[:2]
+            return (f"Sync: leading {len(self.sync.followers)} followers on {host}:{port}  |  "
+                    f"seed {self.sync.seed}, {self.sync.sent} states sent")
+        f = self.sync
+        if f.offset is None:
+            return f"Sync: waiting for leader {f.leader[0]}:{f.leader[1]}"
+        state = f"aligned by {self.sync_aligned}" if self.sync_following else "not following"
+        return (f"Sync: {state}  |  clock offset {f.offset * 1000:+.1f} ms, rtt {f.rtt * 1000:.1f} ms")
+
+    def timing_report(self):
+        lines = [
+            f"Slide advance lateness: {self.slide_lateness.summary()}",
+            f"Load to screen: {self.load_to_screen.summary()}",
+            f"Advance deadline to flip: {self.advance_flip.summary()}",
+        ]
+        if self.gif_frames_shown:
+            lines.append(f"GIF frames: {self.gif_frames_shown} shown, {self.gif_frames_dropped} dropped, "
+                         f"lateness {self.gif_lateness.summary()}")
+        return lines
+
+    def stats_lines(self):
+        lines = [f"Playlist: {len(self.image_paths)} images  |  prefetch hits: {self.stats['prefetch_hits']}"]
+        if self.mixer:
+            lines.append(f"Mix: {self.mixer.summary()}  |  no-repeat window {self.mixer.window}, "
+                         f"{self.mixer.redraws} redraws")
+        lines.extend(self.timing_report())
+        lines.append(f"Frame work: {self.frame_work.summary()}")
+        lines.append(f"Window: {self.activity.summary()}")
+        if Tracer.active:
+            lines.append(f"Trace: {Tracer.active.summary()}")
+        nav = self.nav_stats
+        if nav['steps']:
+            cancelled = self.prefetcher.cancelled if self.prefetcher else 0
+            lines.append(f"Navigation: {nav['steps']} steps, {nav['landings']} landed, {nav['previews']} previews, "
+                         f"{cancelled} decodes cancelled  |  last input to screen {self.nav_latency.summary()}")
+        if self.control:
+            host, port = self.control.address[:2]
+            lines.append(f"Control API: {host}:{port}  |  command to screen {self.control_latency.summary()}")
+        if self.sync:
+            lines.append(self.sync_line())
+        gov = self.governor
+        if gov.rss is not None:
+            limit = f" / limit {gov.ceiling // (1024 * 1024)}" if gov.ceiling else ""
+            lines.append(f"Memory: RSS {gov.rss // (1024 * 1024)}{limit} MB (peak {gov.peak // (1024 * 1024)})  |  "
+                         f"pressure {gov.level}, {gov.evictions} evictions ({gov.freed // (1024 * 1024)} MB)")
+        held = ", ".join(f"{name} {nbytes / (1024 * 1024):.0f}" for name, nbytes in self.memory_footprint().items() if nbytes)
+        lines.append(f"Images held (MB): {held or 'none'}")
+        if self.reader:
+            r = self.reader
+            queued, reading, buffered = r.depths
+            lines.append(f"Read-ahead: {queued} queued, {reading} reading, {buffered} buffered "
+                         f"({r.buffered_bytes // (1024 * 1024)}/{r.budget // (1024 * 1024)} MB)  |  "
+                         f"read {r.read_ms.summary()}  |  {r.hits} hits, {r.misses} misses")
+        if HttpFetcher._shared is not None:
+            h = HttpFetcher._shared
+            lines.append(f"HTTP: {h.requests} requests on {h.opened} connections ({h.reused} reused)  |  "
+                         f"cache {h.hits} fresh, {h.not_modified} not modified, {h.downloaded} downloaded "
+                         f"({h.bytes_downloaded // (1024 * 1024)} MB), {h.stale} stale  |  fetch {h.fetch_ms.summary()}")
+        if self.prefetcher:
+            pending, ready = self.prefetcher.depth
+            lines.append(f"Decode: {pending} pending, {ready} ready  |  decode {self.prefetcher.decode_ms.summary()}"
+                         + (f"  |  waited on reads {self.reader.waited_ms.summary()}" if self.reader else ""))
+        if self.inspect:
+            pyr = self.inspect.pyramid
+            lines.append(f"Inspect: level {self.inspect.level()}/{pyr.levels - 1}  |  tiles decoded {pyr.decoded}, "
+                         f"cached {len(pyr.cache)} ({pyr.cache_bytes // (1024 * 1024)} MB)")
+        if self.search_index:
+            ix = self.search_index
+            state = f"ready in {ix.build_ms:.0f} ms" if ix.ready else "building"
+            lines.append(f"Search index: {len(ix.paths)} names, {len(ix.postings)} trigrams, {state}  |  "
+                         f"query {self.search_ms.summary()}")
+        if self.grid:
+            g = self.grid
+            lines.append(f"Grid: {len(g.cache)} thumbnails in memory  |  {g.generated} generated, "
+                         f"{g.from_cache} from cache, {len(g.failed)} failed")
+        if self.transition != 'none':
+            state = 'off (over budget)' if self.transition_disabled else f"{self.transition} {self.transition_ms}ms"
+            lines.append(f"Transitions: {state}  |  {self.transitions_done} done, {self.transitions_cut} cut  |  "
+                         f"blend {self.transition_cost.summary()}")
+        if self.validator:
+            v = self.validator
+            lines.append(f"Skipped invalid: {self.stats['skipped']}  |  known bad: {len(v.bad)}  |  probed: {v.probed}")
+        if self.dedupe:
+            line = f"Duplicates removed: {self.stats['duplicates']}"
+            if self.deduper:
+                d = self.deduper
+                state = 'done' if d.done else 'running'
+                line += f"  |  {d.mode} check {state}: {len(d.info)} files, {d.hashed} hashed, {d.cached} cached"
+            lines.append(line)
+        if self.indexer:
+            ix = self.indexer
+            lines.append(f"Metadata indexed: {ix.indexed} ({ix.from_cache} cached, {ix.failed} unreadable)")
+        return lines
+
+    def draw_stats_overlay(self):
+        font = self.font_local if self.font_local else self.font_cjk
+        lines = self.stats_lines()
+        line_h = font.get_linesize()
+        box_h = line_h * len(lines) + 16
+        box_w = max(font.size(line)[0] for line in lines) + 24
+        box = pygame.Surface((box_w, box_h), pygame.SRCALPHA)
+        box.fill((0, 0, 0, 180))
+        y0 = self.display_surface.get_height() - box_h - 12
+        self.display_surface.blit(box, (12, y0))
+        for i, line in enumerate(lines):
+            try:
+                txt = font.render(line, True, (200, 200, 200))
+                self.display_surface.blit(txt, (24, y0 + 8 + i * line_h))
+            except Exception:
+                pass
 
 class FilePicker:
     """Compact pygame picker for selecting a slideshow list from recents."""
@@ -831,7 +6456,7 @@ class FilePicker:
         self.font_small = load_local_font(11) or pygame.font.SysFont('arial', 11)
 
         self.recents = load_recents()
-        self._existence = [os.path.exists(r['path']) for r in self.recents]
+        self._existence = [source_exists(r['path']) for r in self.recents]
 
         self.duration = 30
         self.sort_order = 'random'
@@ -916,14 +6541,17 @@ class FilePicker:
             root = tk.Tk()
             root.withdraw()
             root.attributes('-topmost', True)
-            path = filedialog.askopenfilename(
-                title="Select list file",
+            paths = filedialog.askopenfilenames(
+                title="Select list file (several to mix them)",
                 filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
             )
+            paths = root.tk.splitlist(paths)
             root.destroy()
         except Exception as e:
             print(f"{Fore.RED}Browse dialog failed: {e}")
             return
+        # Several lists are mixed with equal weights.
+        path = format_mix([(p, 1) for p in paths]) if len(paths) > 1 else (paths[0] if paths else '')
         if path:
             self.result = (path, self.duration, self.sort_order)
             self.running = False
@@ -1023,7 +6651,8 @@ class FilePicker:
                     elif kind == 'sort':
                         _, _, _, _, sort_btn = self._controls_rects()
                         if sort_btn.collidepoint(event.pos):
-                            self.sort_order = 'name' if self.sort_order == 'random' else 'random'
+                            i = SORT_ORDERS.index(self.sort_order) if self.sort_order in SORT_ORDERS else -1
+                            self.sort_order = SORT_ORDERS[(i + 1) % len(SORT_ORDERS)]
                     elif kind == 'remove':
                         idx = self.pressed[1]
                         vi_candidate = idx - self.scroll_offset
@@ -1098,7 +6727,7 @@ class FilePicker:
                 if is_hover:
                     pygame.draw.rect(self.surface, self.ROW_HOVER, row, border_radius=4)
 
-                filename = os.path.basename(entry['path']) or entry['path']
+                filename = source_label(entry['path'])
                 color = self.TEXT if exists else self.TEXT_MISSING
                 text_max_w = row.width - 40
                 filename_r = self.font.render(self._truncate(filename, text_max_w, self.font), True, color)
@@ -1176,10 +6805,58 @@ class FilePicker:
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Instant Slideshow from a text file of paths.")
-    parser.add_argument("file", nargs="?", help="Path to the text file containing image paths")
+    parser = argparse.ArgumentParser(description="Instant Slideshow from a text file of paths, a folder, or a glob pattern.")
+    parser.add_argument("file", nargs="?", help="Text file containing image paths, a folder to scan, a glob such as "
+                                                "'C:/pics/**/*.jpg', or weighted list files to mix: 'new.txt=4 + archive.txt'")
+    parser.add_argument("--mix-window", type=int, default=MIX_WINDOW,
+                        help=f"When mixing lists, don't repeat a slide within this many slides (default {MIX_WINDOW})")
     parser.add_argument("-d", "--duration", type=float, help="Slide duration in seconds")
-    parser.add_argument("-s", "--sort", choices=['random', 'name'], help="Sort order: random (default) or name")
+    parser.add_argument("--dedupe", choices=DEDUPE_MODES,
+                        help="Remove duplicates: repeated paths (path), byte-identical files (content) "
+                             "or visually identical images (perceptual)")
+    parser.add_argument("-t", "--transition", choices=TRANSITIONS, default='none',
+                        help="Transition between slides: none (default), fade or slide")
+    parser.add_argument("--transition-ms", type=int, default=400,
+                        help="Transition length in milliseconds (default 400)")
+    parser.add_argument("--io-workers", type=int, default=IO_WORKERS,
+                        help=f"Concurrent file reads ahead of the playhead (default {IO_WORKERS})")
+    parser.add_argument("--read-ahead-mb", type=int, default=READ_AHEAD_BYTES // (1024 * 1024),
+                        help=f"Memory for files read ahead of the playhead, in MB (default {READ_AHEAD_BYTES // (1024 * 1024)})")
+    parser.add_argument("--memory-limit-mb", type=int,
+                        help="RSS ceiling in MB; above it caches and prefetching are cut back")
+    parser.add_argument("--control-port", type=int,
+                        help="Serve the local control API on 127.0.0.1:PORT")
+    parser.add_argument("--export", metavar="OUTPUT",
+                        help="Render the show offscreen instead of playing it: OUTPUT.gif, OUTPUT.webp, "
+                             "a folder for numbered PNG frames, or a pattern like frames/%%06d.jpg")
+    parser.add_argument("--export-size", type=parse_size, default=EXPORT_SIZE, metavar="WxH",
+                        help=f"Export resolution (default {EXPORT_SIZE[0]}x{EXPORT_SIZE[1]})")
+    parser.add_argument("--export-fps", type=positive_float, default=EXPORT_FPS,
+                        help=f"Frame rate of exported frame sequences (default {EXPORT_FPS})")
+    parser.add_argument("--trace", metavar="DIR",
+                        help="Record spans of the render loop and worker threads; press T (or POST /trace) "
+                             "to write the latest ones to DIR as Chrome trace JSON")
+    parser.add_argument("--trace-slow-ms", type=float, default=TRACE_SLOW_MS,
+                        help=f"With --trace, also write a trace when a frame takes longer than this "
+                             f"(default {TRACE_SLOW_MS}; 0 turns it off)")
+    parser.add_argument("--soak", type=float, metavar="MINUTES",
+                        help="Run a headless soak test for MINUTES with simulated input, and fail "
+                             "if memory, file descriptors, threads or retained images keep growing")
+    parser.add_argument("--soak-speed", type=float, default=SOAK_SPEED,
+                        help=f"Soak test speed-up of the slide duration (default {SOAK_SPEED}x)")
+    parser.add_argument("--soak-max-growth-mb", type=float, default=SOAK_MAX_GROWTH_MB,
+                        help=f"RSS growth that fails a soak test, in MB (default {SOAK_MAX_GROWTH_MB})")
+    parser.add_argument("--soak-log", metavar="CSV",
+                        help="Write soak test samples to a CSV file")
+    parser.add_argument("--soak-seed", type=int,
+                        help="Seed for the soak test's simulated input, to replay a run")
+    sync_group = parser.add_mutually_exclusive_group()
+    sync_group.add_argument("--sync-leader", metavar="[HOST:]PORT",
+                            help="Lead synchronized playback; followers connect to this UDP port")
+    sync_group.add_argument("--sync-follow", metavar="HOST:PORT",
+                            help="Follow the sync leader at HOST:PORT")
+    parser.add_argument("-s", "--sort", choices=SORT_ORDERS,
+                        help="Sort order: random (default), name, natural, mtime, size, taken (EXIF date) or dimensions")
 
     args = parser.parse_args()
 
@@ -1187,6 +6864,48 @@ if __name__ == "__main__":
     duration = args.duration
     sort_order = args.sort
 
+    if args.trace:
+        try:
+            Tracer.active = Tracer(args.trace, slow_ms=args.trace_slow_ms)
+            print(f"{Fore.CYAN}Tracing: press T to write a trace to {args.trace}")
+        except OSError as e:
+            print(f"{Fore.RED}Could not start tracing to {args.trace}: {e}")
+
+    if args.export:
+        if not file_path or not source_exists(file_path):
+            parser.error("--export needs a list file, folder or glob that exists")
+        ok = export_show(file_path, args.export, int((duration or 30) * 1000), size=args.export_size,
+                         fps=args.export_fps, sort_order=sort_order or 'random', dedupe=args.dedupe)
+        sys.exit(0 if ok else 1)
+
+    if args.soak:
+        if not file_path or not source_exists(file_path):
+            parser.error("--soak needs a list file, folder or glob that exists")
+        ok = soak_test(file_path, args.soak, duration or 30, speed=args.soak_speed,
+                       max_growth_mb=args.soak_max_growth_mb, log_path=args.soak_log, seed=args.soak_seed,
+                       sort_order=sort_order or 'random', dedupe=args.dedupe, transition=args.transition,
+                       transition_ms=args.transition_ms, io_workers=args.io_workers,
+                       read_ahead_mb=args.read_ahead_mb, memory_limit_mb=args.memory_limit_mb,
+                       mix_window=args.mix_window)
+        pygame.quit()
+        sys.exit(0 if ok else 1)
+
+    control = None
+    if args.control_port is not None:
+        try:
+            control = ControlServer(args.control_port)
+        except OSError as e:
+            print(f"{Fore.RED}Could not start control API on port {args.control_port}: {e}")
+
+    sync = None
+    try:
+        if args.sync_leader:
+            sync = SyncLeader(parse_host_port(args.sync_leader, '0.0.0.0'))
+        elif args.sync_follow:
+            sync = SyncFollower(parse_host_port(args.sync_follow, '127.0.0.1'))
+    except (OSError, ValueError) as e:
+        print(f"{Fore.RED}Could not start sync: {e}")
+
     try:
         while True:
             if not file_path:
@@ -1196,7 +6915,18 @@ if __name__ == "__main__":
                     break
                 file_path, duration, sort_order = picker_result
 
-            slideshow = InstantSlideshow(file_path=file_path, duration=duration, sort_order=sort_order)
+            slideshow = InstantSlideshow(file_path=file_path, duration=duration, sort_order=sort_order,
+                                         dedupe=args.dedupe, transition=args.transition,
+                                         transition_ms=args.transition_ms, io_workers=args.io_workers,
+                                         read_ahead_mb=args.read_ahead_mb,
+                                         memory_limit_mb=args.memory_limit_mb, control=control, sync=sync,
+                                         mix_window=args.mix_window)
+            if slideshow.next_action == 'load':
+                # Keep the current duration and sort order for the new playlist
+                file_path = slideshow.next_source
+                duration = slideshow.slide_duration / 1000
+                sort_order = slideshow.sort_order
+                continue
             if slideshow.next_action == 'picker':
                 file_path = None
                 duration = None
@@ -1204,5 +6934,11 @@ if __name__ == "__main__":
                 continue
             break
     finally:
+        if control:
+            control.stop()
+        if sync:
+            sync.stop()
+        if HttpFetcher._shared is not None:
+            HttpFetcher._shared.close()
         pygame.quit()
         sys.exit()
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import slideshow  # noqa: E402
+
+BODIES = {
+    '/a.jpg': b'a' * 300000,
+    '/b.jpg': b'b' * 1000,
+    '/private.jpg': b'p' * 1000,
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path.startswith('/redirect/'):
+            self.reply(302, headers={'Location': '/' + self.path[len('/redirect/'):]})
+            return
+        path, _, _ = self.path.partition('?')
+        drop = path.startswith('/drop/')
+        if drop:
+            path = path[len('/drop'):]
+        body = BODIES.get(path)
+        if body is None:
+            self.reply(404)
+            return
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        headers = {'ETag': etag}
+        if path == '/private.jpg' or self.server.no_store:
+            headers['Cache-Control'] = 'no-store'
+        if self.headers.get('If-None-Match') == etag:
+            self.reply(304, headers=headers)
+        else:
+            self.reply(200, body, headers)
+        if drop:
+            # Close without a Connection: close header, the way a server
+            # times out a keep-alive connection the client thinks is idle.
+            self.close_connection = True
+
+    def reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HttpFetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.server.requests = []
+        self.server.no_store = False
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.tmp = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp, 'http_cache')
+        self.db = slideshow.CacheDB(os.path.join(self.tmp, 'cache.db'))
+        self.fetcher = slideshow.HttpFetcher(self.db, cache_dir=self.cache_dir)
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.stop_server()
+        self.db.conn.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def stop_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def expire(self, url):
+        self.db.executemany('UPDATE http_cache SET fresh_until = 0 WHERE url = ?', [(url,)])
+
+    def test_fresh_entry_is_served_without_a_request(self):
+        url = self.base + '/a.jpg'
+        self.assertEqual(self.fetcher.fetch(url), BODIES['/a.jpg'])
+        self.assertEqual(self.fetcher.fetch(url), BODIES['/a.jpg'])
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.fetcher.hits, 1)
+
+    def test_stale_entry_is_revalidated_with_a_304(self):
+        url = self.base + '/a.jpg'
+        self.fetcher.fetch(url)
+        self.expire(url)
+        self.assertEqual(self.fetcher.fetch(url), BODIES['/a.jpg'])
+        self.assertEqual(self.fetcher.not_modified, 1)
+        self.assertEqual(self.fetcher.downloaded, 1)
+        self.assertIn('If-None-Match', self.server.requests[-1][1])
+
+    def test_connections_are_reused(self):
+        for path in ('/a.jpg', '/b.jpg', '/a.jpg?v=2', '/missing.jpg'):
+            try:
+                self.fetcher.fetch(self.base + path)
+            except OSError:
+                pass
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.fetcher.opened, 1)
+        self.assertEqual(self.fetcher.reused, 3)
+
+    def test_redirect_is_followed(self):
+        self.assertEqual(self.fetcher.fetch(self.base + '/redirect/b.jpg'), BODIES['/b.jpg'])
+        self.assertEqual([path for path, _ in self.server.requests], ['/redirect/b.jpg', '/b.jpg'])
+
+    def test_missing_file_raises(self):
+        with self.assertRaisesRegex(OSError, 'HTTP 404'):
+            self.fetcher.fetch(self.base + '/missing.jpg')
+        self.assertIsNone(self.fetcher.entry(self.base + '/missing.jpg'))
+
+    def test_stale_copy_is_served_when_the_server_is_gone(self):
+        url = self.base + '/a.jpg'
+        self.fetcher.fetch(url)
+        self.fetcher.close()
+        self.stop_server()
+        self.expire(url)
+        self.assertEqual(self.fetcher.fetch(url), BODIES['/a.jpg'])
+        self.assertEqual(self.fetcher.stale, 1)
+
+    def test_unreachable_url_without_a_copy_raises(self):
+        url = self.base + '/a.jpg'
+        self.stop_server()
+        with self.assertRaises(OSError):
+            self.fetcher.fetch(url)
+
+    def test_dropped_idle_connection_is_retried(self):
+        self.fetcher.fetch(self.base + '/drop/a.jpg')
+        self.assertEqual(self.fetcher.fetch(self.base + '/b.jpg'), BODIES['/b.jpg'])
+        self.assertEqual(self.fetcher.reused, 1)
+        self.assertEqual(self.fetcher.opened, 2)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_no_store_body_is_not_cached(self):
+        url = self.base + '/private.jpg'
+        self.assertEqual(self.fetcher.fetch(url), BODIES['/private.jpg'])
+        self.assertIsNone(self.fetcher.entry(url))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.fetcher.fetch(url)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_no_store_drops_an_earlier_copy(self):
+        url = self.base + '/b.jpg'
+        self.fetcher.fetch(url)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.expire(url)
+        self.server.no_store = True
+        self.fetcher.fetch(url)
+        self.assertIsNone(self.fetcher.entry(url))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()